@@ -0,0 +1,27 @@
+import json
+
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# Helpers for the async views, which are plain Django views: DRF's request parsing and
+# Response rendering only run synchronously.
+
+def json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    # DRF's encoder, so dates and decimals render exactly as in the sync API
+    return JsonResponse(data, status=status_code, headers=headers, safe=False, encoder=JSONEncoder)
+
+
+def read_json(request):
+    # The request body as a dict; returns (data, None) or (None, error response)
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None, json_response({"error": "Request body must be valid JSON."}, status.HTTP_400_BAD_REQUEST)
+    else:
+        data = request.POST.dict()
+    if not isinstance(data, dict):
+        return None, json_response({"error": "Request body must be a JSON object."}, status.HTTP_400_BAD_REQUEST)
+    return data, None
@@ -1,8 +1,12 @@
-from django.urls import path, include
-from .views import  home
-
-urlpatterns = [
-    path("", home, name="home"),
-    path("customer/", include('customer.urls')),
-    path("loan/", include('loan.urls')),
-]
+from django.conf import settings
+from django.urls import path, include
+from .views import  home
+
+# ASYNC_API serves the async implementations of the endpoints; run them under an ASGI server
+suffix = 'async_urls' if settings.ASYNC_API else 'urls'
+
+urlpatterns = [
+    path("", home, name="home"),
+    path("customer/", include(f'customer.{suffix}')),
+    path("loan/", include(f'loan.{suffix}')),
+]
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 import os
 from datetime import timedelta
+from celery.schedules import crontab
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -63,30 +64,49 @@ SIMPLE_JWT = {
 }
 
 
+# Log records are only filtered and queued on the calling thread; a listener thread formats
+# them as JSON lines and writes them in batches (see core.log). Per-row ingestion messages
+# are sampled down to one in LOG_ROW_SAMPLE_RATE before they are queued.
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FILE = os.getenv('LOG_FILE', 'app.log')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
-    'handlers': {
-        'console': {
-            'level': 'DEBUG',  # Minimum log level for console output
-            'class': 'logging.StreamHandler',
+    'formatters': {
+        'json': {
+            '()': 'core.log.JSONFormatter',
         },
-        'file': {
-            'level': 'DEBUG',  # Minimum log level for file output
-            'class': 'logging.FileHandler',
-            'filename': 'app.log',  # Log file name
+    },
+    'filters': {
+        'sampling': {
+            '()': 'core.log.SamplingFilter',
+            'rates': {'core.rows': int(os.getenv('LOG_ROW_SAMPLE_RATE', 100))},
+        },
+    },
+    'handlers': {
+        'queue': {
+            'level': 'DEBUG',
+            '()': 'core.log.QueueLogHandler',
+            'filename': LOG_FILE,
+            'stream': True,  # Also to stderr, for the container logs
+            'formatter': 'json',
+            'filters': ['sampling'],
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',  # Set level for Django logs
-            'propagate': True,
+            'propagate': False,
         },
-        'myapp': {  # Replace 'myapp' with your app name if necessary
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',  # Set level for your app's logs
-            'propagate': True,
+        **{
+            app: {
+                'handlers': ['queue'],
+                'level': LOG_LEVEL,
+                'propagate': False,
+            }
+            for app in ('api', 'core', 'customer', 'loan')
         },
     },
 }
@@ -111,6 +131,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',  # First, so its timings cover the whole stack
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',  
     'django.middleware.common.CommonMiddleware',
@@ -119,6 +140,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'customer.middleware.CustomerIdentityMapMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -208,8 +230,68 @@ STORAGES = {
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Redis when CACHE_URL is set (docker-compose points it at the redis service), otherwise a per-process cache
+if os.getenv('CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds credit profiles and loan payloads stay cached; writes invalidate them sooner
+LOAN_CACHE_TTL = int(os.getenv('LOAN_CACHE_TTL', 3600))
+
+# Serve the async API views; they need an ASGI server (uvicorn backend.asgi:application)
+ASYNC_API = os.getenv('ASYNC_API') == 'True'
+
+# Queue create-loan requests for the Celery workers and answer 202 with an application ID
+LOAN_APPLICATION_QUEUE = os.getenv('LOAN_APPLICATION_QUEUE') == 'True'
+LOAN_APPLICATION_BATCH_SIZE = int(os.getenv('LOAN_APPLICATION_BATCH_SIZE', 100))  # Applications per worker transaction
+
+# Where the credit scoring policy comes from: "builtin", "database" (the active ScoringPolicy)
+# or a JSON file path, and how many seconds a process keeps it before checking for a new one
+SCORING_POLICY_SOURCE = os.getenv('SCORING_POLICY_SOURCE', 'builtin')
+SCORING_POLICY_REFRESH = int(os.getenv('SCORING_POLICY_REFRESH', 10))
+
+# Share of requests whose timings and query counts are recorded for /metrics; 0 turns it off
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 0))
+# Directory where each process writes its metrics so /metrics can serve the sum over all of
+# them; unset, /metrics reports only the process that answers the scrape
+METRICS_DIR = os.getenv('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1))  # Seconds
+
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND')
+CELERY_TIMEZONE = TIME_ZONE
+
+# Run by the celery beat service
+CELERY_BEAT_SCHEDULE = {
+    # Sweep up queued loan applications whose trigger was lost (broker down, worker died
+    # mid-batch); runs that find the queue empty return at once
+    'process-loan-applications': {
+        'task': 'loan.tasks.process_loan_applications',
+        'schedule': 60.0,
+        'options': {'expires': 55},  # Don't pile up runs while the workers are down
+    },
+    # Take loans that ended yesterday out of the customers' active exposure
+    'expire-loan-exposure': {
+        'task': 'loan.tasks.expire_loan_exposure',
+        'schedule': crontab(hour=0, minute=5),
+    },
+    # Recompute every customer's exposure from the loan table and report drift
+    'reconcile-loan-exposure': {
+        'task': 'loan.tasks.expire_loan_exposure',
+        'schedule': crontab(hour=3, minute=30, day_of_week='sunday'),
+        'kwargs': {'reconcile': True},
+    },
+}
 
 CORS_URLS_REGEX = r"^/api/.*"
 CORS_ALLOW_ALL_ORIGINS = True
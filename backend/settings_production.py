@@ -0,0 +1,46 @@
+"""
+Production settings: everything in backend.settings plus database connection reuse.
+
+Select with DJANGO_SETTINGS_MODULE=backend.settings_production. Serve with gunicorn, which
+reads gunicorn.conf.py from the project root.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+DEBUG = False
+
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 1))
+# gunicorn runs several worker processes and a scrape reaches only one of them, so they all
+# report through this directory (gunicorn.conf.py empties it at startup)
+METRICS_DIR = os.getenv('METRICS_DIR', '/tmp/credit-metrics')
+
+# With psycopg 3 installed, Django keeps a pool of open connections per worker process and
+# each request borrows one; the pool checks a connection before lending it. psycopg2 has
+# no pool support in Django, so there connections persist per thread for DB_CONN_MAX_AGE
+# seconds instead, with a health check before reuse. Either way requests stop paying for
+# a new connection (TCP + TLS + authentication + backend startup) every time.
+DB_POOL = os.getenv('DB_POOL', 'True') == 'True'
+
+try:
+    import psycopg  # noqa: F401
+    import psycopg_pool  # noqa: F401
+    POOL_AVAILABLE = True
+except ImportError:
+    POOL_AVAILABLE = False
+
+if DB_POOL and POOL_AVAILABLE:
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # Django requires this with pooling
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            # At least the request threads of a worker (gunicorn.conf.py), so none waits on another
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 8)),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),  # Seconds to wait for a free connection
+            'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', 600))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
@@ -0,0 +1,127 @@
+"""
+Per-request latency of check-eligibility with and without database connection reuse.
+
+Each request runs the way a server runs it: request_started, the view, then request_finished,
+which closes or returns the connection according to the settings. Modes:
+    new         CONN_MAX_AGE=0, a fresh connection for every request (the old default)
+    persistent  CONN_MAX_AGE with health checks, one connection kept per thread
+    pool        psycopg 3 connection pool (skipped when psycopg 3 is not installed)
+
+Builds its own throwaway test database, so it only needs a reachable Postgres:
+    python benchmarks/connection_reuse.py --requests 500
+"""
+import argparse
+import statistics
+import time
+from datetime import date
+
+from harness import latency_summary, scratch_database, setup_django, write_report
+
+setup_django()
+
+from django.core.signals import request_finished, request_started  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import RequestFactory, override_settings  # noqa: E402
+
+from customer.models import Customer  # noqa: E402
+from loan.models import Loan  # noqa: E402
+from loan.views import check_eligibility_view  # noqa: E402
+
+MODES = {
+    'new': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'pool': None},
+    'persistent': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True, 'pool': None},
+    'pool': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'pool': {'min_size': 1, 'max_size': 4}},
+}
+
+
+def pool_available():
+    try:
+        import psycopg_pool  # noqa: F401
+    except ImportError:
+        return False
+    return connection.vendor == 'postgresql' and getattr(connection, 'pool', False) is not False
+
+
+def configure(mode):
+    connection.close()
+    if hasattr(connection, 'close_pool'):
+        connection.close_pool()
+    settings = MODES[mode]
+    connection.settings_dict['CONN_MAX_AGE'] = settings['CONN_MAX_AGE']
+    connection.settings_dict['CONN_HEALTH_CHECKS'] = settings['CONN_HEALTH_CHECKS']
+    options = connection.settings_dict.setdefault('OPTIONS', {})
+    options.pop('pool', None)
+    if settings['pool']:
+        options['pool'] = settings['pool']
+
+
+def measure(requests, customer_id):
+    factory = RequestFactory()
+    body = {"customer_id": customer_id, "loan_amount": 100000, "interest_rate": 12, "tenure": 12}
+    timings = []
+    for _ in range(requests):
+        request = factory.post('/api/loan/check-eligibility/', body, content_type='application/json')
+        start = time.perf_counter()
+        request_started.send(sender=__name__)
+        response = check_eligibility_view(request)
+        request_finished.send(sender=__name__)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.data
+    return timings
+
+
+def measure_modes(args):
+    # Request durations in seconds per connection mode
+    try:
+        customer = Customer.objects.create(first_name='Bench', last_name='Mark', age=35,
+                                           phone_number='9000000000', monthly_salary=100000)
+        Loan.objects.create(customer=customer, loan_amount=200000, tenure=24, interest_rate=10,
+                            monthly_repayment=9229, emis_paid_on_time=24, approval_date=date(2020, 1, 1))
+
+        modes = [mode for mode in MODES if mode != 'pool' or pool_available()]
+        results = {}
+        for mode in modes:
+            configure(mode)
+            measure(args.warmup, customer.customer_id)
+            results[mode] = measure(args.requests, customer.customer_id)
+    finally:
+        configure('new')
+    return results
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--json', metavar='PATH', help='Write the results as JSON to PATH (- for stdout)')
+    args = parser.parse_args()
+
+    # Measure the database round trips, not the caches in front of them
+    overrides = override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    overrides.enable()
+    try:
+        with scratch_database():
+            results = measure_modes(args)
+    finally:
+        overrides.disable()
+
+    baseline = statistics.mean(results['new'])
+    if args.json:
+        write_report(args.json, 'connection_reuse', {
+            mode: {**latency_summary(timings), "saved_ms": round((baseline - statistics.mean(timings)) * 1000, 4)}
+            for mode, timings in results.items()
+        }, vars(args))
+        return
+    print(f"check-eligibility, {args.requests} sequential requests per mode (ms)")
+    print(f"{'mode':>12} | {'mean':>8} | {'p50':>8} | {'p95':>8} | {'saved/req':>9}")
+    for mode, timings in results.items():
+        summary = latency_summary(timings)
+        print(f"{mode:>12} | {summary['mean_ms']:8.3f} | {summary['p50_ms']:8.3f} | {summary['p95_ms']:8.3f} | "
+              f"{(baseline - statistics.mean(timings)) * 1000:9.3f}")
+    if 'pool' not in results:
+        print("pool: skipped, needs psycopg 3 with psycopg_pool")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Synthetic customer and loan data at any scale, in the layout the ingestion reads, plus a
+matching request mix for the load driver.
+
+    python benchmarks/datagen.py --customers 100000 --loans 1000000 --out /tmp/bench
+    python benchmarks/datagen.py --customers 1000000 --loans 10000000 --format parquet --out /tmp/bench
+
+writes customers.<format>, loans.<format> and requests.jsonl (one request per line, see
+load_test.py --replay) to --out. Rows are generated chunk by chunk from a fixed seed, so the
+same arguments always produce the same files and memory stays flat at any scale. --load also
+ingests the files into the database DJANGO_SETTINGS_MODULE points at.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from harness import ROOT
+
+sys.path.insert(0, str(ROOT))
+
+from loan import amortization  # noqa: E402
+
+CHUNK_ROWS = 500_000
+TENURES = np.array([6, 12, 18, 24, 36, 48, 60, 84, 120, 180, 240, 360])
+
+# Share of each request type in the generated mix
+REQUEST_MIX = {
+    'check-eligibility': 0.55,
+    'create-loan': 0.05,
+    'view-loans': 0.25,
+    'view-loan': 0.15,
+}
+
+
+def customers_frame(first_id, count, rng):
+    ids = np.arange(first_id, first_id + count)
+    salary = rng.integers(15, 300, count) * 1000
+    return pd.DataFrame({
+        'Customer ID': ids,
+        'First Name': [f'First{customer_id}' for customer_id in ids],
+        'Last Name': [f'Last{customer_id % 9973}' for customer_id in ids],
+        'Age': rng.integers(21, 66, count),
+        'Phone Number': 7000000000 + ids,
+        'Monthly Salary': salary,
+        'Approved Limit': np.round(salary * 36, -5),
+    })
+
+
+def loans_frame(first_loan_id, count, customer_count, rng, today):
+    tenure = rng.choice(TENURES, count)
+    rate = np.round(rng.uniform(6, 20, count), 2)
+    amount = rng.integers(1, 100, count) * 10000
+    # Approval dates over the last ten years, on days 1-28 so adding months never overflows
+    months_ago = rng.integers(0, 120, count)
+    approval_month = np.datetime64(today, 'M') - months_ago
+    approval = approval_month.astype('datetime64[D]') + rng.integers(0, 28, count)
+    end = (approval_month + tenure).astype('datetime64[D]') + (approval - approval_month.astype('datetime64[D]'))
+    elapsed = np.minimum(months_ago, tenure)
+    return pd.DataFrame({
+        'Customer ID': rng.integers(1, customer_count + 1, count),
+        'Loan ID': np.arange(first_loan_id, first_loan_id + count),
+        'Loan Amount': amount,
+        'Tenure': tenure,
+        'Interest Rate': rate,
+        'Monthly payment': np.round(amortization.monthly_installment(amount, rate, tenure)).astype(int),
+        'EMIs paid on Time': np.floor(elapsed * rng.uniform(0.6, 1.0, count)).astype(int),
+        'Date of Approval': pd.to_datetime(approval),
+        'End Date': pd.to_datetime(end),
+    })
+
+
+def chunks(total, make, seed):
+    # `make(first_row, count, rng)` for consecutive chunks, each drawing from its own seeded stream
+    for number, first in enumerate(range(0, total, CHUNK_ROWS)):
+        yield make(first, min(CHUNK_ROWS, total - first), np.random.default_rng([seed, number]))
+
+
+def write_frames(frames, path, file_format):
+    if file_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for frame in frames:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                writer = writer or pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer:
+                writer.close()
+        return
+    for number, frame in enumerate(frames):
+        frame.to_csv(path, mode='w' if number == 0 else 'a', header=number == 0, index=False, date_format='%Y-%m-%d')
+
+
+def request_mix(count, customer_count, loan_count, first_loan_id, seed):
+    # One request per line: {"name": ..., "method": ..., "path": ..., "body": ...}
+    rng = np.random.default_rng([seed, 1 << 20])
+    names = rng.choice(list(REQUEST_MIX), count, p=list(REQUEST_MIX.values()))
+    customers = rng.integers(1, customer_count + 1, count)
+    loans = rng.integers(first_loan_id, first_loan_id + max(loan_count, 1), count)
+    amounts = rng.integers(5, 100, count) * 10000
+    rates = rng.choice([8, 10, 12, 14, 16], count)
+    tenures = rng.choice([12, 24, 36, 48, 60], count)
+    for name, customer_id, loan_id, amount, rate, tenure in zip(names, customers, loans, amounts, rates, tenures):
+        if name in ('check-eligibility', 'create-loan'):
+            body = {"customer_id": int(customer_id), "loan_amount": int(amount), "interest_rate": int(rate), "tenure": int(tenure)}
+            yield {"name": name, "method": "POST", "path": f"/api/loan/{name}/", "body": body}
+        elif name == 'view-loans':
+            yield {"name": name, "method": "GET", "path": f"/api/loan/view-loans/{customer_id}/"}
+        else:
+            yield {"name": name, "method": "GET", "path": f"/api/loan/view-loan/{loan_id}/"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=10_000)
+    parser.add_argument('--loans', type=int, default=100_000)
+    parser.add_argument('--requests', type=int, default=10_000, help='Length of the request mix')
+    parser.add_argument('--format', choices=('csv', 'parquet'), default='csv')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--first-loan-id', type=int, default=1)
+    parser.add_argument('--out', default='bench-data')
+    parser.add_argument('--load', action='store_true', help='Ingest the generated files into the database')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    today = date.today()
+    customers_path = os.path.join(args.out, f'customers.{args.format}')
+    loans_path = os.path.join(args.out, f'loans.{args.format}')
+
+    write_frames(chunks(args.customers, lambda first, count, rng: customers_frame(first + 1, count, rng), args.seed),
+                 customers_path, args.format)
+    write_frames(chunks(args.loans, lambda first, count, rng: loans_frame(
+        args.first_loan_id + first, count, args.customers, rng, today), args.seed + 1), loans_path, args.format)
+    with open(os.path.join(args.out, 'requests.jsonl'), 'w') as file:
+        for request in request_mix(args.requests, args.customers, args.loans, args.first_loan_id, args.seed):
+            file.write(json.dumps(request) + '\n')
+    print(f"Wrote {args.customers} customers, {args.loans} loans and {args.requests} requests to {args.out}")
+
+    if args.load:
+        from harness import setup_django
+        setup_django()
+        from core.tasks import ingest_customer_data, ingest_loan_data
+
+        ingest_customer_data(path=customers_path)
+        result = ingest_loan_data(path=loans_path)
+        print(f"Loaded loans: {result['created']} created, {result['updated']} updated, {len(result['rejected'])} rejected")
+
+
+if __name__ == '__main__':
+    main()
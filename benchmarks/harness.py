@@ -0,0 +1,84 @@
+"""
+Shared pieces of the benchmark scripts: Django setup against a throwaway test database,
+latency summaries and JSON reports.
+
+Every script can write its results as one JSON document (--json PATH, or - for stdout) with
+the commit, time and environment they were measured in, so runs can be stored and compared
+over time. Only the standard library is imported at module level, so the HTTP load driver
+keeps running from machines without the project's dependencies.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup_django(settings_module='backend.settings'):
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+@contextmanager
+def scratch_database():
+    # A test database created for the run and dropped afterwards, so benchmarks never touch real data
+    from django.db import connections
+    from django.test.utils import setup_databases, teardown_databases
+
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        connections.close_all()
+        teardown_databases(old_config, verbosity=0)
+
+
+def latency_summary(seconds):
+    # Count, mean and percentiles of a list of durations, in milliseconds
+    if not seconds:
+        return {"count": 0, "mean_ms": None, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+    quantiles = statistics.quantiles(seconds, n=100) if len(seconds) > 1 else [seconds[0]] * 99
+    return {
+        "count": len(seconds),
+        "mean_ms": round(statistics.mean(seconds) * 1000, 6),
+        "p50_ms": round(quantiles[49] * 1000, 6),
+        "p95_ms": round(quantiles[94] * 1000, 6),
+        "p99_ms": round(quantiles[98] * 1000, 6),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def report(benchmark, results, parameters=None):
+    return {
+        "benchmark": benchmark,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "parameters": parameters or {},
+        "results": results,
+    }
+
+
+def write_report(path, benchmark, results, parameters=None):
+    # Write the JSON report to `path`, or to stdout for "-"
+    document = json.dumps(report(benchmark, results, parameters), indent=2, default=str)
+    if path == '-':
+        print(document)
+    else:
+        Path(path).write_text(document + '\n')
@@ -0,0 +1,154 @@
+"""
+HTTP load generator for comparing API deployments, e.g. the sync and async views:
+
+    ASYNC_API=False uvicorn backend.asgi:application --workers 1 --port 8000
+    ASYNC_API=True  uvicorn backend.asgi:application --workers 1 --port 8001
+    python benchmarks/load_test.py http://localhost:8000 http://localhost:8001 --concurrency 200
+
+Requests come from a built-in scenario, or are replayed from a JSON-lines file with one
+{"name", "method", "path", "body"} object per line, such as the mix datagen.py writes:
+
+    python benchmarks/load_test.py http://localhost:8000 --replay bench-data/requests.jsonl --json results/load.json
+
+Uses only the standard library, so it runs from any machine that can reach the servers.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from harness import latency_summary, write_report
+
+SCENARIOS = ('eligibility', 'view-loans', 'view-loan', 'mixed')
+
+
+def build_request(scenario, rng, customers, loan_ids):
+    # (name, method, path, body) of one request of the scenario
+    if scenario == 'mixed':
+        scenario = rng.choice(SCENARIOS[:-1])
+    if scenario == 'eligibility':
+        body = {
+            "customer_id": rng.choice(customers),
+            "loan_amount": rng.randrange(50000, 500000, 5000),
+            "interest_rate": rng.choice([8, 10, 12, 14, 16]),
+            "tenure": rng.choice([12, 24, 36, 48]),
+        }
+        return 'check-eligibility', 'POST', '/api/loan/check-eligibility/', json.dumps(body)
+    if scenario == 'view-loans':
+        return scenario, 'GET', f'/api/loan/view-loans/{rng.choice(customers)}/', None
+    return scenario, 'GET', f'/api/loan/view-loan/{rng.choice(loan_ids)}/', None
+
+
+def scenario_plan(scenario, requests, customers, loan_ids, seed=0):
+    rng = random.Random(seed)
+    return [build_request(scenario, rng, customers, loan_ids) for _ in range(requests)]
+
+
+def replay_plan(path, requests=None):
+    # The requests of a JSON-lines file, repeated from the top if more are asked for than it holds
+    with open(path) as file:
+        entries = [json.loads(line) for line in file if line.strip()]
+    plan = [
+        (entry.get('name', entry['path']), entry.get('method', 'GET'), entry['path'],
+         json.dumps(entry['body']) if entry.get('body') is not None else None)
+        for entry in entries
+    ]
+    return list(itertools.islice(itertools.cycle(plan), requests or len(plan)))
+
+
+def run(base_url, plan, concurrency, timeout):
+    target = urlsplit(base_url)
+    local = threading.local()
+
+    def send(request):
+        # One keep-alive connection per client thread
+        name, method, path, body = request
+        if getattr(local, 'connection', None) is None:
+            local.connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=timeout)
+        start = time.perf_counter()
+        try:
+            local.connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+            response = local.connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            local.connection.close()
+            local.connection = None
+            status = None
+        return name, time.perf_counter() - start, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send, plan))
+    elapsed = time.perf_counter() - started
+
+    # Server errors and dropped connections count as failures, not as latencies
+    latencies = defaultdict(list)
+    for name, latency, status in results:
+        if status is not None and status < 500:
+            latencies[name].append(latency)
+    succeeded = sum(len(values) for values in latencies.values())
+    return {
+        "url": base_url,
+        "requests": len(plan),
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput": round(succeeded / elapsed, 1),
+        "failures": len(results) - succeeded,
+        **latency_summary([latency for values in latencies.values() for latency in values]),
+        "by_request": {name: latency_summary(values) for name, values in sorted(latencies.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('urls', nargs='+', help='Base URLs of the deployments to compare')
+    parser.add_argument('--scenario', choices=SCENARIOS, default='mixed')
+    parser.add_argument('--requests', type=int, help='Requests to send (default: 5000, or the whole --replay file)')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--customers', type=int, nargs=2, default=(1, 300), metavar=('FIRST', 'LAST'),
+                        help='Range of customer IDs to draw from (the ingested data has 1-300)')
+    parser.add_argument('--loan-ids', type=int, nargs=2, default=(1000, 9999), metavar=('FIRST', 'LAST'))
+    parser.add_argument('--warmup', type=int, default=200, help='Requests sent before measuring')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--replay', metavar='PATH', help='Send the requests of this JSON-lines file instead of a scenario')
+    parser.add_argument('--json', metavar='PATH', nargs='?', const='-',
+                        help='Write the results as JSON to PATH (stdout when no path is given)')
+    args = parser.parse_args()
+
+    customers = list(range(args.customers[0], args.customers[1] + 1))
+    loan_ids = list(range(args.loan_ids[0], args.loan_ids[1] + 1))
+    if args.replay:
+        plan = replay_plan(args.replay, args.requests)
+        warmup = replay_plan(args.replay, args.warmup)
+    else:
+        plan = scenario_plan(args.scenario, args.requests or 5000, customers, loan_ids)
+        warmup = scenario_plan(args.scenario, args.warmup, customers, loan_ids, seed=1)
+    results = []
+    for url in args.urls:
+        if args.warmup:
+            run(url, warmup, min(args.concurrency, args.warmup), args.timeout)
+        results.append(run(url, plan, args.concurrency, args.timeout))
+
+    if args.json:
+        write_report(args.json, 'load_test', results, vars(args))
+        return
+    columns = ('url', 'throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'failures')
+    print(f"{args.replay or args.scenario}: {len(plan)} requests, concurrency {args.concurrency}")
+    print(' | '.join(f'{column:>12}' for column in columns))
+    for result in results:
+        print(' | '.join(f'{result[column]:>12.2f}' if isinstance(result[column], float) else f'{result[column]!s:>12}'
+                         for column in columns))
+        for name, summary in result['by_request'].items():
+            print(f"{name:>24}: {summary['count']} ok, p50 {summary['p50_ms']:.2f} ms, "
+                  f"p95 {summary['p95_ms']:.2f} ms, p99 {summary['p99_ms']:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Customer ingestion throughput under different logging setups. Modes:
+    disabled  logging switched off
+    sync      the former setup: FileHandler and StreamHandler on the ingesting thread, every row logged
+    queue     core.log.QueueLogHandler with JSON records, every row logged
+    sampled   the LOGGING default: QueueLogHandler with per-row messages sampled
+
+A share of the generated rows is invalid, so each run logs one message per rejected row.
+Builds its own throwaway test database, so it only needs a reachable Postgres:
+    python benchmarks/logging_overhead.py --rows 50000 --reject-share 0.2
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from harness import scratch_database, setup_django, write_report
+
+setup_django()
+
+from django.db import connection  # noqa: E402
+
+from core.log import JSONFormatter, QueueLogHandler, SamplingFilter  # noqa: E402
+from core.models import IngestionCheckpoint  # noqa: E402
+from core.tasks import ingest_customer_data  # noqa: E402
+from customer.models import Customer  # noqa: E402
+
+MODES = ('disabled', 'sync', 'queue', 'sampled')
+
+
+def write_customers(path, rows, reject_share, seed=0):
+    rng = np.random.default_rng(seed)
+    ages = rng.integers(21, 65, rows)
+    ages[rng.random(rows) < reject_share] = 10  # Rejected: age must be between 18 and 100
+    pd.DataFrame({
+        'Customer ID': np.arange(1, rows + 1),
+        'First Name': [f'First{index}' for index in range(rows)],
+        'Last Name': [f'Last{index}' for index in range(rows)],
+        'Age': ages,
+        'Phone Number': 9000000000 + np.arange(rows),
+        'Monthly Salary': rng.integers(20, 200, rows) * 1000,
+        'Approved Limit': 0,
+    }).to_csv(path, index=False)
+
+
+def handlers_for(mode, directory, sample_rate):
+    log_file = os.path.join(directory, f'{mode}.log')
+    if mode == 'sync':
+        file_handler = logging.FileHandler(log_file)
+        stream_handler = logging.StreamHandler(open(os.devnull, 'w'))
+        return [file_handler, stream_handler]
+    handler = QueueLogHandler(filename=log_file)
+    handler.setFormatter(JSONFormatter())
+    if mode == 'sampled':
+        handler.addFilter(SamplingFilter(rates={'core.rows': sample_rate}))
+    return [handler]
+
+
+def run(mode, path, directory, chunk_size, sample_rate):
+    logger = logging.getLogger('core')
+    previous = logger.handlers[:], logger.level, logger.propagate
+    handlers = [] if mode == 'disabled' else handlers_for(mode, directory, sample_rate)
+    logger.handlers = handlers
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    logging.disable(logging.CRITICAL if mode == 'disabled' else logging.NOTSET)
+
+    # Truncate rather than delete, so dead rows from earlier runs do not slow the later ones
+    tables = ', '.join(connection.ops.quote_name(model._meta.db_table) for model in (Customer, IngestionCheckpoint))
+    with connection.cursor() as cursor:
+        cursor.execute(f'TRUNCATE {tables} CASCADE')
+    try:
+        start = time.perf_counter()
+        result = ingest_customer_data(path=path, chunk_size=chunk_size)
+        elapsed = time.perf_counter() - start
+        # Time until the last line is written, which the queued modes finish off the ingesting thread
+        for handler in handlers:
+            handler.flush()
+        drained = time.perf_counter() - start
+    finally:
+        for handler in handlers:
+            handler.close()
+        logger.handlers, level, logger.propagate = previous
+        logger.setLevel(level)
+        logging.disable(logging.NOTSET)
+    lines = 0
+    log_file = os.path.join(directory, f'{mode}.log')
+    if os.path.exists(log_file):
+        with open(log_file) as file:
+            lines = sum(1 for _ in file)
+        os.remove(log_file)
+    return result, elapsed, drained, lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--reject-share', type=float, default=0.2)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--sample-rate', type=int, default=100, help='Keep one per-row message in this many')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per mode; the fastest is reported')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--json', metavar='PATH', help='Write the results as JSON to PATH (- for stdout)')
+    args = parser.parse_args()
+
+    with scratch_database():
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'customers.csv')
+            write_customers(path, args.rows, args.reject_share)
+            run('disabled', path, directory, args.chunk_size, args.sample_rate)  # Warm up the database and pandas
+            results = {
+                mode: min((run(mode, path, directory, args.chunk_size, args.sample_rate) for _ in range(args.repeat)),
+                          key=lambda outcome: outcome[1])
+                for mode in args.modes
+            }
+
+    if args.json:
+        write_report(args.json, 'logging_overhead', {
+            mode: {"rows_per_second": round(args.rows / elapsed, 1), "seconds": round(elapsed, 4),
+                   "drained_seconds": round(drained, 4), "log_lines": lines}
+            for mode, (result, elapsed, drained, lines) in results.items()
+        }, vars(args))
+        return
+    print(f"customer ingestion, {args.rows} rows, {args.reject_share:.0%} rejected")
+    print(f"{'mode':>10} | {'rows/s':>9} | {'seconds':>8} | {'drained':>8} | {'log lines':>9}")
+    for mode, (result, elapsed, drained, lines) in results.items():
+        print(f"{mode:>10} | {args.rows / elapsed:9.0f} | {elapsed:8.3f} | {drained:8.3f} | {lines:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Micro-benchmarks of the scoring and ingestion hot paths:
+    monthly_installment  loan.views.calculate_monthly_installment, one loan
+    credit_score         loan.views.calculate_credit_score with a loaded profile
+    eligibility          loan.views.evaluate_eligibility, the whole decision for one request
+    simulate             loan.views.simulate_loans, the frontier over 10 tenures x 3 rates
+    ingest_customers     core.ingestion.load_customers on generated rows (needs Postgres)
+    ingest_loans         core.ingestion.load_loans on generated rows (needs Postgres)
+
+    python benchmarks/micro.py --json results/micro.json
+    python benchmarks/micro.py --only monthly_installment credit_score
+
+Per-call latencies are the means of batches of calls; ingestion reports rows per second.
+The database benchmarks run against a throwaway test database.
+"""
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+
+from harness import latency_summary, scratch_database, setup_django, write_report
+
+setup_django()
+
+from django.db import connection  # noqa: E402
+
+from core.ingestion import load_customers, load_loans  # noqa: E402
+from core.models import IngestionCheckpoint  # noqa: E402
+from customer.models import Customer  # noqa: E402
+from datagen import customers_frame, loans_frame  # noqa: E402
+from loan.credit import CreditProfile  # noqa: E402
+from loan.models import CustomerCreditSummary, Loan  # noqa: E402
+from loan.views import calculate_credit_score, calculate_monthly_installment, evaluate_eligibility, simulate_loans  # noqa: E402
+
+CPU_BENCHMARKS = ('monthly_installment', 'credit_score', 'eligibility', 'simulate')
+DB_BENCHMARKS = ('ingest_customers', 'ingest_loans')
+
+
+def time_calls(func, batches, batch_size):
+    # Per-call durations, each the mean of one batch of calls
+    func()  # Warm up
+    durations = []
+    for _ in range(batches):
+        start = time.perf_counter()
+        for _ in range(batch_size):
+            func()
+        durations.append((time.perf_counter() - start) / batch_size)
+    return {**latency_summary(durations), "calls_per_second": round(1 / min(durations), 1)}
+
+
+def cpu_benchmarks(names, batches, batch_size):
+    customer = Customer(customer_id=1, first_name='Bench', last_name='Mark', age=35, phone_number='9000000000',
+                        monthly_salary=100000, approved_limit=3600000)
+    profile = CreditProfile(paid_on_time=40, total_loans=5, current_year_loans=1, total_volume=1500000,
+                            active_exposure=600000)
+    calls = {
+        'monthly_installment': lambda: calculate_monthly_installment(500000, 12.5, 36),
+        'credit_score': lambda: calculate_credit_score(customer, 500000, profile),
+        'eligibility': lambda: evaluate_eligibility(customer, profile, 500000, 12.5, 36),
+        'simulate': lambda: simulate_loans(customer, profile, [], [12, 24, 36, 48, 60, 84, 120, 180, 240, 360], [10, 12.5, 15]),
+    }
+    return {name: time_calls(calls[name], batches, batch_size) for name in names}
+
+
+def _truncate(*models):
+    tables = ', '.join(connection.ops.quote_name(model._meta.db_table) for model in models)
+    with connection.cursor() as cursor:
+        cursor.execute(f'TRUNCATE {tables} CASCADE')
+
+
+def ingestion_benchmarks(names, rows, repeat):
+    # Rows per second of loading `rows` generated rows into empty tables, best of `repeat`
+    rng = np.random.default_rng(0)
+    customer_count = max(rows // 10, 1)
+    customers = customers_frame(1, customer_count if 'ingest_customers' not in names else rows, rng)
+    loans = loans_frame(1, rows, customer_count, rng, date.today())
+    results = {}
+    for name in names:
+        timings = []
+        for _ in range(repeat):
+            _truncate(Customer, Loan, CustomerCreditSummary, IngestionCheckpoint)
+            if name == 'ingest_loans':
+                load_customers(customers.head(customer_count))
+                frame, load = loans, load_loans
+            else:
+                frame, load = customers, load_customers
+            start = time.perf_counter()
+            result = load(frame)
+            timings.append(time.perf_counter() - start)
+        results[name] = {
+            "rows": len(frame),
+            "created": result["created"],
+            "seconds": round(min(timings), 4),
+            "rows_per_second": round(len(frame) / min(timings), 1),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=CPU_BENCHMARKS + DB_BENCHMARKS,
+                        default=list(CPU_BENCHMARKS + DB_BENCHMARKS))
+    parser.add_argument('--batches', type=int, default=200, help='Timed batches per CPU benchmark')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Calls per batch')
+    parser.add_argument('--rows', type=int, default=100_000, help='Rows per ingestion benchmark')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per ingestion benchmark; the fastest counts')
+    parser.add_argument('--json', metavar='PATH', help='Write the results as JSON to PATH (- for stdout)')
+    args = parser.parse_args()
+
+    results = cpu_benchmarks([name for name in args.only if name in CPU_BENCHMARKS], args.batches, args.batch_size)
+    database = [name for name in args.only if name in DB_BENCHMARKS]
+    if database:
+        with scratch_database():
+            results.update(ingestion_benchmarks(database, args.rows, args.repeat))
+
+    if args.json:
+        write_report(args.json, 'micro', results, vars(args))
+        return
+    for name, result in results.items():
+        if 'rows_per_second' in result:
+            print(f"{name:>20}: {result['rows_per_second']:>12,.0f} rows/s ({result['rows']} rows in {result['seconds']} s)")
+        else:
+            print(f"{name:>20}: p50 {result['p50_ms'] * 1000:8.3f} us  p95 {result['p95_ms'] * 1000:8.3f} us  "
+                  f"p99 {result['p99_ms'] * 1000:8.3f} us  ({result['calls_per_second']:,.0f} calls/s)")
+
+
+if __name__ == '__main__':
+    main()
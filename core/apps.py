@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from .metrics import install_query_hook
+
+        # Every connection gets the query hook the request metrics use
+        connection_created.connect(install_query_hook, dispatch_uid='core.metrics.install_query_hook')
@@ -0,0 +1,262 @@
+import io
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Q
+
+from customer.lookup import forget_all
+from customer.models import Customer
+from loan.cache import invalidate_all
+from loan.models import CustomerCreditSummary, Loan
+
+# Spreadsheet column -> model field
+CUSTOMER_COLUMNS = {
+    'Customer ID': 'customer_id',
+    'First Name': 'first_name',
+    'Last Name': 'last_name',
+    'Age': 'age',
+    'Phone Number': 'phone_number',
+    'Monthly Salary': 'monthly_salary',
+    'Approved Limit': 'approved_limit',
+}
+
+LOAN_COLUMNS = {
+    'Customer ID': 'customer_id',
+    'Loan ID': 'loan_id',
+    'Loan Amount': 'loan_amount',
+    'Tenure': 'tenure',
+    'Interest Rate': 'interest_rate',
+    'Monthly payment': 'monthly_repayment',
+    'EMIs paid on Time': 'emis_paid_on_time',
+    'Date of Approval': 'approval_date',
+    'End Date': 'end_date',
+}
+
+PHONE_NUMBER_PATTERN = r'^\+?\d{10,15}$'
+BATCH_SIZE = 5000
+
+
+class Rejects:
+    # Collects per-row validation failures, keyed by the row's position in the source file
+
+    def __init__(self):
+        self.errors = {}
+
+    def add(self, df, mask, message):
+        # Record `message` for every row of `df` selected by the boolean `mask`
+        for row in df.index[np.asarray(mask, dtype=bool)]:
+            self.errors.setdefault(int(row), []).append(message)
+
+    def __len__(self):
+        return len(self.errors)
+
+    def rows(self):
+        return set(self.errors)
+
+    def as_list(self, row_offset=2):
+        # Row numbers as a spreadsheet user sees them: 1-based, after the header line
+        return [{"row": row + row_offset, "errors": errors} for row, errors in sorted(self.errors.items())]
+
+
+def _select_columns(df, columns):
+    missing = [column for column in columns if column not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    return df[list(columns)].rename(columns=columns)
+
+
+def _to_number(df, rejects, field, integer=False):
+    values = pd.to_numeric(df[field], errors='coerce')
+    invalid = values.isna()
+    if integer:
+        invalid |= values.notna() & (values != np.floor(values))
+    rejects.add(df, invalid, f"{field} must be a valid {'integer' if integer else 'number'}.")
+    return values
+
+
+def _to_date(df, rejects, field, required=True):
+    values = df[field]
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        # Excel cells that were not typed as dates arrive as dd/mm/YYYY strings
+        parsed = pd.to_datetime(values, format='%d/%m/%Y', errors='coerce')
+        values = parsed.fillna(pd.to_datetime(values, errors='coerce'))
+    if required:
+        rejects.add(df, values.isna(), f"{field} must be a valid date.")
+    return values.dt.date
+
+
+def prepare_customers(df):
+    # Coerce and validate whole columns at once; returns the clean frame and the rejects
+    rejects = Rejects()
+    df = _select_columns(df, CUSTOMER_COLUMNS)
+
+    for field in ('customer_id', 'age'):
+        df[field] = _to_number(df, rejects, field, integer=True)
+    for field in ('monthly_salary', 'approved_limit'):
+        df[field] = _to_number(df, rejects, field)
+    for field in ('first_name', 'last_name'):
+        df[field] = df[field].fillna('').astype(str).str.strip()
+        rejects.add(df, df[field] == '', f"{field} is required.")
+    df['phone_number'] = df['phone_number'].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+
+    rejects.add(df, (df['age'] < 18) | (df['age'] > 100), 'Age must be between 18 and 100.')
+    rejects.add(df, df['monthly_salary'] <= 0, 'Monthly salary must be a positive number.')
+    rejects.add(df, ~df['phone_number'].str.match(PHONE_NUMBER_PATTERN), 'Phone number must be valid with 10 to 15 digits.')
+    rejects.add(df, df['customer_id'].duplicated(keep='first'), 'Duplicate customer ID in file.')
+    rejects.add(df, df['phone_number'].duplicated(keep='first'), 'Duplicate phone number in file.')
+
+    df = df.drop(index=list(rejects.rows()))
+    for field in ('customer_id', 'age'):
+        df[field] = df[field].astype(np.int64)
+    return df, rejects
+
+
+def prepare_loans(df):
+    rejects = Rejects()
+    df = _select_columns(df, LOAN_COLUMNS)
+
+    for field in ('customer_id', 'loan_id', 'tenure', 'emis_paid_on_time'):
+        df[field] = _to_number(df, rejects, field, integer=True)
+    for field in ('loan_amount', 'interest_rate', 'monthly_repayment'):
+        df[field] = _to_number(df, rejects, field)
+    df['approval_date'] = _to_date(df, rejects, 'approval_date')
+    df['end_date'] = _to_date(df, rejects, 'end_date', required=False)
+
+    # Same rules as Loan.clean
+    rejects.add(df, df['loan_amount'] <= 0, 'Loan amount must be a positive number.')
+    rejects.add(df, df['monthly_repayment'] <= 0, 'Monthly repayment must be a positive number.')
+    rejects.add(df, ~df['interest_rate'].between(0, 50), 'Interest rate must be between 0 and 50.')
+    rejects.add(df, ~df['tenure'].between(1, 360), 'Tenure must be between 1 and 360 months.')
+    rejects.add(df, df['emis_paid_on_time'] > df['tenure'], 'EMIs paid on time cannot exceed the loan tenure.')
+    rejects.add(df, df.duplicated(['loan_id', 'customer_id'], keep='first'), 'Duplicate loan ID for this customer in file.')
+
+    df = df.drop(index=list(rejects.rows()))
+    for field in ('customer_id', 'loan_id', 'tenure', 'emis_paid_on_time'):
+        df[field] = df[field].astype(np.int64)
+
+    # Derive missing end dates the way Loan.save does
+    missing_end = df['end_date'].isna()
+    if missing_end.any():
+        df.loc[missing_end, 'end_date'] = [
+            approval_date + relativedelta(months=int(tenure))
+            for approval_date, tenure in zip(df.loc[missing_end, 'approval_date'], df.loc[missing_end, 'tenure'])
+        ]
+    invalid_end = df['end_date'] <= df['approval_date']
+    rejects.add(df, invalid_end, 'End date must be later than the approval date.')
+    return df[~invalid_end.to_numpy()], rejects
+
+
+def _copy_rows(model, df, fields, unique_fields):
+    # Stream rows into a session-local staging table with COPY FROM STDIN, then
+    # upsert them into the model's table on its natural key
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    staging = quote(f'{model._meta.db_table}_staging')
+    columns = [quote(model._meta.get_field(field).column) for field in fields]
+    keys = [quote(model._meta.get_field(field).column) for field in unique_fields]
+    column_list = ', '.join(columns)
+    updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns if column not in keys)
+
+    buffer = io.StringIO()
+    df[fields].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TEMPORARY TABLE IF NOT EXISTS {staging} ON COMMIT DROP AS '
+                       f'SELECT {column_list} FROM {table} WITH NO DATA')
+        cursor.execute(f'TRUNCATE {staging}')
+        copy_sql = f'COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)'
+        if hasattr(cursor, 'copy_expert'):  # psycopg2
+            cursor.copy_expert(copy_sql, buffer)
+        else:  # psycopg 3
+            with cursor.copy(copy_sql) as copy:
+                copy.write(buffer.getvalue())
+        cursor.execute(
+            f'INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging} '
+            f'ON CONFLICT ({", ".join(keys)}) DO UPDATE SET {updates}'
+        )
+
+
+def _write_rows(model, df, fields, unique_fields, method, batch_size):
+    # Upsert the rows: new natural keys are inserted, existing ones updated. COPY stages the
+    # whole frame in one stream; bulk_create sends batch_size rows per statement.
+    if method == 'copy':
+        _copy_rows(model, df, fields, unique_fields)
+        return
+    model.objects.bulk_create(
+        [model(**row) for row in df[fields].to_dict('records')],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=[model._meta.get_field(field).name for field in unique_fields],
+        update_fields=[field for field in fields if field not in unique_fields],
+    )
+
+
+def _default_method():
+    return 'copy' if connection.vendor == 'postgresql' else 'bulk_create'
+
+
+def load_customers(df, method=None, batch_size=BATCH_SIZE):
+    # Validate and insert a frame of customer rows; returns the counts and per-row rejects
+    method = method or _default_method()
+    df, rejects = prepare_customers(df)
+
+    # Rows are upserted on the customer ID, so re-running a file is idempotent. The same
+    # lookup finds phone numbers already registered to a different customer.
+    existing = pd.DataFrame(
+        Customer.objects.filter(Q(customer_id__in=df['customer_id'].tolist()) | Q(phone_number__in=df['phone_number'].tolist()))
+        .values_list('customer_id', 'phone_number'),
+        columns=['customer_id', 'phone_number'],
+    )
+    owners = df['phone_number'].map(existing.set_index('phone_number')['customer_id'])
+    taken = owners.notna() & (owners != df['customer_id'])
+    rejects.add(df, taken, 'Phone number already registered to another customer.')
+    df = df[~taken.to_numpy()]
+    updated = int(df['customer_id'].isin(existing['customer_id']).sum())
+
+    fields = list(CUSTOMER_COLUMNS.values())
+    with transaction.atomic():
+        _write_rows(Customer, df, fields, ['customer_id'], method, batch_size)
+        # Explicit IDs bypass the primary key sequence, so move it past them
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Customer]):
+                cursor.execute(sql)
+        # Upserts bypass the model signals that keep the customer and loan caches current
+        forget_all()
+        invalidate_all()
+
+    return {"created": len(df) - updated, "updated": updated, "rejected": rejects.as_list()}
+
+
+def load_loans(df, method=None, batch_size=BATCH_SIZE):
+    # Validate and insert a frame of loan rows; returns the counts and per-row rejects.
+    # The credit summaries of the frame's customers are rebuilt in the same transaction,
+    # so create-loan never decides on a summary that leaves out committed loans.
+    method = method or _default_method()
+    df, rejects = prepare_loans(df)
+
+    # Resolve the customer foreign keys with a single lookup
+    customer_ids = set(Customer.objects.filter(customer_id__in=df['customer_id'].unique().tolist()).values_list('customer_id', flat=True))
+    unknown = ~df['customer_id'].isin(customer_ids)
+    rejects.add(df, unknown, 'Customer not found.')
+    df = df[~unknown.to_numpy()]
+
+    existing = pd.DataFrame(
+        Loan.objects.filter(customer_id__in=df['customer_id'].unique().tolist(), loan_id__in=df['loan_id'].unique().tolist())
+        .values_list('loan_id', 'customer_id'),
+        columns=['loan_id', 'customer_id'],
+    )
+    updated = int(pd.MultiIndex.from_frame(df[['loan_id', 'customer_id']]).isin(pd.MultiIndex.from_frame(existing)).sum())
+
+    # Rows are upserted on the (loan_id, customer) natural key, so re-running a file is idempotent
+    fields = list(LOAN_COLUMNS.values())
+    with transaction.atomic():
+        _write_rows(Loan, df, fields, ['loan_id', 'customer_id'], method, batch_size)
+        # Keep newly issued loan IDs above the ones just ingested
+        Loan.sync_loan_id_sequence()
+        CustomerCreditSummary.rebuild_locked(df['customer_id'].unique().tolist())
+        invalidate_all()
+
+    return {"created": len(df) - updated, "updated": updated, "rejected": rejects.as_list()}
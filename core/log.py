@@ -0,0 +1,204 @@
+import atexit
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import weakref
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler
+
+# Logging that stays off the hot path. Callers only filter and enqueue the record; a listener
+# thread per process formats it as one JSON line and writes batches of them at a time. Records
+# from chatty loggers (one per ingested row, say) can be sampled down before they are queued.
+
+# Attributes every LogRecord has; anything else on a record came in through `extra=`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+class JSONFormatter(logging.Formatter):
+    # One JSON object per record, carrying the `extra=` fields alongside the standard ones
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    # Keep one record in `rates[logger]` from the named loggers and their children; the
+    # first is always kept. Records above `max_level` always pass, so errors are never lost.
+
+    def __init__(self, rates=None, max_level='WARNING'):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self.max_level = max_level if isinstance(max_level, int) else logging.getLevelName(max_level)
+        self.counters = {name: itertools.count() for name in self.rates}
+
+    def _rate_for(self, name):
+        while name:
+            if name in self.rates:
+                return name
+            name = name.rpartition('.')[0]
+        return None
+
+    def filter(self, record):
+        if record.levelno > self.max_level:
+            return True
+        name = self._rate_for(record.name)
+        if name is None:
+            return True
+        # next() on itertools.count is atomic, so no lock is needed between threads
+        return next(self.counters[name]) % self.rates[name] == 0
+
+
+_handlers = weakref.WeakSet()
+
+
+class QueueLogHandler(QueueHandler):
+    # Buffer records for a listener thread that writes them, formatted by this handler's
+    # formatter, to `filename` and/or stderr. The listener wakes every `flush_interval`
+    # seconds, or as soon as `batch_size` records are waiting, and writes them all at once.
+    # The caller only appends to a deque; when `queue_size` records are already waiting,
+    # the record is dropped instead of blocking the caller, and counted in `dropped`.
+
+    def __init__(self, filename=None, stream=False, batch_size=256, flush_interval=0.5, queue_size=10000,
+                 encoding='utf-8'):
+        super().__init__(deque())
+        self.filename = os.path.abspath(filename) if filename else None
+        self.stream = stream
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.encoding = encoding
+        self.dropped = 0
+        self.thread = None
+        self.targets = []
+        self._start()
+        _handlers.add(self)
+
+    def _start(self):
+        self.targets = []
+        if self.filename:
+            self.targets.append(open(self.filename, 'a', encoding=self.encoding))
+        if self.stream:
+            self.targets.append(sys.stderr)
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.thread = threading.Thread(target=self._listen, name='log-listener', daemon=True)
+        self.thread.start()
+
+    def prepare(self, record):
+        # Merge the arguments now, while they still hold the values being logged; the
+        # formatting and the I/O happen on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        # deque.append is atomic, so callers take no lock
+        if len(self.queue) >= self.queue_size:
+            self.dropped += 1
+            return
+        self.queue.append(record)
+        if len(self.queue) >= self.batch_size and not self.wakeup.is_set():
+            self.wakeup.set()
+
+    def _listen(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            stopping = self.stopping
+            items = []
+            while True:
+                try:
+                    items.append(self.queue.popleft())
+                except IndexError:
+                    break
+            self._write([item for item in items if isinstance(item, logging.LogRecord)])
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()  # A flush() waiting on the records queued before it
+            if stopping:
+                return
+
+    def _write(self, records):
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record) + '\n')
+            except Exception:
+                self.handleError(record)
+        if not lines:
+            return
+        text = ''.join(lines)
+        for target in self.targets:
+            try:
+                target.write(text)
+                target.flush()
+            except Exception:
+                pass
+
+    def flush(self):
+        # Wait until every record queued so far has been written
+        if self.thread is None or not self.thread.is_alive():
+            return
+        written = threading.Event()
+        self.queue.append(written)
+        self.wakeup.set()
+        written.wait(timeout=5)
+
+    def close(self):
+        if self.thread is not None and self.thread.is_alive():
+            self.stopping = True
+            self.wakeup.set()
+            self.thread.join(timeout=5)
+        self.thread = None
+        self._close_targets()
+        super().close()
+
+    def _close_targets(self):
+        for target in self.targets:
+            if target is not sys.stderr:
+                target.close()
+        self.targets = []
+
+    def _restart_after_fork(self):
+        # Forked children (gunicorn and Celery workers) inherit the handler but not the
+        # listener thread; give each its own buffer and thread
+        self._close_targets()
+        self.queue = deque()
+        self.dropped = 0
+        self._start()
+
+
+def _restart_listeners():
+    for handler in list(_handlers):
+        if handler.thread is not None:
+            handler._restart_after_fork()
+
+
+def _close_listeners():
+    for handler in list(_handlers):
+        handler.close()
+
+
+os.register_at_fork(after_in_child=_restart_listeners)
+atexit.register(_close_listeners)
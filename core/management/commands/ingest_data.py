@@ -1,11 +1,31 @@
 # core/management/commands/ingest_data.py
 from django.core.management.base import BaseCommand
-from core.tasks import start_data_ingestion
+from core.readers import CHUNK_SIZE, FORMATS
+from core.tasks import CUSTOMER_DATA_PATH, LOAN_DATA_PATH, start_data_ingestion
 
 class Command(BaseCommand):
-    help = 'Ingest customer and loan data from Excel files'
+    help = 'Ingest customer and loan data from Excel, CSV or Parquet files'
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', default=CUSTOMER_DATA_PATH, help='Path of the customer data file')
+        parser.add_argument('--loans', default=LOAN_DATA_PATH, help='Path of the loan data file')
+        parser.add_argument('--format', choices=FORMATS, dest='file_format',
+                            help='Format of both files (detected from the extension by default)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                            help='Number of rows read and committed at a time')
+        parser.add_argument('--partitions', type=int, default=1,
+                            help='Split the loan file into this many row ranges ingested in parallel by the Celery workers')
+        parser.add_argument('--force', action='store_true',
+                            help='Re-ingest files even if their contents were already ingested')
+
+    def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('Starting data ingestion...'))
-        start_data_ingestion()
+        start_data_ingestion(
+            customer_path=options['customers'],
+            loan_path=options['loans'],
+            file_format=options['file_format'],
+            chunk_size=options['chunk_size'],
+            partitions=options['partitions'],
+            force=options['force'],
+        )
         self.stdout.write(self.style.SUCCESS('Data ingestion running...'))
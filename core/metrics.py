@@ -0,0 +1,329 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Per-route request metrics for this process, in the Prometheus text format.
+#
+# RequestMetricsMiddleware samples METRICS_SAMPLE_RATE of the requests. For a sampled request
+# it records the wall time and, through a database execute wrapper, the time spent in
+# queries, the query count and how many queries repeated an earlier one verbatim. Requests
+# that are not sampled, and queries outside a sampled request, only pay for a ContextVar read.
+#
+# Each process keeps its own figures. With METRICS_DIR set, as in the production settings,
+# every process also writes them to its own file in that directory from a background thread
+# (at most every METRICS_FLUSH_INTERVAL seconds, and only when they changed), and /metrics
+# serves the sum of all the files. So whichever gunicorn worker answers the scrape, the
+# counters cover all of them, including workers that have since been recycled. gunicorn.conf.py
+# empties the directory when the server starts.
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+DEFAULT_FLUSH_INTERVAL = 1.0  # Seconds
+
+HISTOGRAMS = (
+    ('http_request_duration_seconds', 'Wall time of sampled requests by route.', DURATION_BUCKETS),
+    ('http_request_db_duration_seconds', 'Time sampled requests spent in database queries by route.', DURATION_BUCKETS),
+    ('http_request_queries', 'Database queries per sampled request by route.', QUERY_BUCKETS),
+    ('http_request_duplicate_queries', 'Queries per sampled request that repeat an earlier one, SQL and parameters alike.', QUERY_BUCKETS),
+)
+
+_collector = ContextVar('query_collector', default=None)
+
+
+class Histogram:
+    # Fixed-bucket histogram; bucket i counts observations <= buckets[i], the last one the rest
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        # (upper bound, observations at or below it) pairs, ending with +Inf
+        total = 0
+        for bound, count in zip((*self.buckets, float('inf')), self.counts):
+            total += count
+            yield bound, total
+
+
+class QueryCollector:
+    # Database activity of one request
+
+    def __init__(self):
+        self.time = 0.0
+        self.count = 0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql, repr(params)] += 1
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values())
+
+
+def collect_queries(execute, sql, params, many, context):
+    # Execute wrapper installed on every connection (see CoreConfig.ready); a no-op unless
+    # the current request is being sampled
+    collector = _collector.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    return collector(execute, sql, params, many, context)
+
+
+def install_query_hook(connection, **kwargs):
+    # connection_created receiver. The wrapper list lives on the connection object, which
+    # is reused across reconnects, so install the hook only once.
+    if collect_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(collect_queries)
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}  # (metric, route) -> Histogram
+        self.requests = Counter()  # (route, method, status) -> count
+
+    def record(self, route, method, status, duration, collector):
+        values = (duration, collector.time, collector.count, collector.duplicates)
+        with self.lock:
+            for (name, _, buckets), value in zip(HISTOGRAMS, values):
+                histogram = self.histograms.get((name, route))
+                if histogram is None:
+                    histogram = self.histograms[name, route] = Histogram(buckets)
+                histogram.observe(value)
+            self.requests[route, method, status] += 1
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.requests.clear()
+
+    def snapshot(self):
+        # The figures as plain JSON-serializable lists
+        with self.lock:
+            return {
+                "requests": [[*key, count] for key, count in self.requests.items()],
+                "histograms": [[name, route, histogram.counts, histogram.sum, histogram.count]
+                               for (name, route), histogram in self.histograms.items()],
+            }
+
+    def merge(self, snapshot):
+        # Add another process's snapshot() to these figures
+        buckets = {name: bucket_bounds for name, _, bucket_bounds in HISTOGRAMS}
+        with self.lock:
+            for route, method, status, count in snapshot["requests"]:
+                self.requests[route, method, status] += count
+            for name, route, counts, total, count in snapshot["histograms"]:
+                if name not in buckets or len(counts) != len(buckets[name]) + 1:
+                    continue  # Written with other buckets; skip rather than misreport
+                histogram = self.histograms.get((name, route))
+                if histogram is None:
+                    histogram = self.histograms[name, route] = Histogram(buckets[name])
+                histogram.counts = [mine + theirs for mine, theirs in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += count
+
+    def render(self):
+        lines = [
+            '# HELP http_requests_total Sampled requests by route, method and status.',
+            '# TYPE http_requests_total counter',
+        ]
+        with self.lock:
+            for (route, method, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{route="{_escape(route)}",method="{method}",status="{status}"}} {count}')
+            for name, help_text, _ in HISTOGRAMS:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for (metric, route), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    label = f'route="{_escape(route)}"'
+                    for bound, count in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{{label},le="{_format_bound(bound)}"}} {count}')
+                    lines.append(f'{name}_sum{{{label}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{label}}} {histogram.count}')
+        return lines
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+request_metrics = RequestMetrics()
+
+
+def sample_rate():
+    return getattr(settings, 'METRICS_SAMPLE_RATE', 0)
+
+
+def should_sample():
+    # Every request passes through here, which makes it the place to start the exporter of a
+    # freshly forked worker
+    if exporter.thread is None and metrics_dir():
+        exporter.start()
+    rate = sample_rate()
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def start_request():
+    # Begin collecting the queries of a sampled request; returns what finish_request needs
+    collector = QueryCollector()
+    return collector, _collector.set(collector), time.perf_counter()
+
+
+def finish_request(request, response, state):
+    collector, token, start = state
+    duration = time.perf_counter() - start
+    _collector.reset(token)
+    match = getattr(request, 'resolver_match', None)
+    route = match.view_name if match else 'unmatched'
+    status = response.status_code if response is not None else 500
+    request_metrics.record(route, request.method, status, duration, collector)
+
+
+def process_snapshot():
+    # This process's request figures plus the loan cache counters that loan.cache already keeps
+    from loan.cache import cache_stats
+
+    return {**request_metrics.snapshot(), "cache": dict(cache_stats())}
+
+
+def cache_metric_lines(cache):
+    lines = [
+        '# HELP loan_cache_lookups_total Loan cache lookups by cached value and outcome.',
+        '# TYPE loan_cache_lookups_total counter',
+    ]
+    for key, count in sorted(cache.items()):
+        name, _, outcome = key.rpartition('.')
+        lines.append(f'loan_cache_lookups_total{{name="{_escape(name)}",outcome="{outcome}"}} {count}')
+    return lines
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+class SnapshotExporter:
+    # Writes this process's snapshot to METRICS_DIR/metrics-<pid>-<nonce>.json from a daemon
+    # thread. The nonce keeps a worker that is handed a recycled worker's PID from
+    # overwriting that worker's file, which would make the counters go backwards.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.written = None  # The last (path, snapshot) written, to skip unchanged ones
+        self.nonce = uuid.uuid4().hex[:8]
+
+    def start(self):
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, name='metrics-exporter', daemon=True)
+                    self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(getattr(settings, 'METRICS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL))
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not write the metrics snapshot.")
+
+    def flush(self):
+        directory = metrics_dir()
+        if not directory:
+            return
+        snapshot = process_snapshot()
+        path = os.path.join(directory, f'metrics-{os.getpid()}-{self.nonce}.json')
+        with self.lock:
+            if (path, snapshot) == self.written:
+                return
+            os.makedirs(directory, exist_ok=True)
+            # Write then rename, so a concurrent scrape never reads a partial file
+            with open(f'{path}.tmp', 'w') as file:
+                json.dump(snapshot, file)
+            os.replace(f'{path}.tmp', path)
+            self.written = path, snapshot
+
+    def reset_after_fork(self):
+        # A forked child starts from zero: the parent's figures are the parent's to export
+        self.lock = threading.Lock()
+        self.thread = None
+        self.written = None
+        self.nonce = uuid.uuid4().hex[:8]
+
+
+exporter = SnapshotExporter()
+
+
+def _reset_after_fork():
+    request_metrics.reset()
+    exporter.reset_after_fork()
+
+
+def _flush_at_exit():
+    if exporter.thread is None:
+        return  # Served no requests, e.g. the gunicorn master
+    try:
+        exporter.flush()
+    except Exception:
+        pass
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(_flush_at_exit)
+
+
+def collect_snapshots(directory):
+    # The sum of every process's snapshot in `directory`
+    combined, cache = RequestMetrics(), Counter()
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        try:
+            with open(path) as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            continue  # Removed or replaced while listing
+        combined.merge(snapshot)
+        cache.update(snapshot.get("cache", {}))
+    return combined, cache
+
+
+def render_metrics():
+    directory = metrics_dir()
+    if not directory:
+        snapshot = process_snapshot()
+        return '\n'.join(request_metrics.render() + cache_metric_lines(snapshot["cache"])) + '\n'
+    # Bring this process's file up to date, then serve the sum over all processes
+    exporter.flush()
+    combined, cache = collect_snapshots(directory)
+    return '\n'.join(combined.render() + cache_metric_lines(cache)) + '\n'
@@ -0,0 +1,39 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .metrics import finish_request, should_sample, start_request
+
+
+class RequestMetricsMiddleware:
+    # Record per-route timings and query counts for a sample of requests (see core.metrics).
+    # Place it first in MIDDLEWARE so the wall time covers the rest of the stack.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not should_sample():
+            return self.get_response(request)
+        state = start_request()
+        response = None
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request(request, response, state)
+        return response
+
+    async def __acall__(self, request):
+        if not should_sample():
+            return await self.get_response(request)
+        state = start_request()
+        response = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(request, response, state)
+        return response
@@ -1,3 +1,53 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 
-# Create your models here.
+REJECT_SAMPLE_SIZE = 100  # Rejected rows kept in a run's result; the rest are only counted and logged
+
+
+class IngestionCheckpoint(models.Model):
+    # Progress of one ingestion run over a row range of a data file, keyed by the file's content hash
+    kind = models.CharField(max_length=20)  # 'customer' or 'loan'
+    path = models.CharField(max_length=500)
+    content_hash = models.CharField(max_length=64)  # SHA-256 of the file contents
+    start = models.IntegerField(default=0)
+    stop = models.IntegerField(null=True, blank=True)  # None reads to the end of the file
+    next_row = models.IntegerField(default=0)  # First row not yet committed
+    completed = models.BooleanField(default=False)
+    result = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # A NULL stop (read to the end) must match itself, or concurrent full-file runs
+            # could each create a checkpoint. Indexing COALESCE(stop, -1) does that on every
+            # PostgreSQL version; nulls_distinct needs 15 and is silently dropped before it.
+            models.UniqueConstraint('kind', 'content_hash', 'start', Coalesce('stop', models.Value(-1)),
+                                    name='ingestion_checkpoint_range'),
+        ]
+
+    def advance(self, next_row, chunk_result):
+        # Record a committed chunk; called inside the chunk's transaction so both commit together.
+        # Rejects are counted, with only the first REJECT_SAMPLE_SIZE kept, so the saved result
+        # stays small however many rows a file rejects.
+        self.next_row = next_row
+        for key in ('created', 'updated'):
+            self.result[key] = self.result.get(key, 0) + chunk_result[key]
+        self.result['rejected_count'] = self.result.get('rejected_count', 0) + len(chunk_result['rejected'])
+        sample = self.result.get('rejected', [])
+        if len(sample) < REJECT_SAMPLE_SIZE:
+            self.result['rejected'] = sample + chunk_result['rejected'][:REJECT_SAMPLE_SIZE - len(sample)]
+        self.save(update_fields=['next_row', 'result', 'updated_at'])
+
+    def restart(self, start):
+        # Start a forced run over; saved at once, so an interrupted run is not left marked
+        # completed with the partial counts of the chunks it did commit
+        self.next_row, self.result, self.completed = start, {}, False
+        self.save(update_fields=['next_row', 'result', 'completed', 'updated_at'])
+
+    def finish(self):
+        self.completed = True
+        self.save(update_fields=['completed', 'updated_at'])
+
+    def __str__(self):
+        return f'{self.kind} {self.path} [{self.start}:{self.stop}] at row {self.next_row}'
@@ -0,0 +1,114 @@
+import hashlib
+import os
+
+import pandas as pd
+from openpyxl import load_workbook
+
+CHUNK_SIZE = 10000
+FORMATS = ('xlsx', 'csv', 'parquet')
+
+
+def file_digest(path):
+    # SHA-256 of the file contents, read in blocks
+    with open(path, 'rb') as file:
+        return hashlib.file_digest(file, 'sha256').hexdigest()
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in FORMATS:
+        return extension
+    raise ValueError(f"Cannot detect the format of {path}; expected one of: {', '.join(FORMATS)}")
+
+
+def _read_xlsx(path, chunk_size, start, stop):
+    # openpyxl's read-only mode streams rows from the sheet XML instead of building the whole workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        header = next(sheet.iter_rows(max_row=1, values_only=True), None)
+        if header is None:
+            return
+        # Sheet rows are 1-based and row 1 is the header
+        rows = sheet.iter_rows(min_row=start + 2, max_row=stop + 1 if stop is not None else None, values_only=True)
+        chunk, positions = [], []
+        for position, row in enumerate(rows, start=start):
+            if all(value is None for value in row):
+                continue
+            chunk.append(row)
+            positions.append(position)
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=header, index=positions)
+                chunk, positions = [], []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header, index=positions)
+    finally:
+        workbook.close()
+
+
+def _read_csv(path, chunk_size, start, stop):
+    # Chunk indexes continue from one chunk to the next, counted from the first row read
+    nrows = stop - start if stop is not None else None
+    with pd.read_csv(path, chunksize=chunk_size, skiprows=range(1, start + 1), nrows=nrows) as reader:
+        for chunk in reader:
+            chunk.index += start
+            yield chunk
+
+
+def _parquet_file(path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Reading Parquet files requires the pyarrow package.")
+    return pq.ParquetFile(path)
+
+
+def _read_parquet(path, chunk_size, start, stop):
+    offset = 0
+    for batch in _parquet_file(path).iter_batches(batch_size=chunk_size):
+        batch_start, offset = offset, offset + batch.num_rows
+        if offset <= start:
+            continue
+        if stop is not None and batch_start >= stop:
+            break
+        # Trim batches that straddle the requested range
+        low = max(start - batch_start, 0)
+        high = batch.num_rows if stop is None else min(stop - batch_start, batch.num_rows)
+        chunk = batch.slice(low, high - low).to_pandas()
+        chunk.index = range(batch_start + low, batch_start + high)
+        yield chunk
+
+
+def count_rows(path, file_format=None):
+    # Number of data rows (excluding the header), used to plan partitions
+    file_format = file_format or detect_format(path)
+    if file_format == 'xlsx':
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            # The sheet's dimension record gives the row count without scanning the sheet
+            max_row = workbook.active.max_row
+            if max_row is None:
+                max_row = sum(1 for _ in workbook.active.iter_rows(values_only=True))
+            return max(max_row - 1, 0)
+        finally:
+            workbook.close()
+    if file_format == 'csv':
+        with pd.read_csv(path, usecols=[0], chunksize=CHUNK_SIZE * 10) as reader:
+            return sum(len(chunk) for chunk in reader)
+    if file_format == 'parquet':
+        return _parquet_file(path).metadata.num_rows
+    raise ValueError(f"Unsupported format {file_format}; expected one of: {', '.join(FORMATS)}")
+
+
+def read_chunks(path, file_format=None, chunk_size=CHUNK_SIZE, start=0, stop=None):
+    # Yield the rows of a data file as DataFrames of at most chunk_size rows, so memory
+    # stays flat regardless of the file size. Each chunk's index is the row's position
+    # in the file, which keeps reject row numbers meaningful across chunks.
+    # `start`/`stop` restrict the read to the data rows in [start, stop).
+    file_format = file_format or detect_format(path)
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be a positive integer.")
+    readers = {'xlsx': _read_xlsx, 'csv': _read_csv, 'parquet': _read_parquet}
+    if file_format not in readers:
+        raise ValueError(f"Unsupported format {file_format}; expected one of: {', '.join(FORMATS)}")
+    return readers[file_format](path, chunk_size, start, stop)
@@ -1,97 +1,144 @@
 import logging
-from celery import shared_task, chain
-import pandas as pd
-from customer.models import Customer
-from loan.models import Loan
-from django.utils.dateparse import parse_date
-from datetime import datetime
+import math
+from celery import shared_task, chain, chord, group
+from django.db import OperationalError, transaction
+from loan.cache import invalidate_all
+from .ingestion import load_customers, load_loans
+from .models import REJECT_SAMPLE_SIZE, IngestionCheckpoint
+from .readers import CHUNK_SIZE, count_rows, file_digest, read_chunks
 
 # Create a logger for this module
 logger = logging.getLogger(__name__)
+# One message per rejected row; LOGGING samples this logger down on busy runs
+row_logger = logging.getLogger('core.rows')
+
+CUSTOMER_DATA_PATH = 'data/customer_data.xlsx'
+LOAN_DATA_PATH = 'data/loan_data.xlsx'
+
+
+def _empty_result():
+    # `rejected` holds the first REJECT_SAMPLE_SIZE rejected rows, `rejected_count` all of them
+    return {"created": 0, "updated": 0, "rejected": [], "rejected_count": 0}
+
+
+def _merge_result(total, result):
+    total["created"] += result["created"]
+    total["updated"] += result["updated"]
+    total["rejected_count"] += result["rejected_count"]
+    total["rejected"] += result["rejected"][:max(REJECT_SAMPLE_SIZE - len(total["rejected"]), 0)]
+    return total
+
+
+def _log_rejects(kind, result):
+    # The full list is in the task result
+    for reject in result['rejected']:
+        row_logger.warning("Rejected %s row %s: %s", kind.lower(), reject['row'], '; '.join(reject['errors']),
+                           extra={"kind": kind.lower(), "row": reject['row'], "errors": reject['errors']})
+
+
+def _ingest_file(kind, load, path, file_format, chunk_size, start=0, stop=None, progress=None, force=False):
+    # Stream the file chunk by chunk. Each chunk commits together with the checkpoint
+    # recording it, so an interrupted run resumes after its last committed chunk and a
+    # file whose contents were already fully ingested is skipped.
+    checkpoint, _ = IngestionCheckpoint.objects.get_or_create(
+        kind=kind.lower(), content_hash=file_digest(path), start=start, stop=stop,
+        defaults={"path": path, "next_row": start},
+    )
+    if checkpoint.completed and not force:
+        logger.info(f"{kind} data in {path} is unchanged since it was last ingested, skipping.")
+        return {**_empty_result(), **checkpoint.result, "unchanged": True}
+    if checkpoint.completed:
+        checkpoint.restart(start)
+    if checkpoint.next_row > start:
+        logger.info(f"Resuming {kind.lower()} data ingestion from {path} at row {checkpoint.next_row}...")
+    else:
+        logger.info(f"Starting {kind.lower()} data ingestion from {path} (rows {start}-{stop if stop is not None else 'end'})...")
+
+    for number, chunk in enumerate(read_chunks(path, file_format, chunk_size, checkpoint.next_row, stop), start=1):
+        with transaction.atomic():
+            chunk_result = load(chunk)
+            checkpoint.advance(int(chunk.index[-1]) + 1, chunk_result)
+        logger.info(f"{kind} chunk {number}: {chunk_result['created']} created, "
+                    f"{chunk_result['updated']} updated, {len(chunk_result['rejected'])} rejected.")
+        _log_rejects(kind, chunk_result)
+        if progress:
+            progress(checkpoint.next_row - start)
+    checkpoint.finish()
+
+    result = {**_empty_result(), **checkpoint.result}
+    logger.info(f"{kind} data ingestion completed: {result['created']} created, "
+                f"{result['updated']} updated, {result['rejected_count']} rejected.")
+    return result
 
 
 @shared_task
-def ingest_customer_data():
-    try:
-        logger.info("Starting customer data ingestion...")
-        df = pd.read_excel('data/customer_data.xlsx')
-        for _, row in df.iterrows():
-            # Check if the customer already exists to avoid duplicates
-            # logger.info('='*100)
-            # logger.info(row, _)
-            customer, created = Customer.objects.get_or_create(
-                first_name=row['First Name'],
-                last_name=row['Last Name'],
-                age=row['Age'],
-                phone_number=str(row['Phone Number']),
-                monthly_salary=row['Monthly Salary'],
-                approved_limit=row['Approved Limit']
-            )
-            logger.info(customer)
-        logger.info("Customer data ingestion completed.")
-    except Exception as e:
-        logger.info(e)
-        logger.error(
-            f"Customer with ID {row['Customer ID']} not found in row: {row}")
-        return
+def ingest_customer_data(path=CUSTOMER_DATA_PATH, file_format=None, chunk_size=CHUNK_SIZE, force=False):
+    return _ingest_file('Customer', load_customers, path, file_format, chunk_size, force=force)
 
 
 @shared_task
-def ingest_loan_data(*args, **kwargs):
-    try:
-        logger.info("Starting loan data ingestion...")
-        df = pd.read_excel('data/loan_data.xlsx')
-        for _, row in df.iterrows():
-            # Add data to the Loan model
-            approval_date = row['Date of Approval']
-            end_date = row['End Date']
-
-            # Check if these values are datetime objects and convert if needed
-            if isinstance(approval_date, pd.Timestamp):
-                approval_date = approval_date.date()  # Extract the date part
-            else:
-                approval_date = datetime.strptime(
-                    approval_date, '%d/%m/%Y').date()
-
-            if isinstance(end_date, pd.Timestamp):
-                end_date = end_date.date()  # Extract the date part
-            else:
-                end_date = datetime.strptime(end_date, '%d/%m/%Y').date()
-
-            # Fetch customer from the database
-            try:
-                customer = Customer.objects.get(customer_id=row['Customer ID'])
-            except Customer.DoesNotExist:
-                logger.error(
-                    f"Customer with ID {row['Customer ID']} not found.")
-                continue
-
-            # Try to insert the loan, handle duplicate loan_id with different customers
-            try:
-                # Create the loan entry
-                Loan.objects.create(
-                    loan_id=row['Loan ID'],
-                    loan_amount=row['Loan Amount'],
-                    tenure=row['Tenure'],
-                    interest_rate=row['Interest Rate'],
-                    monthly_repayment=row['Monthly payment'],
-                    emis_paid_on_time=row['EMIs paid on Time'],
-                    approval_date=approval_date,
-                    end_date=end_date,
-                    customer=customer,
-                )
-                logger.info(
-                    f"Loan with ID {row['Loan ID']} successfully created for Customer {row['Customer ID']}.")
-            except IntegrityError as e:
-                logger.error(
-                    f"Error creating loan with ID {row['Loan ID']} for Customer {row['Customer ID']}: {e}")
-                continue
-
-        logger.info("Loan data ingestion completed.")
-    except Exception as e:
-        logger.error(f"Error during loan data ingestion: {e}")
+def ingest_loan_data(*args, path=LOAN_DATA_PATH, file_format=None, chunk_size=CHUNK_SIZE, force=False):
+    # Positional arguments receive the customer ingestion result when run in a chain
+    return _ingest_file('Loan', load_loans, path, file_format, chunk_size, force=force)
+
+
+@shared_task(bind=True, autoretry_for=(OperationalError,), retry_backoff=True, max_retries=3)
+def ingest_loan_partition(self, *args, path=LOAN_DATA_PATH, file_format=None, start=0, stop=None,
+                          chunk_size=CHUNK_SIZE, force=False):
+    # Ingest the loan rows in [start, stop). Rows are upserted and the partition has its own
+    # checkpoint, so a failed partition can be re-run on its own and resumes where it stopped.
+    # Each chunk rebuilds its customers' credit summaries as it commits.
+    def progress(rows_done):
+        if not self.request.called_directly and not self.request.is_eager:
+            self.update_state(state='PROGRESS', meta={"start": start, "stop": stop, "rows_done": rows_done})
+
+    result = _ingest_file('Loan', load_loans, path, file_format, chunk_size, start, stop, progress, force)
+    result["partition"] = [start, stop]
+    return result
+
+
+@shared_task
+def reconcile_loan_ingestion(results, total_rows=None):
+    # Chord callback: combine the partition results and check every row is accounted for.
+    # The partitions have already rebuilt the credit summaries chunk by chunk.
+    total = _empty_result()
+    for result in results:
+        _merge_result(total, result)
+    total["partitions"] = len(results)
+
+    accounted = total["created"] + total["updated"] + total["rejected_count"]
+    if total_rows is not None and accounted != total_rows:
+        logger.warning(f"Loan ingestion accounted for {accounted} of {total_rows} rows.")
+    total["rows"] = accounted
+
+    invalidate_all()
+    logger.info(f"Loan data ingestion reconciled across {len(results)} partitions: {total['created']} created, "
+                f"{total['updated']} updated, {total['rejected_count']} rejected.")
+    return total
+
+
+def plan_partitions(total_rows, partitions):
+    # Split [0, total_rows) into at most `partitions` contiguous row ranges of equal size
+    size = max(math.ceil(total_rows / max(partitions, 1)), 1)
+    return [(start, min(start + size, total_rows)) for start in range(0, total_rows, size)]
+
+
+def loan_ingestion_chord(path=LOAN_DATA_PATH, file_format=None, chunk_size=CHUNK_SIZE, partitions=1, force=False):
+    # Fan the loan file out as one task per row range, reconciled by a chord callback
+    total_rows = count_rows(path, file_format)
+    header = group(
+        ingest_loan_partition.s(path=path, file_format=file_format, start=start, stop=stop, chunk_size=chunk_size, force=force)
+        for start, stop in plan_partitions(total_rows, partitions)
+    )
+    return chord(header, reconcile_loan_ingestion.s(total_rows=total_rows))
 
 
 # Chain tasks to ensure customer data is ingested first, then loan data
-def start_data_ingestion():
-    chain(ingest_customer_data.s(), ingest_loan_data.s())()
+def start_data_ingestion(customer_path=CUSTOMER_DATA_PATH, loan_path=LOAN_DATA_PATH, file_format=None,
+                         chunk_size=CHUNK_SIZE, partitions=1, force=False):
+    customers = ingest_customer_data.s(path=customer_path, file_format=file_format, chunk_size=chunk_size, force=force)
+    if partitions > 1:
+        loans = loan_ingestion_chord(loan_path, file_format, chunk_size, partitions, force)
+    else:
+        loans = ingest_loan_data.s(path=loan_path, file_format=file_format, chunk_size=chunk_size, force=force)
+    chain(customers, loans)()
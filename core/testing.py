@@ -0,0 +1,91 @@
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .metrics import QueryCollector
+
+# Test helpers that pin how much database work a code path does, so an accidental N+1
+# query or an extra aggregate fails the suite instead of only showing up in production.
+
+
+class QueryBudget(QueryCollector):
+    # QueryCollector that also keeps the SQL and counts the rows the statements sent back
+
+    def __init__(self):
+        super().__init__()
+        self.queries = []
+        self._rows = 0
+        self._server_side_cursors = []
+
+    def __call__(self, execute, sql, params, many, context):
+        result = super().__call__(execute, sql, params, many, context)
+        self.queries.append(sql)
+        cursor = context['cursor']
+        if getattr(cursor.cursor, 'name', None):
+            # QuerySet.iterator() reads through a server-side cursor, which only knows its
+            # row count once the rows have been fetched
+            self._server_side_cursors.append(cursor.cursor)
+        elif cursor.description is not None:
+            self._rows += max(cursor.rowcount, 0)
+        return result
+
+    @property
+    def rows(self):
+        return self._rows + sum(max(cursor.rowcount, 0) for cursor in self._server_side_cursors)
+
+    def describe(self):
+        return '\n'.join(f'{number}. {sql}' for number, sql in enumerate(self.queries, start=1))
+
+
+class QueryBudgetMixin:
+    # For TestCase classes: fail when the block runs more than `queries` queries or
+    # fetches more than `rows` rows (None leaves rows unchecked)
+
+    @contextmanager
+    def assertQueryBudget(self, queries, rows=None, using=DEFAULT_DB_ALIAS):
+        budget = QueryBudget()
+        with connections[using].execute_wrapper(budget):
+            yield budget
+        if budget.count > queries:
+            self.fail(f'{budget.count} queries executed, budget is {queries}:\n{budget.describe()}')
+        if rows is not None and budget.rows > rows:
+            self.fail(f'{budget.rows} rows fetched, budget is {rows}:\n{budget.describe()}')
+
+
+def seed_dataset(customers=50, max_loans=8, seed=0, today=None):
+    # A reproducible set of customers with 0..max_loans loans each, some closed and some
+    # active, with their credit summaries built. Returns the customers.
+    from customer.models import Customer
+    from loan.models import CustomerCreditSummary, Loan
+
+    rng = np.random.default_rng(seed)
+    today = today or date.today()
+    salaries = rng.integers(30, 300, customers) * 1000
+    # bulk_create skips Customer.save, so the approved limit is derived here
+    created = Customer.objects.bulk_create([
+        Customer(first_name=f'Seed{index}', last_name='Customer', age=int(rng.integers(21, 65)),
+                 phone_number=str(8000000000 + index), monthly_salary=int(salary),
+                 approved_limit=round(36 * int(salary), -5))
+        for index, salary in enumerate(salaries)
+    ])
+
+    loans = []
+    loan_id = 1
+    for customer in created:
+        for _ in range(int(rng.integers(0, max_loans + 1))):
+            tenure = int(rng.choice([12, 24, 36, 60]))
+            approval_date = today - timedelta(days=int(rng.integers(30, 2500)))
+            loans.append(Loan(
+                customer=customer, loan_id=loan_id, loan_amount=int(rng.integers(1, 20)) * 50000, tenure=tenure,
+                interest_rate=float(rng.choice([8, 10, 12, 14])), monthly_repayment=float(rng.integers(2000, 40000)),
+                emis_paid_on_time=int(rng.integers(0, tenure + 1)), approval_date=approval_date,
+                end_date=approval_date + relativedelta(months=tenure),
+            ))
+            loan_id += 1
+    Loan.objects.bulk_create(loans)
+    Loan.sync_loan_id_sequence()
+    CustomerCreditSummary.rebuild()
+    return created
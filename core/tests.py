@@ -1,3 +1,471 @@
-from django.test import TestCase
+import glob
+import json
+import logging
+import os
+import tempfile
+from datetime import date
+from unittest.mock import patch
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+import pandas as pd
+from django.db import IntegrityError, OperationalError, transaction
+from customer.models import Customer
+from loan.models import CustomerCreditSummary, Loan
+from loan.credit import aggregate_credit_profile, get_credit_profile
+from .ingestion import load_customers, load_loans
+from .log import JSONFormatter, QueueLogHandler, SamplingFilter
+from .metrics import QueryCollector, RequestMetrics, finish_request, request_metrics, start_request
+from .middleware import RequestMetricsMiddleware
+from .models import REJECT_SAMPLE_SIZE, IngestionCheckpoint
+from .readers import count_rows, read_chunks
+from .testing import QueryBudgetMixin, seed_dataset
+from .tasks import (
+    _log_rejects, ingest_customer_data, ingest_loan_data, ingest_loan_partition, plan_partitions, reconcile_loan_ingestion,
+)
 
-# Create your tests here.
+
+def customer_rows(count, start=1):
+    return pd.DataFrame({
+        'Customer ID': range(start, start + count),
+        'First Name': [f'First{index}' for index in range(count)],
+        'Last Name': [f'Last{index}' for index in range(count)],
+        'Age': [30] * count,
+        'Phone Number': [9000000000 + start + index for index in range(count)],
+        'Monthly Salary': [50000] * count,
+        'Approved Limit': [1800000] * count,
+    })
+
+
+def loan_rows(customer_ids, start=1000):
+    count = len(customer_ids)
+    return pd.DataFrame({
+        'Customer ID': customer_ids,
+        'Loan ID': range(start, start + count),
+        'Loan Amount': [100000] * count,
+        'Tenure': [12] * count,
+        'Interest Rate': [12.5] * count,
+        'Monthly payment': [8908] * count,
+        'EMIs paid on Time': [6] * count,
+        'Date of Approval': pd.to_datetime(['2023-01-15'] * count),
+        'End Date': pd.to_datetime(['2024-01-15'] * count),
+    })
+
+
+class BulkIngestionTests(TestCase):
+
+    def test_ingest_customers(self):
+        result = load_customers(customer_rows(50))
+        self.assertEqual(result, {'created': 50, 'updated': 0, 'rejected': []})
+        self.assertEqual(Customer.objects.count(), 50)
+        # The file's approved limit is kept as-is
+        self.assertEqual(Customer.objects.get(customer_id=7).approved_limit, 1800000)
+
+        # The primary key sequence continues after the ingested IDs
+        customer = Customer.objects.create(first_name='New', last_name='Customer', age=30,
+                                           phone_number='9999999999', monthly_salary=10000)
+        self.assertEqual(customer.customer_id, 51)
+
+    def test_customer_rejects(self):
+        df = customer_rows(5)
+        df.loc[1, 'Age'] = 12
+        df.loc[2, 'Phone Number'] = 'not-a-phone'
+        df.loc[3, 'Monthly Salary'] = 'abc'
+        df.loc[4, 'Customer ID'] = 1
+
+        result = load_customers(df)
+        self.assertEqual(result['created'], 1)
+        self.assertEqual([reject['row'] for reject in result['rejected']], [3, 4, 5, 6])
+        self.assertEqual(result['rejected'][0]['errors'], ['Age must be between 18 and 100.'])
+
+        # Re-ingesting a row updates it in place instead of creating a duplicate
+        df = customer_rows(1)
+        df.loc[0, 'Monthly Salary'] = 70000
+        result = load_customers(df)
+        self.assertEqual((result['created'], result['updated']), (0, 1))
+        self.assertEqual(Customer.objects.get(customer_id=1).monthly_salary, 70000)
+        self.assertEqual(Customer.objects.count(), 1)
+
+        # Phone numbers stay unique, within the file and against registered customers
+        df = customer_rows(3, start=10)
+        df.loc[1, 'Phone Number'] = df.loc[0, 'Phone Number']
+        df.loc[2, 'Phone Number'] = Customer.objects.get(customer_id=1).phone_number
+        result = load_customers(df)
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(result['rejected'], [
+            {'row': 3, 'errors': ['Duplicate phone number in file.']},
+            {'row': 4, 'errors': ['Phone number already registered to another customer.']},
+        ])
+
+    def test_ingest_loans(self):
+        load_customers(customer_rows(10))
+        customer_ids = [index % 10 + 1 for index in range(200)]
+
+        # Customer and existing-loan lookups, the staged COPY upsert, the loan ID sequence lock
+        # and sync, the summary locks and rebuild, and the savepoint
+        with self.assertNumQueries(16):
+            result = load_loans(loan_rows(customer_ids))
+        self.assertEqual(result, {'created': 200, 'updated': 0, 'rejected': []})
+        self.assertEqual(Loan.objects.count(), 200)
+
+        loan = Loan.objects.get(loan_id=1000)
+        self.assertEqual(loan.customer_id, 1)
+        self.assertEqual(loan.end_date, date(2024, 1, 15))
+
+        customer = Customer.objects.get(customer_id=3)
+        self.assertEqual(CustomerCreditSummary.objects.get(customer=customer).total_loans, 20)
+        self.assertEqual(get_credit_profile(customer), aggregate_credit_profile(customer))
+
+    def test_loan_rejects(self):
+        load_customers(customer_rows(2))
+        df = loan_rows([1, 2, 99, 1, 2])
+        df.loc[1, 'Tenure'] = 0
+        df.loc[3, 'Loan ID'] = 1000
+        df['Date of Approval'] = df['Date of Approval'].astype(object)
+        df.loc[4, 'Date of Approval'] = '31/02/2023'
+
+        result = load_loans(df, method='bulk_create')
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(result['rejected'], [
+            {'row': 3, 'errors': ['Tenure must be between 1 and 360 months.',
+                                  'EMIs paid on time cannot exceed the loan tenure.']},
+            {'row': 4, 'errors': ['Customer not found.']},
+            {'row': 5, 'errors': ['Duplicate loan ID for this customer in file.']},
+            {'row': 6, 'errors': ['approval_date must be a valid date.']},
+        ])
+
+        # Loans already in the table are upserted instead of failing the batch
+        df = loan_rows([1])
+        df.loc[0, 'EMIs paid on Time'] = 9
+        for method in ('copy', 'bulk_create'):
+            result = load_loans(df, method=method)
+            self.assertEqual(result, {'created': 0, 'updated': 1, 'rejected': []})
+        self.assertEqual(Loan.objects.get(loan_id=1000, customer_id=1).emis_paid_on_time, 9)
+        self.assertEqual(Loan.objects.count(), 1)
+
+    def test_ingest_data_files(self):
+        customers = load_customers(pd.read_excel('data/customer_data.xlsx'))
+        loans = load_loans(pd.read_excel('data/loan_data.xlsx'))
+        self.assertEqual(customers['created'], 300)
+        self.assertEqual(loans['created'], 782)
+        self.assertEqual(loans['rejected'], [])
+        # New loans are numbered above the highest ingested loan ID
+        self.assertEqual(Loan.generate_unique_loan_id(), 9997)
+
+
+class ChunkedReaderTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_xlsx_chunks(self):
+        chunks = list(read_chunks('data/customer_data.xlsx', chunk_size=128))
+        self.assertEqual([len(chunk) for chunk in chunks], [128, 128, 44])
+        self.assertEqual(chunks[1].index[0], 128)
+        self.assertEqual(list(chunks[0].columns), list(pd.read_excel('data/customer_data.xlsx', nrows=1).columns))
+
+    def test_csv_and_parquet_match_xlsx(self):
+        expected = pd.read_excel('data/loan_data.xlsx')
+        for file_format in ('csv', 'parquet'):
+            path = os.path.join(self.directory.name, f'loans.{file_format}')
+            getattr(expected, f'to_{file_format}')(path, index=False)
+
+            chunks = list(read_chunks(path, chunk_size=100))
+            self.assertEqual(len(chunks), 8)
+            combined = pd.concat(chunks)
+            self.assertEqual(list(combined.index), list(expected.index))
+            self.assertEqual(combined['Loan ID'].tolist(), expected['Loan ID'].tolist())
+
+    def test_row_ranges(self):
+        expected = pd.read_excel('data/loan_data.xlsx')
+        csv_path = os.path.join(self.directory.name, 'loans.csv')
+        parquet_path = os.path.join(self.directory.name, 'loans.parquet')
+        expected.to_csv(csv_path, index=False)
+        expected.to_parquet(parquet_path, index=False, row_group_size=100)
+
+        for path in ('data/loan_data.xlsx', csv_path, parquet_path):
+            self.assertEqual(count_rows(path), 782)
+            chunks = list(read_chunks(path, chunk_size=64, start=150, stop=450))
+            combined = pd.concat(chunks)
+            self.assertEqual(list(combined.index), list(range(150, 450)))
+            self.assertEqual(combined['Loan ID'].tolist(), expected['Loan ID'][150:450].tolist())
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            read_chunks('data/loans.json')
+
+
+class ChunkedIngestionTaskTests(TestCase):
+
+    def test_ingest_csv_in_chunks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            customers = os.path.join(directory, 'customers.csv')
+            loans = os.path.join(directory, 'loans.csv')
+            pd.read_excel('data/customer_data.xlsx').to_csv(customers, index=False)
+            df = pd.read_excel('data/loan_data.xlsx')
+            df['Date of Approval'] = df['Date of Approval'].dt.strftime('%d/%m/%Y')
+            df.to_csv(loans, index=False)
+
+            customer_result = ingest_customer_data(path=customers, chunk_size=64)
+            loan_result = ingest_loan_data(customer_result, path=loans, chunk_size=100)
+
+        self.assertEqual(customer_result['created'], 300)
+        self.assertEqual(loan_result, {'created': 782, 'updated': 0, 'rejected': [], 'rejected_count': 0})
+        self.assertEqual(Loan.objects.get(loan_id=5930, customer_id=14).approval_date, date(2017, 3, 9))
+
+
+LOAN_DATA = 'data/loan_data.xlsx'
+
+
+class PartitionedIngestionTests(TestCase):
+
+    def test_plan_partitions(self):
+        self.assertEqual(plan_partitions(782, 4), [(0, 196), (196, 392), (392, 588), (588, 782)])
+        self.assertEqual(plan_partitions(3, 8), [(0, 1), (1, 2), (2, 3)])
+        self.assertEqual(plan_partitions(0, 4), [])
+
+    def test_partitions_are_idempotent_and_reconciled(self):
+        ingest_customer_data()
+        partitions = plan_partitions(count_rows(LOAN_DATA), 3)
+        results = [ingest_loan_partition(path=LOAN_DATA, start=start, stop=stop, chunk_size=100)
+                   for start, stop in reversed(partitions)]
+        self.assertEqual(Loan.objects.count(), 782)
+        # Summaries are current as each chunk commits, before any reconciliation
+        customer = Customer.objects.get(customer_id=14)
+        self.assertEqual(get_credit_profile(customer), aggregate_credit_profile(customer))
+        self.assertEqual(CustomerCreditSummary.objects.count(), Customer.objects.filter(loans__isnull=False).distinct().count())
+
+        # A completed shard is not ingested again, and a forced re-run upserts the same rows
+        start, stop = partitions[1]
+        self.assertTrue(ingest_loan_partition(path=LOAN_DATA, start=start, stop=stop)['unchanged'])
+        retried = ingest_loan_partition(path=LOAN_DATA, start=start, stop=stop, force=True)
+        self.assertEqual((retried['created'], retried['updated']), (0, stop - start))
+        self.assertEqual(Loan.objects.count(), 782)
+
+        total = reconcile_loan_ingestion(results, total_rows=782)
+        self.assertEqual((total['created'], total['rows'], total['partitions']), (782, 782, 3))
+        customer = Customer.objects.get(customer_id=14)
+        self.assertEqual(get_credit_profile(customer), aggregate_credit_profile(customer))
+
+
+class IngestionCheckpointTests(TestCase):
+
+    def test_unchanged_file_is_skipped(self):
+        first = ingest_customer_data()
+        with self.assertNumQueries(1):
+            again = ingest_customer_data()
+        self.assertTrue(again['unchanged'])
+        self.assertEqual(again['created'], first['created'])
+        self.assertEqual(Customer.objects.count(), 300)
+
+    def test_interrupted_run_resumes_from_last_chunk(self):
+        calls = []
+
+        def failing_load(df):
+            calls.append(df.index[0])
+            if len(calls) == 3:
+                raise OperationalError('connection lost')
+            return load_customers(df)
+
+        with patch('core.tasks.load_customers', failing_load):
+            with self.assertRaises(OperationalError):
+                ingest_customer_data(chunk_size=100)
+        self.assertEqual(Customer.objects.count(), 200)
+        checkpoint = IngestionCheckpoint.objects.get(kind='customer')
+        self.assertEqual((checkpoint.next_row, checkpoint.completed), (200, False))
+
+        with patch('core.tasks.load_customers', failing_load):
+            result = ingest_customer_data(chunk_size=100)
+        # Only the chunk that failed is read again
+        self.assertEqual(calls, [0, 100, 200, 200])
+        self.assertEqual(result, {'created': 300, 'updated': 0, 'rejected': [], 'rejected_count': 0})
+        self.assertEqual(Customer.objects.count(), 300)
+
+    def test_full_file_checkpoints_are_unique(self):
+        # stop is NULL for full-file runs; NULLs must still collide
+        fields = {'kind': 'loan', 'path': 'loans.csv', 'content_hash': 'abc', 'start': 0, 'stop': None}
+        IngestionCheckpoint.objects.create(**fields)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            IngestionCheckpoint.objects.create(**fields)
+
+    def test_interrupted_forced_run_is_not_left_completed(self):
+        ingest_customer_data(chunk_size=100)
+
+        def failing_load(df):
+            if df.index[0] == 100:
+                raise OperationalError('connection lost')
+            return load_customers(df)
+
+        with patch('core.tasks.load_customers', failing_load):
+            with self.assertRaises(OperationalError):
+                ingest_customer_data(chunk_size=100, force=True)
+        checkpoint = IngestionCheckpoint.objects.get(kind='customer')
+        self.assertEqual((checkpoint.next_row, checkpoint.completed), (100, False))
+        self.assertEqual((checkpoint.result['created'], checkpoint.result['updated']), (0, 100))
+
+        # The next run resumes the forced one instead of reporting the partial counts as done
+        result = ingest_customer_data(chunk_size=100)
+        self.assertNotIn('unchanged', result)
+        self.assertEqual(result['updated'], 300)
+
+    def test_rejects_are_counted_with_a_capped_sample(self):
+        checkpoint = IngestionCheckpoint.objects.create(kind='loan', path='loans.csv', content_hash='abc')
+        for chunk in range(3):
+            rejected = [{'row': chunk * 80 + row, 'errors': ['Tenure must be positive.']} for row in range(80)]
+            checkpoint.advance((chunk + 1) * 100, {'created': 20, 'updated': 0, 'rejected': rejected})
+        checkpoint.refresh_from_db()
+        self.assertEqual((checkpoint.result['created'], checkpoint.result['rejected_count']), (60, 240))
+        self.assertEqual([reject['row'] for reject in checkpoint.result['rejected']], list(range(REJECT_SAMPLE_SIZE)))
+
+
+class LoggingTests(SimpleTestCase):
+
+    def record(self, name='core', level=logging.INFO, msg='Loaded %s rows', args=(3,), **extra):
+        record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_formatter(self):
+        entry = json.loads(JSONFormatter().format(self.record(row=7, errors=['Age must be between 18 and 100.'])))
+        self.assertEqual(entry['message'], 'Loaded 3 rows')
+        self.assertEqual((entry['level'], entry['logger']), ('INFO', 'core'))
+        self.assertEqual((entry['row'], entry['errors']), (7, ['Age must be between 18 and 100.']))
+
+    def test_sampling_filter(self):
+        sampler = SamplingFilter(rates={'core.rows': 10})
+        kept = [sampler.filter(self.record('core.rows.loan')) for _ in range(30)]
+        self.assertEqual([index for index, keep in enumerate(kept) if keep], [0, 10, 20])
+        # Other loggers and errors are never sampled
+        self.assertTrue(all(sampler.filter(self.record('core.tasks')) for _ in range(5)))
+        self.assertTrue(all(sampler.filter(self.record('core.rows', logging.ERROR)) for _ in range(5)))
+
+    def test_queue_handler_writes_json_lines(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'app.log')
+            handler = QueueLogHandler(filename=path, batch_size=4)
+            handler.setFormatter(JSONFormatter())
+            try:
+                for row in range(10):
+                    handler.handle(self.record(msg='Row %s', args=(row,)))
+                handler.flush()
+                with open(path) as file:
+                    messages = [json.loads(line)['message'] for line in file]
+            finally:
+                handler.close()
+        self.assertEqual(messages, [f'Row {row}' for row in range(10)])
+        self.assertIsNone(handler.thread)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = QueueLogHandler(queue_size=1)
+        handler.close()  # No listener, so the queue stays full
+        handler.enqueue(self.record())
+        handler.enqueue(self.record())
+        self.assertEqual(handler.dropped, 1)
+
+    def test_rejected_rows_are_logged_per_row(self):
+        with self.assertLogs('core.rows', 'WARNING') as logs:
+            _log_rejects('Customer', {'rejected': [{'row': 2, 'errors': ['Age must be between 18 and 100.']},
+                                                   {'row': 5, 'errors': ['Customer ID is required.']}]})
+        self.assertEqual([record.row for record in logs.records], [2, 5])
+
+
+@override_settings(METRICS_SAMPLE_RATE=1)
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        request_metrics.reset()
+        self.customer = Customer.objects.create(
+            first_name='Meera', last_name='Pillai', age=29, phone_number='9811122233', monthly_salary=80000,
+        )
+
+    def metrics(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        return dict(line.rsplit(' ', 1) for line in response.content.decode().splitlines() if not line.startswith('#'))
+
+    def test_requests_recorded_per_route(self):
+        data = {'customer_id': self.customer.customer_id, 'loan_amount': 100000, 'interest_rate': 12, 'tenure': 12}
+        for _ in range(2):
+            self.client.post(reverse('check-eligibility'), data, content_type='application/json')
+        metrics = self.metrics()
+
+        route = 'route="check-eligibility"'
+        self.assertEqual(metrics[f'http_requests_total{{{route},method="POST",status="200"}}'], '2')
+        self.assertEqual(metrics[f'http_request_duration_seconds_count{{{route}}}'], '2')
+        self.assertEqual(metrics[f'http_request_duration_seconds_bucket{{{route},le="+Inf"}}'], '2')
+        self.assertGreater(int(metrics[f'http_request_queries_sum{{{route}}}']), 0)
+        self.assertGreater(float(metrics[f'http_request_db_duration_seconds_sum{{{route}}}']), 0)
+        self.assertIn('loan_cache_lookups_total{name="eligibility",outcome="hit"}', metrics)
+
+    def test_duplicate_queries_counted(self):
+        state = start_request()
+        for _ in range(3):
+            Customer.objects.filter(customer_id=self.customer.customer_id).exists()
+        Customer.objects.filter(customer_id=0).exists()
+        finish_request(RequestFactory().get('/'), HttpResponse(), state)
+
+        histogram = request_metrics.histograms['http_request_duplicate_queries', 'unmatched']
+        self.assertEqual(histogram.sum, 2)
+        self.assertEqual(request_metrics.histograms['http_request_queries', 'unmatched'].sum, 4)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_nothing_recorded_when_sampling_is_off(self):
+        self.client.get(reverse('metrics'))
+        self.assertEqual(request_metrics.requests, {})
+
+    def test_metrics_summed_across_processes(self):
+        # The file of a recycled worker that had this process's PID, as its exporter wrote it
+        other = RequestMetrics()
+        other.record('check-eligibility', 'POST', 200, 0.01, QueryCollector())
+        data = {'customer_id': self.customer.customer_id, 'loan_amount': 100000, 'interest_rate': 12, 'tenure': 12}
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            with open(os.path.join(directory, f'metrics-{os.getpid()}-0badf00d.json'), 'w') as file:
+                json.dump({**other.snapshot(), "cache": {"eligibility.miss": 5}}, file)
+            self.client.post(reverse('check-eligibility'), data, content_type='application/json')
+            metrics = self.metrics()
+            self.assertEqual(len(glob.glob(os.path.join(directory, f'metrics-{os.getpid()}-*.json'))), 2)
+
+        route = 'route="check-eligibility"'
+        self.assertEqual(metrics[f'http_requests_total{{{route},method="POST",status="200"}}'], '2')
+        self.assertEqual(metrics[f'http_request_duration_seconds_count{{{route}}}'], '2')
+        self.assertGreaterEqual(int(metrics['loan_cache_lookups_total{name="eligibility",outcome="miss"}']), 5)
+
+    async def test_async_requests_count_queries_made_in_threads(self):
+        async def view(request):
+            await sync_to_async(Customer.objects.filter(customer_id=self.customer.customer_id).exists)()
+            return HttpResponse()
+
+        await RequestMetricsMiddleware(view)(AsyncRequestFactory().get('/'))
+        self.assertEqual(request_metrics.histograms['http_request_queries', 'unmatched'].sum, 1)
+
+
+class IngestionQueryBudgetTests(QueryBudgetMixin, TestCase):
+    # Ingestion runs a fixed number of queries per chunk whatever the chunk size; the rows it
+    # reads back (existing keys, the summary locks and rebuild) grow only with the rows ingested
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset(customers=50, max_loans=4)
+
+    def ingest(self, rows):
+        with tempfile.TemporaryDirectory() as directory:
+            customers = os.path.join(directory, 'customers.csv')
+            loans = os.path.join(directory, 'loans.csv')
+            customer_rows(rows, start=1000).to_csv(customers, index=False)
+            loan_rows(list(range(1000, 1000 + rows)), start=5000).to_csv(loans, index=False)
+            with self.assertQueryBudget(15, rows=rows + 5):
+                self.assertEqual(ingest_customer_data(path=customers, chunk_size=rows)['created'], rows)
+            with self.assertQueryBudget(24, rows=4 * rows + 5):
+                self.assertEqual(ingest_loan_data(path=loans, chunk_size=rows)['created'], rows)
+
+    def test_small_file(self):
+        self.ingest(100)
+
+    def test_large_file(self):
+        self.ingest(2000)
+
+    def test_metrics_endpoint(self):
+        with self.assertQueryBudget(0):
+            self.client.get(reverse('metrics'))
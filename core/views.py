@@ -1,3 +1,10 @@
-from django.shortcuts import render
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
 
-# Create your views here.
+from .metrics import render_metrics
+
+
+@require_GET
+def metrics_view(request):
+    # Prometheus scrape endpoint; the figures are those of the process serving the request
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CustomerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'customer'
+
+    def ready(self):
+        from . import signals  # noqa: F401  Keeps customer lookups in step with writes
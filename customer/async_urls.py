@@ -0,0 +1,8 @@
+from django.urls import path
+from . import async_views, views
+
+urlpatterns = [
+    path('register/', async_views.register_customer, name='register_customer'),
+    # The bulk endpoint is set-based work in a few queries, so it stays sync and runs in a thread
+    path('register/bulk/', views.register_customers_view, name='register_customers'),
+]
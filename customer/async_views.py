@@ -0,0 +1,36 @@
+from django.db import IntegrityError
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+
+from api.async_utils import json_response, read_json
+from .models import Customer
+from .views import registration_response, validate_registration
+
+
+# Async counterparts of customer.views, served when ASYNC_API is enabled. They run on the
+# event loop under an ASGI server instead of taking a worker thread per request.
+
+@csrf_exempt
+@require_POST
+async def register_customer(request):
+    data, error = read_json(request)
+    if error:
+        return error
+    fields, error = validate_registration(data)
+    if error:
+        return json_response({"error": error}, status.HTTP_400_BAD_REQUEST)
+
+    # Check if phone number already exists in the database
+    if await Customer.objects.filter(phone_number=fields["phone_number"]).aexists():
+        return json_response({"error": "Phone number already registered."}, status.HTTP_400_BAD_REQUEST)
+
+    try:
+        customer = await Customer.objects.acreate(**fields)
+    except IntegrityError:
+        # The unique index on phone_number catches registrations racing past the check above
+        return json_response({"error": "Phone number already registered."}, status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return json_response({"error": f"An error occurred while saving the customer: {str(e)}"}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return json_response(registration_response(customer), status.HTTP_201_CREATED)
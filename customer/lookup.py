@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .models import Customer
+
+# Customer rows are read on every eligibility check and loan creation. A per-request
+# identity map makes a request load each customer at most once; across requests the rows
+# come from the versioned loan cache (loan.cache.get_eligibility_inputs), which every
+# process shares and writes invalidate. Saves and deletes drop the customer from the map
+# (see customer.signals).
+
+_identity_map = ContextVar('customer_identity_map', default=None)
+
+
+@contextmanager
+def request_scope():
+    # Give the enclosed code its own identity map
+    token = _identity_map.set({})
+    try:
+        yield
+    finally:
+        _identity_map.reset(token)
+
+
+def get_customer(customer_id):
+    # The customer with this ID, or None. Repeat lookups within a request return the same
+    # instance; the database is read on the first one.
+    try:
+        customer_id = int(customer_id)
+    except (ValueError, TypeError):
+        return None
+
+    identity_map = _identity_map.get()
+    if identity_map is not None and customer_id in identity_map:
+        return identity_map[customer_id]
+    customer = Customer.objects.filter(customer_id=customer_id).first()
+    if identity_map is not None:
+        identity_map[customer_id] = customer
+    return customer
+
+
+async def aget_customer(customer_id):
+    # get_customer for async callers
+    try:
+        customer_id = int(customer_id)
+    except (ValueError, TypeError):
+        return None
+
+    identity_map = _identity_map.get()
+    if identity_map is not None and customer_id in identity_map:
+        return identity_map[customer_id]
+    customer = await Customer.objects.filter(customer_id=customer_id).afirst()
+    if identity_map is not None:
+        identity_map[customer_id] = customer
+    return customer
+
+
+def remember(customer):
+    # Seed the current request's identity map with a customer loaded some other way
+    identity_map = _identity_map.get()
+    if identity_map is not None:
+        identity_map[customer.pk] = customer
+
+
+def forget(customer_id):
+    identity_map = _identity_map.get()
+    if identity_map is not None:
+        identity_map.pop(customer_id, None)
+
+
+def forget_all():
+    # For bulk writes that bypass the model signals
+    identity_map = _identity_map.get()
+    if identity_map is not None:
+        identity_map.clear()
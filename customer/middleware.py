@@ -0,0 +1,25 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .lookup import request_scope
+
+
+class CustomerIdentityMapMiddleware:
+    # Scope customer lookups to the request, so each customer is loaded at most once per request.
+    # Runs natively under both WSGI and ASGI, so async views are not pushed onto a thread.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with request_scope():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with request_scope():
+            return await self.get_response(request)
@@ -7,7 +7,7 @@ class Customer(models.Model):
     first_name = models.CharField(max_length=100, null=False)
     last_name = models.CharField(max_length=100, null=False)
     age = models.IntegerField(null=False)
-    phone_number = models.CharField(max_length=15, null=False)
+    phone_number = models.CharField(max_length=15, null=False, unique=True)
     monthly_salary = models.FloatField(null=False)
     approved_limit = models.FloatField(null=False)
 
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .lookup import forget
+from .models import Customer
+
+
+@receiver([post_save, post_delete], sender=Customer)
+def forget_customer(sender, instance, **kwargs):
+    # The next lookup reloads the row instead of serving the stale snapshot
+    forget(instance.pk)
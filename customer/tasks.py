@@ -0,0 +1,19 @@
+import logging
+from celery import shared_task
+from .views import MAX_REGISTRATION_BATCH_SIZE, register_customers
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def register_customers_task(entries, batch_size=MAX_REGISTRATION_BATCH_SIZE):
+    # Bulk registration for lists larger than the API accepts, e.g. partner onboarding files.
+    # Each batch commits on its own; the result lists every entry in input order.
+    results = []
+    for start in range(0, len(entries), batch_size):
+        for result, status_code in register_customers(entries[start:start + batch_size]):
+            results.append({**result, "status": status_code})
+
+    created = sum(1 for result in results if result["status"] == 201)
+    logger.info(f"Bulk registration: {created} created, {len(results) - created} rejected.")
+    return {"created": created, "rejected": len(results) - created, "results": results}
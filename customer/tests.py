@@ -1,8 +1,19 @@
 import json
-from django.test import TestCase
+from datetime import date
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
+from core.testing import QueryBudgetMixin, seed_dataset
+from loan.models import Loan
+from . import async_views
+from .lookup import aget_customer, forget_all, get_customer, request_scope
+from .middleware import CustomerIdentityMapMiddleware
 from .models import Customer
+from .tasks import register_customers_task
+from .views import register_customers
 
 class CustomerRegistrationTestCase(TestCase):
     def setUp(self):
@@ -127,3 +138,158 @@ class CustomerRegistrationTestCase(TestCase):
         response = self.client.post(self.url, valid_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(response.data['approved_limit'], round(valid_data['monthly_salary']*36,-5))  # 60000 * 36
+
+
+class CustomerLookupTests(TestCase):
+
+    def setUp(self):
+        forget_all()
+        self.customer = Customer.objects.create(
+            first_name='Neha', last_name='Rao', age=31, phone_number='9123456780', monthly_salary=75000,
+        )
+
+    def test_identity_map_loads_each_customer_once_per_request(self):
+        with request_scope():
+            with self.assertNumQueries(2):  # One per distinct customer ID, including the missing one
+                first = get_customer(self.customer.customer_id)
+                self.assertIs(get_customer(str(self.customer.customer_id)), first)
+                self.assertIsNone(get_customer(999))
+                self.assertIsNone(get_customer(999))
+        # Without a request scope every lookup reads the row
+        with self.assertNumQueries(2):
+            get_customer(self.customer.customer_id)
+            get_customer(self.customer.customer_id)
+
+    def test_saves_drop_the_customer_from_the_request(self):
+        with request_scope():
+            get_customer(self.customer.customer_id)
+            self.customer.monthly_salary = 90000
+            self.customer.save()
+            self.assertEqual(get_customer(self.customer.customer_id).monthly_salary, 90000)
+            self.customer.delete()
+            self.assertIsNone(get_customer(self.customer.customer_id))
+
+    def test_create_loan_reads_customer_once(self):
+        # A repaid loan gives the customer a credit score high enough for approval
+        Loan.objects.create(customer=self.customer, loan_amount=100000, tenure=12, interest_rate=12,
+                            monthly_repayment=8885, emis_paid_on_time=12, approval_date=date(2020, 1, 1))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('create-loan'), {
+                'customer_id': self.customer.customer_id, 'loan_amount': 100000, 'interest_rate': 12, 'tenure': 12,
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        customer_reads = [query for query in queries.captured_queries
+                          if query['sql'].startswith('SELECT') and 'FROM "customer_customer"' in query['sql']]
+        self.assertEqual(len(customer_reads), 1)
+
+
+class AsyncRegistrationTests(TestCase):
+
+    async def test_register(self):
+        factory = AsyncRequestFactory()
+        data = {'first_name': 'Ira', 'last_name': 'Shah', 'age': 27, 'monthly_income': 40000, 'phone_number': '9000011111'}
+        response = await async_views.register_customer(factory.post('/', data, content_type='application/json'))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(json.loads(response.content)['approved_limit'], 1400000)
+
+        response = await async_views.register_customer(factory.post('/', data, content_type='application/json'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(json.loads(response.content), {'error': 'Phone number already registered.'})
+
+    async def test_identity_map_middleware_runs_async(self):
+        async def view(request):
+            first = await aget_customer(customer.customer_id)
+            return first is await aget_customer(customer.customer_id)
+
+        customer = await Customer.objects.acreate(first_name='Om', last_name='Das', age=45, phone_number='9000022222',
+                                                  monthly_salary=30000)
+        middleware = CustomerIdentityMapMiddleware(view)
+        self.assertTrue(await middleware(AsyncRequestFactory().get('/')))
+
+
+class BulkRegistrationTests(QueryBudgetMixin, TestCase):
+
+    def registration(self, index, **overrides):
+        return {'first_name': 'Bulk', 'last_name': 'Customer', 'age': 30, 'monthly_income': 40000 + index * 1037,
+                'phone_number': str(9100000000 + index), **overrides}
+
+    def test_matches_single_registration(self):
+        entries = [self.registration(index) for index in range(50)]
+        results = register_customers(entries)
+        self.assertEqual({status_code for _, status_code in results}, {status.HTTP_201_CREATED})
+        for entry, (result, _) in zip(entries, results):
+            customer = Customer.objects.get(pk=result['customer_id'])
+            self.assertEqual(result['approved_limit'], customer.calculate_approved_limit)
+            self.assertEqual(result['phone_number'], entry['phone_number'])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bulk-registration-tests'}})
+    def test_registration_evicts_cached_unknown_customer(self):
+        # The next customer ID, probed before it is registered
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT setval(pg_get_serial_sequence('customer_customer', 'customer_id'), 900000)")
+        data = {'customer_id': 900001, 'loan_amount': 100000, 'interest_rate': 12, 'tenure': 12}
+        response = self.client.post(reverse('check-eligibility'), data, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        (result, _), = register_customers([self.registration(0)])
+        self.assertEqual(result['customer_id'], 900001)
+        response = self.client.post(reverse('check-eligibility'), data, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_duplicates_and_invalid_rows(self):
+        Customer.objects.create(first_name='Om', last_name='Das', age=45, phone_number='9100000001', monthly_salary=30000)
+        results = register_customers([
+            self.registration(0),
+            self.registration(1),  # Already registered
+            self.registration(2),
+            self.registration(3, phone_number='9100000000'),  # Repeats the first entry
+            self.registration(4, age=12),
+            self.registration(5, phone_number=9100000005),
+            # Longer than the columns; rejected on their own rather than failing the insert
+            self.registration(6, phone_number='+' + '9' * 15),
+            self.registration(7, first_name='A' * 101),
+        ])
+        self.assertEqual([status_code for _, status_code in results], [201, 400, 201, 400, 400, 400, 400, 400])
+        self.assertEqual([result.get('error') for result, _ in results[1:]], [
+            'Phone number already registered.', None, 'Phone number appears earlier in the batch.',
+            'Age must be between 18 and 100.', 'Phone number must be valid with 10 to 15 digits.',
+            "Phone number must be at most 15 characters, including the '+'.",
+            'First and last names must be at most 100 characters.',
+        ])
+        self.assertEqual(Customer.objects.count(), 3)
+
+    def test_query_count_is_constant(self):
+        # The duplicate check and the insert, for any batch up to bulk_create's batch size
+        with self.assertQueryBudget(4):
+            register_customers([self.registration(index) for index in range(500)])
+        self.assertEqual(Customer.objects.count(), 500)
+
+    def test_endpoint(self):
+        response = self.client.post(reverse('register_customers'), [self.registration(0), self.registration(0)],
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['status'] for row in response.json()], [201, 400])
+        self.assertEqual(response.json()[0]['approved_limit'], 1400000)
+
+        response = self.client.post(reverse('register_customers'), {'first_name': 'Ira'}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_task_splits_into_batches(self):
+        result = register_customers_task([self.registration(index) for index in range(25)] + [self.registration(0)],
+                                         batch_size=10)
+        self.assertEqual((result['created'], result['rejected']), (25, 1))
+        self.assertEqual(result['results'][-1]['error'], 'Phone number already registered.')
+
+
+class RegistrationQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset(customers=50, max_loans=2)
+
+    def test_register(self):
+        # The phone number check and the insert, however many customers exist
+        data = {'first_name': 'Ira', 'last_name': 'Shah', 'age': 27, 'monthly_income': 40000, 'phone_number': '9000011111'}
+        with self.assertQueryBudget(2, rows=1):
+            response = self.client.post(reverse('register_customer'), data, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
@@ -3,4 +3,5 @@ from . import views
 
 urlpatterns = [
     path('register/', views.register_customer, name='register_customer'),
+    path('register/bulk/', views.register_customers_view, name='register_customers'),
 ]
@@ -1,67 +1,106 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from django.db import IntegrityError, transaction
+from loan.cache import invalidate_customer
 from .models import Customer
+import numpy as np
 import re
 
+MAX_REGISTRATION_BATCH_SIZE = 10000
+PHONE_NUMBER_PATTERN = re.compile(r'^\+?\d{10,15}$')
+# Column sizes; longer values would fail the whole bulk insert instead of their own row
+NAME_MAX_LENGTH = Customer._meta.get_field('first_name').max_length
+PHONE_NUMBER_MAX_LENGTH = Customer._meta.get_field('phone_number').max_length
+
+def validate_registration(data):
+    # Validate a registration request; returns the customer fields, or None and the error message
+    # Extract data from the request body
+    first_name = data.get('first_name')
+    last_name = data.get('last_name')
+    age = data.get('age')
+    monthly_salary = data.get('monthly_income')
+    phone_number = data.get('phone_number')
+
+    if first_name is None or first_name == "":
+        return None, "First name is required."
+    if last_name is None or last_name == "":
+        return None, "Last name is required."
+    if age is None:
+        return None, "Age is required."
+    if monthly_salary is None:
+        return None, "Monthly salary is required."
+    if phone_number is None or phone_number == "":
+        return None, "Phone number is required."
+
+
+    # Validate age and monthly_salary
+    try:
+        age = int(age)
+    except (ValueError, TypeError):
+        return None, "Age must be a valid number."
+
+    try:
+        monthly_salary = float(monthly_salary)
+    except (ValueError, TypeError):
+        return None, "Monthly salary must be a valid number."
+
+    # Validation for age (must be between 18 and 100)
+    if not (18 <= age <= 100):
+        return None, "Age must be between 18 and 100."
+
+    # Validation for monthly income (must be greater than 0)
+    if monthly_salary <= 0:
+        return None, "Monthly salary must be positive."
+    # Check if all required fields are provided
+    if not all([first_name, last_name, age, monthly_salary, phone_number]):
+        return None, "All fields are required."
+
+    # Ensure first name and last name are valid strings
+    if not isinstance(first_name, str) or not isinstance(last_name, str):
+        return None, "First and last names must be valid strings."
+    if len(first_name) > NAME_MAX_LENGTH or len(last_name) > NAME_MAX_LENGTH:
+        return None, f"First and last names must be at most {NAME_MAX_LENGTH} characters."
+
+    # Phone number validation: Ensure it's valid (10 to 15 digits, optionally starting with '+')
+    if not isinstance(phone_number, str) or not PHONE_NUMBER_PATTERN.match(phone_number):
+        return None, "Phone number must be valid with 10 to 15 digits."
+    if len(phone_number) > PHONE_NUMBER_MAX_LENGTH:
+        return None, f"Phone number must be at most {PHONE_NUMBER_MAX_LENGTH} characters, including the '+'."
+
+    if not first_name.isalpha():
+        return None, "First name must only contain alphabetic characters."
+
+    if not last_name.isalpha():
+        return None, "Last name must only contain alphabetic characters."
+
+    return {
+        "first_name": first_name,
+        "last_name": last_name,
+        "age": age,
+        "monthly_salary": monthly_salary,
+        "phone_number": phone_number,
+    }, None
+
+
+def registration_response(customer):
+    return {
+        "customer_id": customer.customer_id,
+        "name": f"{customer.first_name} {customer.last_name}",
+        "age": customer.age,
+        "monthly_income": customer.monthly_salary,
+        "approved_limit": customer.approved_limit,
+        "phone_number": customer.phone_number
+    }
+
+
 @api_view(['POST'])
 def register_customer(request):
     if request.method == 'POST':
-        # Extract data from the request body
-        first_name = request.data.get('first_name')
-        last_name = request.data.get('last_name')
-        age = request.data.get('age')
-        monthly_salary = request.data.get('monthly_income')
-        phone_number = request.data.get('phone_number')
-
-
-        if first_name is None or first_name == "":
-            return Response({"error": "First name is required."}, status=status.HTTP_400_BAD_REQUEST)
-        if last_name is None or last_name == "":
-            return Response({"error": "Last name is required."}, status=status.HTTP_400_BAD_REQUEST)
-        if age is None:
-            return Response({"error": "Age is required."}, status=status.HTTP_400_BAD_REQUEST)
-        if monthly_salary is None:
-            return Response({"error": "Monthly salary is required."}, status=status.HTTP_400_BAD_REQUEST)
-        if phone_number is None or phone_number == "":
-            return Response({"error": "Phone number is required."}, status=status.HTTP_400_BAD_REQUEST)
-    
-
-        # Validate age and monthly_salary
-        try:
-            age = int(age)
-        except (ValueError, TypeError):
-            return Response({"error": "Age must be a valid number."}, status=status.HTTP_400_BAD_REQUEST)
-
-        try:
-            monthly_salary = float(monthly_salary)
-        except (ValueError, TypeError):
-            return Response({"error": "Monthly salary must be a valid number."}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Validation for age (must be between 18 and 100)
-        if not (18 <= age <= 100):
-            return Response({"error": "Age must be between 18 and 100."}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Validation for monthly income (must be greater than 0)
-        if monthly_salary <= 0:
-            return Response({"error": "Monthly salary must be positive."}, status=status.HTTP_400_BAD_REQUEST)
-        # Check if all required fields are provided
-        if not all([first_name, last_name, age, monthly_salary, phone_number]):
-            return Response({"error": "All fields are required."}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Ensure first name and last name are valid strings
-        if not isinstance(first_name, str) or not isinstance(last_name, str):
-            return Response({"error": "First and last names must be valid strings."}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Phone number validation: Ensure it's valid (10 to 15 digits, optionally starting with '+')
-        if not re.match(r'^\+?\d{10,15}$', phone_number):
-            return Response({"error": "Phone number must be valid with 10 to 15 digits."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        if not first_name.isalpha():
-            return Response({"error": "First name must only contain alphabetic characters."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        if not last_name.isalpha():
-            return Response({"error": "Last name must only contain alphabetic characters."}, status=status.HTTP_400_BAD_REQUEST)
+        fields, error = validate_registration(request.data)
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+        phone_number = fields["phone_number"]
 
         # Check if phone number already exists in the database
         if Customer.objects.filter(phone_number=phone_number).exists():
@@ -70,25 +109,72 @@ def register_customer(request):
         # Use try-except block for database interaction
         try:
             # Create the Customer instance and save it
-            customer = Customer.objects.create(
-                first_name=first_name,
-                last_name=last_name,
-                age=age,
-                monthly_salary=monthly_salary,
-                phone_number=phone_number
-            )
+            customer = Customer.objects.create(**fields)
+        except IntegrityError:
+            # The unique index on phone_number catches registrations racing past the check above
+            return Response({"error": "Phone number already registered."}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             # Catch any unexpected database errors
             return Response({"error": f"An error occurred while saving the customer: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # Prepare the response data
-        response_data = {
-            "customer_id": customer.customer_id,
-            "name": f"{customer.first_name} {customer.last_name}",
-            "age": customer.age,
-            "monthly_income": customer.monthly_salary,
-            "approved_limit": customer.approved_limit,
-            "phone_number": customer.phone_number
-        }
-
-        return Response(response_data, status=status.HTTP_201_CREATED)
+        return Response(registration_response(customer), status=status.HTTP_201_CREATED)
+
+
+def register_customers(entries):
+    # Register many customers at once; every entry gets a (result, status_code) pair, the
+    # customer's registration response or the error register_customer would have returned
+    results = [None] * len(entries)
+    pending = {}  # phone number -> (index, fields); the first entry with a number wins
+    for index, data in enumerate(entries):
+        fields, error = validate_registration(data)
+        if error:
+            results[index] = {"error": error}, status.HTTP_400_BAD_REQUEST
+        elif fields["phone_number"] in pending:
+            results[index] = {"error": "Phone number appears earlier in the batch."}, status.HTTP_400_BAD_REQUEST
+        else:
+            pending[fields["phone_number"]] = index, fields
+
+    # One query finds the numbers already registered. The unique index still catches
+    # registrations racing past it; the batch is then checked again and retried once.
+    for attempt in range(2):
+        registered = set(Customer.objects.filter(phone_number__in=list(pending)).values_list('phone_number', flat=True))
+        for phone_number in registered:
+            index, _ = pending.pop(phone_number)
+            results[index] = {"error": "Phone number already registered."}, status.HTTP_400_BAD_REQUEST
+        if not pending:
+            return results
+
+        salaries = np.array([fields["monthly_salary"] for _, fields in pending.values()], dtype=float)
+        approved_limits = np.round(salaries * 36, -5).tolist()  # Customer.calculate_approved_limit for the batch
+        customers = [Customer(**fields, approved_limit=limit) for (_, fields), limit in zip(pending.values(), approved_limits)]
+        try:
+            with transaction.atomic():
+                Customer.objects.bulk_create(customers, batch_size=1000)
+                # bulk_create skips the post_save signal, so evict what it would have: an
+                # eligibility check that probed one of these IDs cached it as unknown
+                for customer in customers:
+                    invalidate_customer(customer.pk)
+            break
+        except IntegrityError:
+            if attempt:
+                raise
+
+    for (index, _), customer in zip(pending.values(), customers):
+        results[index] = registration_response(customer), status.HTTP_201_CREATED
+    return results
+
+
+@api_view(['POST'])
+def register_customers_view(request):
+    if request.method == 'POST':
+        entries = request.data
+        if not isinstance(entries, list) or not all(isinstance(item, dict) for item in entries):
+            return Response({"error": "Request body must be a list of registrations."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(entries) > MAX_REGISTRATION_BATCH_SIZE:
+            return Response({"error": f"A batch may contain at most {MAX_REGISTRATION_BATCH_SIZE} registrations."}, status=status.HTTP_400_BAD_REQUEST)
+
+        response_data = []
+        for result, status_code in register_customers(entries):
+            response_data.append({**result, "status": status_code})
+        return Response(response_data, status=status.HTTP_200_OK)
@@ -0,0 +1,47 @@
+# gunicorn configuration, read automatically from the working directory:
+#   DJANGO_SETTINGS_MODULE=backend.settings_production gunicorn backend.wsgi:application
+# With ASYNC_API=True the workers run the ASGI app under uvicorn instead:
+#   DJANGO_SETTINGS_MODULE=backend.settings_production ASYNC_API=True gunicorn backend.asgi:application
+import multiprocessing
+import os
+import shutil
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+# The loan endpoints spend most of their time waiting on Postgres and Redis, so each process
+# serves several requests at once: threads for the sync views, the event loop for the async
+# ones. Processes beyond the core count only add memory and database connections.
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() + 1))
+if os.getenv('ASYNC_API') == 'True':
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    worker_class = 'gthread'
+    # Keep at or below DB_POOL_MAX_SIZE so every thread can hold a pooled connection
+    threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# Load the app, and with it NumPy/pandas and the warmed amortization tables, once in the
+# master and fork the workers from it
+preload_app = True
+
+# Clients keep their connections open between calls; close idle ones after a few seconds
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+
+# Recycle workers now and then so slow leaks cannot accumulate; the jitter keeps them
+# from restarting all at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = 1000
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    # Workers write their /metrics figures to METRICS_DIR (backend.settings_production); start
+    # each server from zero rather than adding the previous run's files. Files of workers
+    # recycled later are kept, so the counters never go backwards while the server runs.
+    from django.conf import settings
+
+    if getattr(settings, 'METRICS_DIR', None):
+        shutil.rmtree(settings.METRICS_DIR, ignore_errors=True)
@@ -0,0 +1,96 @@
+from functools import lru_cache
+
+import numpy as np
+
+MAX_TENURE = 360  # Months, the longest tenure a loan may have
+COMMON_RATES = (12, 16)  # Slab rates applied by check_eligibility
+
+
+def annuity_factor(interest_rate, tenure):
+    # Share of the principal repaid each month: r(1+r)^n / ((1+r)^n - 1), or 1/n for a zero rate
+    rate_of_interest = np.asarray(interest_rate, dtype=float) / 100 / 12  # Monthly rate
+    tenure = np.asarray(tenure, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = (1 + rate_of_interest) ** tenure
+        factor = np.where(
+            rate_of_interest == 0,
+            1 / tenure,
+            rate_of_interest * growth / (growth - 1),
+        )
+    return factor
+
+
+@lru_cache(maxsize=4096)
+def _annuity_factor_row(rate_bp):
+    # Factors for one rate (in basis points) against every tenure, indexed by tenure
+    row = np.full(MAX_TENURE + 1, np.nan)
+    row[1:] = annuity_factor(rate_bp / 100, np.arange(1, MAX_TENURE + 1))
+    row.setflags(write=False)
+    return row
+
+
+def annuity_factors(interest_rate, tenure):
+    # Vectorized annuity factors served from the per-rate cache whenever the rate is a whole
+    # number of basis points and the tenure is within 1..MAX_TENURE months
+    interest_rate, tenure = np.broadcast_arrays(np.asarray(interest_rate, dtype=float), np.asarray(tenure, dtype=float))
+    rate_bp = np.rint(interest_rate * 100)
+    cached = (rate_bp / 100 == interest_rate) & (tenure >= 1) & (tenure <= MAX_TENURE) & (tenure == np.rint(tenure))
+
+    factor = np.empty(interest_rate.shape)
+    if not cached.all():
+        factor[~cached] = annuity_factor(interest_rate[~cached], tenure[~cached])
+    if cached.any():
+        unique_bp, row_index = np.unique(rate_bp[cached].astype(np.int64), return_inverse=True)
+        table = np.stack([_annuity_factor_row(int(bp)) for bp in unique_bp])
+        factor[cached] = table[row_index, tenure[cached].astype(np.intp)]
+    return factor
+
+
+def monthly_installment(loan_amount, interest_rate, tenure):
+    # EMI for scalars or arrays of (amount, rate, tenure); arrays broadcast against each other
+    emi = np.asarray(loan_amount, dtype=float) * annuity_factors(interest_rate, tenure)
+    return emi.item() if emi.ndim == 0 else emi
+
+
+def amortization_schedule(loan_amount, interest_rate, tenure):
+    # Month-by-month split of each installment into interest and principal.
+    # Scalars give 1-D arrays over the tenure; arrays of loans give 2-D arrays
+    # (loan x month), zero-padded after each loan's last month.
+    loan_amount, interest_rate, tenure = np.broadcast_arrays(
+        np.asarray(loan_amount, dtype=float), np.asarray(interest_rate, dtype=float), np.asarray(tenure, dtype=np.int64))
+    scalar = loan_amount.ndim == 0
+    loan_amount, interest_rate, tenure = (np.atleast_1d(value)[:, None] for value in (loan_amount, interest_rate, tenure))
+
+    emi = loan_amount * annuity_factors(interest_rate, tenure)
+    rate_of_interest = interest_rate / 100 / 12
+    month = np.arange(1, int(tenure.max(initial=0)) + 1)[None, :]
+    paid_before = month - 1
+
+    # Outstanding balance after k payments: P(1+r)^k - EMI((1+r)^k - 1)/r, or P - EMI*k for a zero rate
+    growth = (1 + rate_of_interest) ** paid_before
+    with np.errstate(divide='ignore', invalid='ignore'):
+        opening_balance = np.where(
+            rate_of_interest == 0,
+            loan_amount - emi * paid_before,
+            loan_amount * growth - emi * (growth - 1) / rate_of_interest,
+        )
+    interest = opening_balance * rate_of_interest
+    principal = emi - interest
+    closing_balance = np.maximum(opening_balance - principal, 0)
+
+    active = month <= tenure
+    schedule = {
+        "month": np.broadcast_to(month, active.shape) * active,
+        "installment": np.where(active, emi, 0.0),
+        "interest": np.where(active, interest, 0.0),
+        "principal": np.where(active, principal, 0.0),
+        "balance": np.where(active, closing_balance, 0.0),
+    }
+    if scalar:
+        schedule = {key: value[0] for key, value in schedule.items()}
+    return schedule
+
+
+# Warm the cache for the slab rates every corrected application uses
+for _rate in COMMON_RATES:
+    _annuity_factor_row(_rate * 100)
@@ -0,0 +1,94 @@
+import logging
+from datetime import date
+from itertools import groupby
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+
+from customer.models import Customer
+from .models import CustomerCreditSummary, Loan, LoanApplication
+from .views import approved_loan_response, create_loan_on_summary, rejected_loan_response
+
+logger = logging.getLogger(__name__)
+
+# Queued loan applications (LOAN_APPLICATION_QUEUE). create-loan stores the validated
+# application and returns 202; a Celery worker later takes the pending applications in
+# micro-batches and decides them with the same rules and locking as the synchronous path.
+# The applications of one customer are decided one after another on a single locked credit
+# summary, which each approved loan updates in place, so the aggregates are read once per
+# customer and batch instead of once per application.
+
+
+def enqueue_application(customer_id, loan_amount, requested_interest_rate, tenure):
+    application = LoanApplication.objects.create(
+        customer_id=customer_id, loan_amount=loan_amount, interest_rate=requested_interest_rate, tenure=tenure,
+    )
+    transaction.on_commit(_notify_workers)
+    return application
+
+
+def _notify_workers():
+    from .tasks import process_loan_applications
+
+    try:
+        process_loan_applications.delay()
+    except Exception:
+        # The application stays pending; the next application's run or the per-minute
+        # sweep in CELERY_BEAT_SCHEDULE picks it up
+        logger.exception("Could not queue the loan application task.")
+
+
+def _decide(application, customer, summary, today, loan_id):
+    # Record the outcome the synchronous create-loan would have answered
+    if summary is None:
+        loan, result, status_code = None, {"error": "Customer not found."}, status.HTTP_404_NOT_FOUND
+    else:
+        loan, result, status_code = create_loan_on_summary(
+            customer, summary, application.loan_amount, application.interest_rate, application.tenure, today, loan_id)
+    if loan is None:
+        application.status = LoanApplication.REJECTED
+        application.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+        application.result = rejected_loan_response(application.customer_id, result)
+    else:
+        application.status = LoanApplication.APPROVED
+        application.status_code = status.HTTP_200_OK
+        application.result = approved_loan_response(application.customer_id, loan, result)
+
+
+def process_application_batch(batch_size, today=None):
+    # Decide up to `batch_size` pending applications in one transaction; returns how many.
+    # SKIP LOCKED lets several workers drain the queue side by side.
+    today = today or date.today()
+    with transaction.atomic():
+        applications = list(
+            LoanApplication.objects.select_for_update(skip_locked=True)
+            .filter(status=LoanApplication.PENDING).order_by('created_at', 'id')[:batch_size]
+        )
+        if not applications:
+            return 0
+        customers = Customer.objects.in_bulk({application.customer_id for application in applications})
+        loan_ids = iter(Loan.allocate_loan_ids(len(applications)))
+
+        # Customers in ID order, so concurrent batches take the summary locks in the same order
+        by_customer = sorted(applications, key=lambda application: (application.customer_id, application.created_at))
+        for customer_id, group in groupby(by_customer, key=lambda application: application.customer_id):
+            group = list(group)
+            try:
+                with transaction.atomic():
+                    customer = customers.get(customer_id)
+                    summary = CustomerCreditSummary.lock(customer_id, today) if customer else None
+                    for application in group:
+                        _decide(application, customer, summary, today, next(loan_ids))
+            except Exception as e:
+                logger.exception(f"Loan applications of customer {customer_id} failed.")
+                for application in group:
+                    application.status = LoanApplication.FAILED
+                    application.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+                    application.result = {"error": f"Failed to create loan: {str(e)}"}
+
+        processed_at = timezone.now()
+        for application in applications:
+            application.processed_at = processed_at
+        LoanApplication.objects.bulk_update(applications, ['status', 'status_code', 'result', 'processed_at'])
+    return len(applications)
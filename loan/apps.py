@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def create_loan_id_sequence(sender, **kwargs):
+    from .models import Loan
+    Loan.create_loan_id_sequence()
 
 
 class LoanConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'loan'
+
+    def ready(self):
+        post_migrate.connect(create_loan_id_sequence, sender=self)
+        from . import signals  # noqa: F401  Connects the cache invalidation receivers
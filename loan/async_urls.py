@@ -0,0 +1,13 @@
+from django.urls import path
+from . import async_views, views
+
+urlpatterns = [
+    path('check-eligibility/', async_views.check_eligibility_view, name='check-eligibility'),
+    # The batch and simulation endpoints are CPU-bound NumPy work, so they stay sync and run in a thread
+    path('check-eligibility/batch/', views.check_eligibility_batch_view, name='check-eligibility-batch'),
+    path('simulate/', views.simulate_loans_view, name='simulate'),
+    path('create-loan/', async_views.create_loan_view, name='create-loan'),
+    path('loan-application/<uuid:application_id>/', views.loan_application_view, name='loan-application'),
+    path('view-loan/<int:loan_id>/', async_views.view_loan_view, name='view-loan'),
+    path('view-loans/<int:customer_id>/', async_views.view_loans_view, name='view-loans'),
+]
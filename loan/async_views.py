@@ -0,0 +1,139 @@
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponseNotModified
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+
+from api.async_utils import json_response, read_json
+from customer.lookup import aget_customer
+from customer.models import Customer
+from .cache import aget_eligibility_inputs, aget_or_compute, customer_scope, loan_scope, ttl_for_today
+from .pagination import CURSOR_PARAM, InvalidPage, apaginate_keyset, etag_matches
+from .scoring import aget_policy
+from .serializers import CustomerLoanSerializer, LoanDetailSerializer
+from .views import (
+    active_loans_queryset, approved_loan_response, create_approved_loan, evaluate_eligibility, format_eligibility_response,
+    loan_detail_queryset, page_headers, page_params, queue_loan_application, rejected_loan_response,
+    validate_eligibility_request,
+)
+
+
+# Async counterparts of the loan.views endpoints, served when ASYNC_API is enabled. Reads use
+# the async ORM and cache APIs; the eligibility rules, validation, serializers and pagination
+# are shared with the sync views. Loan creation runs its locking transaction in a thread,
+# since the async ORM has no transactions.
+
+async def acheck_eligibility(customer_id, loan_amount, requested_interest_rate, tenure):
+    values, error = validate_eligibility_request(customer_id, loan_amount, requested_interest_rate, tenure)
+    if error:
+        return error
+
+    customer, profile = await aget_eligibility_inputs(customer_id)
+    if customer is None:
+        return {"error": "Customer not found."}, status.HTTP_404_NOT_FOUND
+    return evaluate_eligibility(customer, profile, *values, policy=await aget_policy())
+
+
+@csrf_exempt
+@require_POST
+async def check_eligibility_view(request):
+    data, error = read_json(request)
+    if error:
+        return error
+    customer_id = data.get('customer_id')
+    requested_interest_rate = data.get('interest_rate')
+    tenure = data.get('tenure')
+
+    result, status_code = await acheck_eligibility(customer_id, data.get('loan_amount'), requested_interest_rate, tenure)
+    return json_response(format_eligibility_response(customer_id, requested_interest_rate, tenure, result), status_code)
+
+
+@csrf_exempt
+@require_POST
+async def create_loan_view(request):
+    data, error = read_json(request)
+    if error:
+        return error
+    customer_id = data.get('customer_id')
+    loan_amount = data.get('loan_amount')
+    tenure = data.get('tenure')
+
+    if settings.LOAN_APPLICATION_QUEUE:
+        response_data, status_code = await sync_to_async(queue_loan_application)(
+            customer_id, loan_amount, data.get('interest_rate'), tenure)
+        headers = {"Location": response_data["status_url"]} if status_code == status.HTTP_202_ACCEPTED else None
+        return json_response(response_data, status_code, headers)
+
+    eligibility_response, status_code = await acheck_eligibility(customer_id, loan_amount, data.get('interest_rate'), tenure)
+
+    # If eligibility check fails or loan is not approved, return response data
+    if status_code != status.HTTP_200_OK or not eligibility_response.get("loan_approved"):
+        return json_response(rejected_loan_response(customer_id, eligibility_response), status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    # The eligibility check has already loaded the customer for this request
+    customer = await aget_customer(customer_id)
+    if customer is None:
+        return json_response({"error": "Customer not found."}, status.HTTP_404_NOT_FOUND)
+
+    values, _ = validate_eligibility_request(customer_id, loan_amount, data.get('interest_rate'), tenure)
+    try:
+        loan, eligibility_response, status_code = await sync_to_async(create_approved_loan)(customer, *values)
+    except Exception as e:
+        return json_response({"error": f"Failed to create loan: {str(e)}"}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    if loan is None:
+        return json_response(rejected_loan_response(customer_id, eligibility_response), status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    return json_response(approved_loan_response(customer_id, loan, eligibility_response))
+
+
+def _page_response(request, data, next_cursor):
+    headers = page_headers(request, data, next_cursor)
+    if etag_matches(request, headers["ETag"]):
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response.headers[header] = value
+        return response
+    return json_response(data, headers=headers)
+
+
+@require_GET
+async def view_loan_view(request, loan_id):
+    try:
+        async def load_page():
+            page, next_cursor = await apaginate_keyset(loan_detail_queryset(loan_id), request, ('end_date', 'customer_id'))
+            return LoanDetailSerializer(page, many=True).data, next_cursor
+
+        data, next_cursor = await aget_or_compute('view-loan', loan_scope(loan_id), page_params(request), load_page)
+        if not data and not request.GET.get(CURSOR_PARAM):
+            return json_response({"error": "No loans found with the provided Loan ID."}, status.HTTP_404_NOT_FOUND)
+        return _page_response(request, data, next_cursor)
+
+    except InvalidPage as e:
+        return json_response({"error": str(e)}, status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return json_response({"error": f"An unexpected error occurred: {str(e)}"}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@require_GET
+async def view_loans_view(request, customer_id):
+    try:
+        async def load_page():
+            page, next_cursor = await apaginate_keyset(active_loans_queryset(customer_id), request, ('end_date', 'loan_id'))
+            return CustomerLoanSerializer(page, many=True).data, next_cursor
+
+        data, next_cursor = await aget_or_compute('view-loans', customer_scope(customer_id),
+                                               (date.today().isoformat(), *page_params(request)), load_page, ttl_for_today())
+        if not data and not request.GET.get(CURSOR_PARAM):
+            if not await Customer.objects.filter(customer_id=customer_id).aexists():
+                return json_response({"error": "Customer not found."}, status.HTTP_404_NOT_FOUND)
+            return json_response({"message": "No active loans found for this customer."})
+        return _page_response(request, data, next_cursor)
+
+    except InvalidPage as e:
+        return json_response({"error": str(e)}, status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return json_response({"error": f"An unexpected error occurred: {str(e)}"}, status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+# Versioned caching for credit profiles and loan payloads.
+#
+# Every entry's key embeds a global generation and the version of the customer or loan ID it
+# belongs to. Writes bump the matching version (see loan.signals), which orphans the old
+# entries instead of deleting them; they age out through their TTL. Bulk writes that bypass
+# model signals, such as ingestion, bump the generation and so invalidate everything.
+
+KEY_PREFIX = 'loan-cache'
+GENERATION = f'{KEY_PREFIX}:generation'
+DEFAULT_TTL = 60 * 60  # Seconds
+
+_MISSING = object()
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, 'LOAN_CACHE_ALIAS', 'default')]
+
+
+def _ttl():
+    return getattr(settings, 'LOAN_CACHE_TTL', DEFAULT_TTL)
+
+
+def seconds_until_tomorrow():
+    # Entries that depend on "active" loans (end_date >= today) must not outlive the day
+    now = timezone.localtime()
+    midnight = timezone.make_aware(datetime.combine(now.date() + timedelta(days=1), datetime.min.time()))
+    return max(int((midnight - now).total_seconds()), 1)
+
+
+def ttl_for_today():
+    return min(_ttl(), seconds_until_tomorrow())
+
+
+def customer_scope(customer_id):
+    return f'{KEY_PREFIX}:customer:{customer_id}'
+
+
+def loan_scope(loan_id):
+    return f'{KEY_PREFIX}:loan:{loan_id}'
+
+
+def _record(name, outcome):
+    with _stats_lock:
+        _stats[f'{name}.{outcome}'] += 1
+
+
+def cache_stats():
+    # Hit and miss counts of this process, e.g. {"eligibility.hit": 3, "eligibility.miss": 1}
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _bump(*keys):
+    cache = get_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Seed missing versions from the clock, so a version that was evicted and
+            # recreated cannot line up with entries written under its earlier life
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def _bump_now_and_on_commit(*keys):
+    # Bump before the write commits and again after it: a reader that re-caches the old
+    # rows in between is orphaned by the second bump
+    _bump(*keys)
+    transaction.on_commit(lambda: _bump(*keys))
+
+
+def invalidate_customer(customer_id):
+    _bump_now_and_on_commit(customer_scope(customer_id))
+
+
+def invalidate_loans(customer_id, loan_ids):
+    _bump_now_and_on_commit(customer_scope(customer_id), *(loan_scope(loan_id) for loan_id in loan_ids))
+
+
+def invalidate_all():
+    _bump_now_and_on_commit(GENERATION)
+
+
+def _key(name, scope, versions, parts):
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'{KEY_PREFIX}:{name}:{scope}:{versions.get(GENERATION, 0)}:{versions.get(scope, 0)}:{digest}'
+
+
+def versioned_key(name, scope, *parts):
+    return _key(name, scope, get_cache().get_many([GENERATION, scope]), parts)
+
+
+async def aversioned_key(name, scope, *parts):
+    return _key(name, scope, await get_cache().aget_many([GENERATION, scope]), parts)
+
+
+def get_or_compute(name, scope, parts, compute, timeout=None):
+    # Return the cached value for (name, scope, parts), computing and storing it on a miss
+    cache = get_cache()
+    key = versioned_key(name, scope, *parts)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _record(name, 'hit')
+        return value
+    _record(name, 'miss')
+    value = compute()
+    cache.set(key, value, timeout if timeout is not None else _ttl())
+    return value
+
+
+async def aget_or_compute(name, scope, parts, compute, timeout=None):
+    # get_or_compute for async callers; `compute` is a coroutine function
+    cache = get_cache()
+    key = await aversioned_key(name, scope, *parts)
+    value = await cache.aget(key, _MISSING)
+    if value is not _MISSING:
+        _record(name, 'hit')
+        return value
+    _record(name, 'miss')
+    value = await compute()
+    await cache.aset(key, value, timeout if timeout is not None else _ttl())
+    return value
+
+
+def get_eligibility_inputs(customer_id, today=None):
+    # The customer and their credit profile, cached for the rest of the day so repeat
+    # eligibility checks skip the database. Returns (None, None) for unknown customers.
+    from customer.lookup import remember
+    from customer.models import Customer
+    from .credit import get_credit_profile
+
+    today = today or date.today()
+    try:
+        # Normalize the ID so "7" and 7 share the scope the signal handlers invalidate
+        customer_id = int(customer_id)
+    except (ValueError, TypeError):
+        return None, None
+
+    def compute():
+        # The shared cache is filled from the database, never from a snapshot this process
+        # holds: that would be republished to every process under the current version
+        customer = Customer.objects.filter(pk=customer_id).first()
+        if customer is None:
+            return None, None
+        return customer, get_credit_profile(customer, today)
+
+    customer, profile = get_or_compute('eligibility', customer_scope(customer_id), (today.isoformat(),), compute, ttl_for_today())
+    if customer is not None:
+        # Later lookups in this request, such as create-loan's, reuse the cached row
+        remember(customer)
+    return customer, profile
+
+
+async def aget_eligibility_inputs(customer_id, today=None):
+    # get_eligibility_inputs for async callers
+    from customer.lookup import remember
+    from customer.models import Customer
+    from .credit import aget_credit_profile
+
+    today = today or date.today()
+    try:
+        customer_id = int(customer_id)
+    except (ValueError, TypeError):
+        return None, None
+
+    async def compute():
+        # The customer and the summary are fetched side by side rather than one after the other
+        # (from the database, as in get_eligibility_inputs)
+        customer, profile = await asyncio.gather(Customer.objects.filter(pk=customer_id).afirst(), aget_credit_profile(customer_id, today))
+        return (customer, profile) if customer is not None else (None, None)
+
+    customer, profile = await aget_or_compute('eligibility', customer_scope(customer_id), (today.isoformat(),), compute, ttl_for_today())
+    if customer is not None:
+        remember(customer)
+    return customer, profile
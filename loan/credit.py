@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import CustomerCreditSummary, Loan
+from .scoring import get_policy
+
+
+@dataclass(frozen=True)
+class CreditProfile:
+    # Aggregated view of a customer's loan history used for scoring
+    paid_on_time: int
+    total_loans: int
+    current_year_loans: int
+    total_volume: float
+    active_exposure: float
+
+    @property
+    def credit_score(self):
+        # Under the active scoring policy (loan.scoring); by default 10 points per EMI paid on
+        # time, 5 per loan taken, 2 per loan this year and 1 per lakh of loans approved
+        return get_policy().score(self)
+
+
+def get_credit_profile(customer, today=None):
+    # Read the customer's materialized summary, recomputing it only when it is missing or
+    # its active exposure has rolled over since it was last computed. Reads never write the
+    # summary: only CustomerCreditSummary.lock() holders and the nightly expiry persist it.
+    today = today or date.today()
+    summary = CustomerCreditSummary.objects.filter(customer_id=customer.pk).first()
+    if summary is None:
+        summary, = CustomerCreditSummary.rebuild([customer.pk], today=today, save=False)
+    elif not summary.exposure_is_current(today):
+        summary.refresh_exposure(today, save=False)
+    return profile_from_summary(summary, today)
+
+
+async def aget_credit_profile(customer_id, today=None):
+    # get_credit_profile for async callers. Takes the ID so it can run alongside the customer
+    # lookup; returns None for an unknown customer. Recomputations stay sync, in a thread.
+    today = today or date.today()
+    summary = await CustomerCreditSummary.objects.filter(customer_id=customer_id).afirst()
+    if summary is None:
+        summaries = await sync_to_async(CustomerCreditSummary.rebuild)([customer_id], today=today, save=False)
+        if not summaries:
+            return None
+        summary, = summaries
+    elif not summary.exposure_is_current(today):
+        await sync_to_async(summary.refresh_exposure)(today, save=False)
+    return profile_from_summary(summary, today)
+
+
+def get_credit_profiles(customer_ids, today=None):
+    # Bulk variant of get_credit_profile: one query for the summaries plus one set-based
+    # recomputation, not saved, covering every customer whose summary is missing or stale
+    today = today or date.today()
+    summaries = CustomerCreditSummary.objects.in_bulk(customer_ids)
+    outdated = [customer_id for customer_id in customer_ids
+                if customer_id not in summaries or not summaries[customer_id].exposure_is_current(today)]
+    if outdated:
+        for summary in CustomerCreditSummary.rebuild(outdated, today=today, save=False):
+            summaries[summary.customer_id] = summary
+    return {customer_id: profile_from_summary(summary, today) for customer_id, summary in summaries.items()}
+
+
+def profile_from_summary(summary, today):
+    return CreditProfile(
+        paid_on_time=summary.paid_on_time,
+        total_loans=summary.total_loans,
+        current_year_loans=summary.loans_in_year(today.year),
+        total_volume=summary.total_volume,
+        active_exposure=summary.active_exposure,
+    )
+
+
+def aggregate_credit_profile(customer, today=None):
+    # Collect every figure the scoring needs with a single conditional-aggregation query
+    today = today or date.today()
+    totals = Loan.objects.filter(customer=customer).aggregate(
+        paid_on_time=Coalesce(Sum('emis_paid_on_time'), 0),
+        total_loans=Count('id'),
+        current_year_loans=Count('id', filter=Q(approval_date__year=today.year)),
+        total_volume=Coalesce(Sum('loan_amount'), 0.0),
+        active_exposure=Coalesce(Sum('loan_amount', filter=Q(end_date__gte=today)), 0.0),
+    )
+    return CreditProfile(**totals)
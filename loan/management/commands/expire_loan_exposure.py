@@ -0,0 +1,27 @@
+# loan/management/commands/expire_loan_exposure.py
+from django.core.management.base import BaseCommand
+from loan.models import CustomerCreditSummary
+
+class Command(BaseCommand):
+    help = "Roll stale active exposures forward to today and optionally reconcile them against the loan table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconcile', action='store_true',
+                            help='Recompute every exposure from scratch and report drift')
+        parser.add_argument('--report-only', action='store_true',
+                            help='With --reconcile, report drift without rebuilding the drifted summaries')
+
+    def handle(self, *args, **options):
+        expired = CustomerCreditSummary.expire_exposures()
+        self.stdout.write(self.style.SUCCESS(f'Rolled {expired} credit summaries forward.'))
+        if not options['reconcile']:
+            return
+
+        report = CustomerCreditSummary.reconcile_exposures(fix=not options['report_only'])
+        style = self.style.WARNING if report['drifted'] or report['missing'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Checked {report['checked']} summaries: {report['drifted']} drifted by {report['exposure_drift']:.2f} "
+            f"in total, {report['missing']} missing{', rebuilt' if report['fixed'] else ''}."
+        ))
+        if report['customers']:
+            self.stdout.write(f"Customers: {', '.join(map(str, report['customers']))}")
@@ -0,0 +1,30 @@
+# loan/management/commands/load_scoring_policy.py
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from loan.models import ScoringPolicy
+from loan.scoring import load_rules_file
+
+class Command(BaseCommand):
+    help = "Store a scoring policy JSON file as a ScoringPolicy version and optionally activate it"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSON rule set with name and version')
+        parser.add_argument('--activate', action='store_true',
+                            help='Make it the active policy for SCORING_POLICY_SOURCE=database')
+
+    def handle(self, *args, **options):
+        try:
+            rules = load_rules_file(options['path'])
+            name, version = rules.pop('name'), rules.pop('version')
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            raise CommandError(f"Could not read the scoring policy: {e}")
+
+        policy = ScoringPolicy(name=name, version=version, rules=rules)
+        try:
+            policy.full_clean()
+        except ValidationError as e:
+            raise CommandError(f"Invalid scoring policy: {'; '.join(e.messages)}")
+        policy.save()
+        if options['activate']:
+            policy.activate()
+        self.stdout.write(self.style.SUCCESS(f"Stored scoring policy {policy}{' (active)' if policy.active else ''}."))
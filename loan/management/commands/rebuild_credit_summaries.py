@@ -0,0 +1,29 @@
+# loan/management/commands/rebuild_credit_summaries.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from customer.models import Customer
+from loan.models import CustomerCreditSummary
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized per-customer credit summaries from the loan table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customer', type=int, nargs='+', dest='customer_ids',
+                            help='Only rebuild the summaries of these customer IDs')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of customers rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Rebuilding credit summaries...'))
+        customer_ids = options['customer_ids']
+        if customer_ids is None:
+            customer_ids = Customer.objects.values_list('customer_id', flat=True)
+        customer_ids = sorted(customer_ids)
+        # Under the summary locks, a batch per transaction, so a loan created meanwhile is not
+        # overwritten with totals read before it committed
+        rebuilt = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(customer_ids), batch_size):
+            with transaction.atomic():
+                rebuilt += len(CustomerCreditSummary.rebuild_locked(customer_ids[start:start + batch_size]))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} credit summaries.'))
@@ -1,34 +1,88 @@
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.core.exceptions import ValidationError
 from dateutil.relativedelta import relativedelta
 from django.utils import timezone
 from customer.models import Customer 
+from datetime import date
 import random
+import uuid
+
+FIRST_LOAN_ID = 9956  # Loan IDs handed out by the API start here
+LOAN_ID_SEQUENCE = 'loan_id_seq'
+LOAN_ID_SEQUENCE_LOCK = 0x6c6f616e  # Advisory lock key serializing sequence syncs ('loan')
+
 
 class Loan(models.Model):
     loan_id = models.IntegerField(null=False)  
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='loans')
+    # Lookups by customer are served by the composite indexes below, which lead with customer
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='loans', db_index=False)
     loan_amount = models.FloatField(null=False)
     tenure = models.IntegerField(null=False)  # Tenure in months
     interest_rate = models.FloatField(null=False)
     monthly_repayment = models.FloatField(null=False)
     emis_paid_on_time = models.IntegerField(default=0)
-    approval_date = models.DateField(default=timezone.now)
+    approval_date = models.DateField(default=timezone.localdate)
     end_date = models.DateField(null=False, blank=True)  # Blank is set for it to be auto-calculated
+    policy_version = models.CharField(max_length=64, null=True, blank=True)  # Scoring policy that approved it; empty for ingested loans
 
     class Meta:
-        unique_together = ('loan_id', 'customer')  # Ensure unique loan_id per customer
+        unique_together = ('loan_id', 'customer')  # Ensure unique loan_id per customer; also serves loan_id lookups
+        indexes = [
+            # Active loans and exposure (customer + end_date >= today), answered from the index alone
+            models.Index(fields=['customer', 'end_date'], include=['loan_amount'], name='loan_customer_end_date_idx'),
+            # Loans approved in a given year (approval_date__year becomes a date range)
+            models.Index(fields=['customer', 'approval_date'], name='loan_customer_approval_idx'),
+        ]
 
     @staticmethod
     def generate_unique_loan_id():
-        # Get the highest loan_id in the table
-        last_loan = Loan.objects.order_by('-loan_id').first()  # Get the loan with the highest loan_id
-        if last_loan:
-            new_loan_id = last_loan.loan_id + 1  # Increment the loan_id by 1
-        else:
-            new_loan_id = 9956  # Start from 9956 if no loans exist yet
-        
-        return new_loan_id
+        return Loan.allocate_loan_ids(1)[0]
+
+    @staticmethod
+    def allocate_loan_ids(count):
+        # Reserve `count` loan IDs in one round trip. nextval never hands the same value out
+        # twice, so concurrent callers cannot collide and the cost does not grow with the table.
+        if connection.vendor != 'postgresql':
+            # Sequence-less backends fall back to incrementing the highest loan_id
+            last_loan_id = Loan.objects.aggregate(last=models.Max('loan_id'))['last'] or FIRST_LOAN_ID - 1
+            return list(range(last_loan_id + 1, last_loan_id + 1 + count))
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s) FROM generate_series(1, %s)', [LOAN_ID_SEQUENCE, count])
+            return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def create_loan_id_sequence():
+        # Run after every migrate; creating the sequence is a no-op once it exists
+        if connection.vendor != 'postgresql':
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {LOAN_ID_SEQUENCE} START WITH {FIRST_LOAN_ID}')
+        Loan.sync_loan_id_sequence()
+
+    @staticmethod
+    def sync_loan_id_sequence():
+        # Move the loan ID sequence past every stored loan_id, so IDs written
+        # explicitly (e.g. by ingestion) are never handed out again. The sequence only ever
+        # moves forward: setval runs only when the highest stored loan_id is above the last
+        # issued value, so it cannot rewind past a nextval that create-loan took meanwhile.
+        # Concurrent syncs are serialized by a transaction-level advisory lock.
+        if connection.vendor != 'postgresql':
+            return
+        table = connection.ops.quote_name(Loan._meta.db_table)
+        with transaction.atomic(savepoint=False), connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [LOAN_ID_SEQUENCE_LOCK])
+            cursor.execute(
+                f"""
+                SELECT setval(%s, target)
+                FROM (SELECT COALESCE(MAX(loan_id), 0) AS target FROM {table}) AS stored,
+                     (SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END AS issued FROM {LOAN_ID_SEQUENCE}) AS sequence
+                WHERE target > issued AND target >= %s
+                """,
+                [LOAN_ID_SEQUENCE, FIRST_LOAN_ID],
+            )
     
     def clean(self):
         # Loan amount, monthly repayment, and interest rate must be positive
@@ -53,7 +107,9 @@ class Loan(models.Model):
         if self.end_date and self.approval_date and self.end_date <= self.approval_date:
             raise ValidationError('End date must be later than the approval date.')
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, credit_summary=None, **kwargs):
+        # `credit_summary` is the customer's summary row when the caller already holds it
+        # locked (see CustomerCreditSummary.lock), which saves re-reading it
         self.clean()  # Ensure data is cleaned before saving
         
         # Ensure approval_date and tenure are set before calculating end_date
@@ -66,7 +122,298 @@ class Loan(models.Model):
         else:
             raise ValidationError('Approval date and tenure are required to calculate the end date.')
 
-        super().save(*args, **kwargs)
+        created = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Keep the customer's credit summary in step with the loan table
+            if created:
+                CustomerCreditSummary.record_loan(self, summary=credit_summary)
+            else:
+                CustomerCreditSummary.rebuild_locked([self.customer_id])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            CustomerCreditSummary.rebuild_locked([self.customer_id])
+        return result
 
     def __str__(self):
         return f'Loan {self.loan_id} for {self.customer.first_name} {self.customer.last_name}'
+
+
+class CustomerCreditSummary(models.Model):
+    # Denormalized per-customer loan aggregates, so scoring reads one row instead of the loan history
+    customer = models.OneToOneField(Customer, on_delete=models.CASCADE, primary_key=True, related_name='credit_summary')
+    paid_on_time = models.IntegerField(default=0)
+    total_loans = models.IntegerField(default=0)
+    total_volume = models.FloatField(default=0)
+    loans_per_year = models.JSONField(default=dict)  # {"2024": 3, ...} keyed by approval year
+    active_exposure = models.FloatField(default=0)  # Sum of loans with end_date >= exposure_as_of
+    exposure_as_of = models.DateField(default=date.today)
+    exposure_valid_until = models.DateField(null=True, blank=True)  # Earliest end_date among active loans
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # The summaries expire_exposures rolls forward each day
+            models.Index(fields=['exposure_valid_until'], name='summary_exposure_valid_idx'),
+        ]
+
+    def exposure_is_current(self, today):
+        # Loans only drop out of the active set once their end_date has passed,
+        # so the stored exposure holds until the earliest active end_date
+        if today < self.exposure_as_of:
+            return False
+        return self.exposure_valid_until is None or today <= self.exposure_valid_until
+
+    def loans_in_year(self, year):
+        return self.loans_per_year.get(str(year), 0)
+
+    def refresh_exposure(self, today=None, save=True):
+        # Recompute only the date-dependent part of the summary. Only save under lock(): an
+        # unlocked save could overwrite the exposure of a loan committed since the read, so
+        # read paths pass save=False and keep the result in memory.
+        today = today or date.today()
+        totals = Loan.objects.filter(customer_id=self.customer_id, end_date__gte=today).aggregate(
+            active_exposure=Coalesce(Sum('loan_amount'), 0.0),
+            exposure_valid_until=Min('end_date'),
+        )
+        self.active_exposure = totals['active_exposure']
+        self.exposure_valid_until = totals['exposure_valid_until']
+        self.exposure_as_of = today
+        if save:
+            self.save(update_fields=['active_exposure', 'exposure_valid_until', 'exposure_as_of', 'updated_at'])
+
+    @classmethod
+    def lock(cls, customer_id, today=None):
+        # The customer's summary, locked until the surrounding transaction ends, with a
+        # current exposure. Loan applications decide and insert under this lock, so
+        # concurrent ones for a customer are serialized and cannot jointly overshoot the
+        # approved limit. Returns None for an unknown customer.
+        today = today or date.today()
+        summary = cls.objects.select_for_update().filter(customer_id=customer_id).first()
+        if summary is None:
+            # Nothing to lock yet: lock the customer instead, so two first applications
+            # cannot each build a summary from loans the other has not committed
+            if not list(Customer.objects.select_for_update().filter(customer_id=customer_id).values_list('pk')):
+                return None
+            summaries = cls.rebuild([customer_id], today=today)
+            return summaries[0] if summaries else None
+        if not summary.exposure_is_current(today):
+            summary.refresh_exposure(today)
+        return summary
+
+    @classmethod
+    def record_loan(cls, loan, summary=None):
+        # Fold a newly created loan into the summary without re-reading the loan history
+        if summary is None:
+            summary = cls.objects.select_for_update().filter(customer_id=loan.customer_id).first()
+        if summary is None:
+            cls.rebuild_locked([loan.customer_id])
+            return
+
+        year = str(loan.approval_date.year)
+        summary.paid_on_time += loan.emis_paid_on_time
+        summary.total_loans += 1
+        summary.total_volume += loan.loan_amount
+        summary.loans_per_year[year] = summary.loans_per_year.get(year, 0) + 1
+        if loan.end_date >= summary.exposure_as_of:
+            summary.active_exposure += loan.loan_amount
+            if summary.exposure_valid_until is None or loan.end_date < summary.exposure_valid_until:
+                summary.exposure_valid_until = loan.end_date
+        summary.save()
+
+    @classmethod
+    def rebuild(cls, customer_ids=None, today=None, batch_size=1000, save=True):
+        # Recompute summaries from the loan table with set-based queries and upsert them.
+        # With save=False they are only returned, for read paths that hold no lock.
+        today = today or date.today()
+        customers = Customer.objects.all()
+        loans = Loan.objects.all()
+        if customer_ids is not None:
+            customers = customers.filter(customer_id__in=customer_ids)
+            loans = loans.filter(customer_id__in=customer_ids)
+
+        totals = {
+            row['customer_id']: row
+            for row in loans.values('customer_id').annotate(
+                paid_on_time=Coalesce(Sum('emis_paid_on_time'), 0),
+                total_loans=Count('id'),
+                total_volume=Coalesce(Sum('loan_amount'), 0.0),
+                active_exposure=Coalesce(Sum('loan_amount', filter=Q(end_date__gte=today)), 0.0),
+                exposure_valid_until=Min('end_date', filter=Q(end_date__gte=today)),
+            ).order_by()
+        }
+        per_year = {}
+        for row in loans.values('customer_id', 'approval_date__year').annotate(count=Count('id')).order_by():
+            per_year.setdefault(row['customer_id'], {})[str(row['approval_date__year'])] = row['count']
+
+        summaries = []
+        for customer_id in customers.values_list('customer_id', flat=True).iterator():
+            row = totals.get(customer_id, {})
+            summaries.append(cls(
+                customer_id=customer_id,
+                paid_on_time=row.get('paid_on_time', 0),
+                total_loans=row.get('total_loans', 0),
+                total_volume=row.get('total_volume', 0.0),
+                loans_per_year=per_year.get(customer_id, {}),
+                active_exposure=row.get('active_exposure', 0.0),
+                exposure_as_of=today,
+                exposure_valid_until=row.get('exposure_valid_until'),
+            ))
+
+        if not save:
+            return summaries
+        cls.objects.bulk_create(
+            summaries,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['customer'],
+            update_fields=[
+                'paid_on_time', 'total_loans', 'total_volume', 'loans_per_year',
+                'active_exposure', 'exposure_as_of', 'exposure_valid_until', 'updated_at',
+            ],
+        )
+        return summaries
+
+    @classmethod
+    def rebuild_locked(cls, customer_ids, today=None):
+        # rebuild() for writers that can race create-loan. Takes the locks lock() takes, in
+        # customer ID order so concurrent callers cannot deadlock, before reading the loans, so
+        # no loan committed under a lock is left out of the upserted summaries. Customers are
+        # locked FOR NO KEY UPDATE, which still lets a lock() holder insert their loans.
+        customer_ids = sorted(set(customer_ids))
+        with transaction.atomic(savepoint=False):
+            list(cls.objects.select_for_update().filter(customer_id__in=customer_ids).order_by('customer_id').values_list('pk'))
+            list(Customer.objects.select_for_update(no_key=True).filter(customer_id__in=customer_ids).order_by('customer_id').values_list('pk'))
+            return cls.rebuild(customer_ids, today=today)
+
+    @staticmethod
+    def _active_loans(today):
+        # Correlated subqueries for the active exposure of the summary's customer as of
+        # `today`, answered from the (customer, end_date) index alone
+        active = Loan.objects.filter(customer_id=OuterRef('customer_id'), end_date__gte=today).values('customer_id').order_by()
+        exposure = Coalesce(Subquery(active.annotate(total=Sum('loan_amount')).values('total')), 0.0)
+        valid_until = Subquery(active.annotate(first=Min('end_date')).values('first'))
+        return exposure, valid_until
+
+    @classmethod
+    def expire_exposures(cls, today=None):
+        # Roll the active exposure of every summary that has gone stale forward to `today` in
+        # one statement, dropping the loans whose end_date has passed. Run daily after midnight
+        # (loan.tasks.expire_loan_exposure), so eligibility checks read current summaries
+        # instead of refreshing them. Returns the number of summaries updated.
+        today = today or date.today()
+        exposure, valid_until = cls._active_loans(today)
+        return cls.objects.filter(Q(exposure_valid_until__lt=today) | Q(exposure_as_of__gt=today)).update(
+            active_exposure=exposure,
+            exposure_valid_until=valid_until,
+            exposure_as_of=today,
+            updated_at=timezone.now(),
+        )
+
+    @classmethod
+    def reconcile_exposures(cls, today=None, fix=True, sample_size=20, batch_size=1000):
+        # Recompute every customer's active exposure from the loan table and report where
+        # the stored summaries drifted from it; with `fix`, rebuild those summaries.
+        # Customers without a summary count as drift too.
+        today = today or date.today()
+        exposure, valid_until = cls._active_loans(today)
+        drifted = list(
+            cls.objects.annotate(
+                expected_exposure=exposure,
+                # No active loans leaves both dates NULL, which SQL would never call equal
+                stored_valid_until=Coalesce('exposure_valid_until', Value(date.min)),
+                expected_valid_until=Coalesce(valid_until, Value(date.min)),
+            )
+            .filter(
+                Q(exposure_as_of__gt=today)
+                | Q(active_exposure__gt=F('expected_exposure') + 0.005)
+                | Q(active_exposure__lt=F('expected_exposure') - 0.005)
+                | ~Q(stored_valid_until=F('expected_valid_until'))
+            )
+            .values_list('customer_id', 'active_exposure', 'expected_exposure')
+        )
+        missing = list(Customer.objects.filter(credit_summary__isnull=True).values_list('customer_id', flat=True))
+
+        report = {
+            "as_of": today.isoformat(),
+            "checked": cls.objects.count(),
+            "drifted": len(drifted),
+            "missing": len(missing),
+            # Expected minus stored, over the drifted summaries
+            "exposure_drift": sum(expected - stored for _, stored, expected in drifted),
+            "customers": sorted([customer_id for customer_id, _, _ in drifted] + missing)[:sample_size],
+            "fixed": False,
+        }
+        if fix and (drifted or missing):
+            # Recomputed under the summary locks, a batch of customers per transaction, so a loan
+            # created since the drift check is not overwritten by the repair
+            customer_ids = sorted([customer_id for customer_id, _, _ in drifted] + missing)
+            for start in range(0, len(customer_ids), batch_size):
+                with transaction.atomic():
+                    cls.rebuild_locked(customer_ids[start:start + batch_size], today=today)
+            report["fixed"] = True
+        return report
+
+
+class ScoringPolicy(models.Model):
+    # A versioned scoring rule set (see loan.scoring). With SCORING_POLICY_SOURCE=database the
+    # active row decides; activating another version takes effect without a restart.
+    name = models.CharField(max_length=50)
+    version = models.IntegerField()
+    rules = models.JSONField()
+    active = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('name', 'version')
+        constraints = [
+            models.UniqueConstraint(fields=['active'], condition=Q(active=True), name='one_active_scoring_policy'),
+        ]
+
+    def clean(self):
+        from .scoring import CompiledPolicy
+        if not isinstance(self.rules, dict):
+            raise ValidationError("Scoring policy rules must be a JSON object.")
+        try:
+            CompiledPolicy({**self.rules, "name": self.name, "version": self.version})
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+    def activate(self):
+        # Make this the only active version
+        with transaction.atomic():
+            ScoringPolicy.objects.filter(active=True).exclude(pk=self.pk).update(active=False)
+            self.active = True
+            self.save(update_fields=['active'])
+
+    def __str__(self):
+        return f'{self.name}@{self.version}'
+
+
+class LoanApplication(models.Model):
+    # A create-loan request queued for the workers when LOAN_APPLICATION_QUEUE is on. The API
+    # answers 202 with the application_id and serves the outcome from this row once processed.
+    PENDING = 'pending'
+    APPROVED = 'approved'
+    REJECTED = 'rejected'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (APPROVED, 'Approved'), (REJECTED, 'Rejected'), (FAILED, 'Failed')]
+
+    application_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    customer_id = models.IntegerField()  # Not a foreign key: an unknown customer is rejected by the worker
+    loan_amount = models.FloatField()
+    interest_rate = models.FloatField()
+    tenure = models.IntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    status_code = models.IntegerField(null=True, blank=True)  # What the synchronous create-loan would have answered
+    result = models.JSONField(null=True, blank=True)  # ... and its response body
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The workers' queue: pending applications, oldest first
+            models.Index(fields=['created_at'], condition=Q(status='pending'), name='loan_application_pending_idx'),
+        ]
@@ -0,0 +1,109 @@
+import base64
+import hashlib
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.utils.urls import replace_query_param
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+CURSOR_PARAM = 'cursor'
+LIMIT_PARAM = 'limit'
+
+
+class InvalidPage(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def decode_cursor(cursor, model, ordering):
+    # Turn a cursor back into one value per ordering field, typed by the model's fields
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError
+        return [model._meta.get_field(field).to_python(value) for field, value in zip(ordering, values)]
+    except (ValueError, TypeError, LookupError, ValidationError):
+        raise InvalidPage("Invalid cursor.")
+
+
+def _after(ordering, values):
+    # Rows sorting strictly after `values`: (a > x) OR (a = x AND b > y) OR ...
+    return reduce(or_, (
+        Q(**{field: value for field, value in zip(ordering[:position], values)}, **{f'{ordering[position]}__gt': values[position]})
+        for position in range(len(ordering))
+    ))
+
+
+def _query_params(request):
+    # DRF requests expose query_params; plain Django requests (the async views) only GET
+    return getattr(request, 'query_params', request.GET)
+
+
+def _page_size(request):
+    limit = _query_params(request).get(LIMIT_PARAM)
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise InvalidPage("Limit must be a positive integer.")
+    if limit < 1:
+        raise InvalidPage("Limit must be a positive integer.")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _page_query(queryset, request, ordering):
+    limit = _page_size(request)
+    cursor = _query_params(request).get(CURSOR_PARAM)
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(_after(ordering, decode_cursor(cursor, queryset.model, ordering)))
+    # Reading one row past the page tells whether there is a next page without a count query
+    return queryset[:limit + 1], limit
+
+
+def _page_result(rows, limit, ordering):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([last[field] if isinstance(last, dict) else getattr(last, field) for field in ordering])
+
+
+def paginate_keyset(queryset, request, ordering):
+    # Keyset (cursor) pagination: each page filters past the last row of the previous one
+    # instead of skipping an offset, so deep pages cost the same as the first. `ordering`
+    # must identify rows uniquely. Returns the page rows and the next page's cursor, if any;
+    # next_page_url turns the cursor into a link. Raises InvalidPage for a malformed cursor or limit.
+    page, limit = _page_query(queryset, request, ordering)
+    return _page_result(list(page), limit, ordering)
+
+
+async def apaginate_keyset(queryset, request, ordering):
+    page, limit = _page_query(queryset, request, ordering)
+    return _page_result([row async for row in page], limit, ordering)
+
+
+def next_page_url(request, cursor):
+    # The request's own URL, as the client reached it, with the cursor swapped in. Built per
+    # request rather than cached with the page, as the same page is served under several hosts.
+    return replace_query_param(request.build_absolute_uri(), CURSOR_PARAM, cursor)
+
+
+def content_etag(data):
+    # Strong ETag over the response body
+    body = json.dumps(data, sort_keys=True, default=str).encode()
+    return quote_etag(hashlib.sha256(body).hexdigest()[:32])
+
+
+def etag_matches(request, etag):
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    return '*' in etags or etag in etags
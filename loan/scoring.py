@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# Credit scoring policies. A policy is a versioned JSON rule set:
+#
+#   {
+#       "name": "default", "version": 1,
+#       "weights": {"paid_on_time": 10, "total_loans": 5, "current_year_loans": 2, "total_volume": 1},
+#       "volume_unit": 100000,
+#       "slabs": [{"above": 50, "min_rate": null}, {"above": 30, "min_rate": 12}, {"above": 10, "min_rate": 16}],
+#       "max_installment_share": 0.5
+#   }
+#
+# The score is the weighted sum of the credit profile's figures, total_volume counted in whole
+# volume_units. A score above a slab's threshold approves the loan at no less than its
+# min_rate; scores at or below every threshold are rejected, as are loans whose installment
+# exceeds max_installment_share of the monthly salary.
+#
+# Rule sets are compiled once into closures (single decisions) and NumPy expressions
+# (batches). SCORING_POLICY_SOURCE picks where the active one comes from: "builtin" (the
+# rules above), "database" (the active ScoringPolicy row) or the path of a JSON file. The
+# source is checked again at most every SCORING_POLICY_REFRESH seconds, so a new file or
+# activated row takes effect without a restart.
+
+DEFAULT_RULES = {
+    "name": "default",
+    "version": 1,
+    "weights": {"paid_on_time": 10, "total_loans": 5, "current_year_loans": 2, "total_volume": 1},
+    "volume_unit": 100000,
+    "slabs": [{"above": 50, "min_rate": None}, {"above": 30, "min_rate": 12}, {"above": 10, "min_rate": 16}],
+    "max_installment_share": 0.5,
+}
+FEATURES = ('paid_on_time', 'total_loans', 'current_year_loans', 'total_volume')
+DEFAULT_REFRESH = 10  # Seconds
+
+
+def _number(value, field):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"Scoring policy field {field} must be a number.")
+    return value
+
+
+class CompiledPolicy:
+    # A validated rule set and its evaluators. `version` ("name@version") is what decisions record.
+
+    def __init__(self, rules):
+        try:
+            self.name = str(rules["name"])
+            self.version = f'{self.name}@{rules["version"]}'
+            weights = rules["weights"]
+            slabs = rules["slabs"]
+            volume_unit = _number(rules.get("volume_unit", 1), "volume_unit")
+            self.max_installment_share = _number(rules["max_installment_share"], "max_installment_share")
+            if not isinstance(slabs, list) or not slabs:
+                raise ValueError("Scoring policy needs at least one slab.")
+            if not all(isinstance(slab, dict) for slab in slabs):
+                raise ValueError("Scoring policy slabs must be objects with above and min_rate.")
+            slabs = [(_number(slab["above"], "slabs.above"),
+                      None if slab.get("min_rate") is None else _number(slab["min_rate"], "slabs.min_rate"))
+                     for slab in slabs]
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Scoring policy is missing {e}.") from None
+        if not isinstance(weights, dict) or set(weights) - set(FEATURES):
+            raise ValueError(f"Scoring policy weights must be a mapping over {', '.join(FEATURES)}.")
+        if volume_unit <= 0 or not 0 < self.max_installment_share <= 1:
+            raise ValueError("Scoring policy volume_unit must be positive and max_installment_share in (0, 1].")
+
+        paid, loans, current, volume = (_number(weights.get(feature, 0), f"weights.{feature}") for feature in FEATURES)
+        # Highest threshold first, so the first slab a score clears is its slab. Sorting on the
+        # threshold alone keeps slabs that share one in file order; comparing their rates would
+        # fail on a None rate.
+        self.slabs = tuple(sorted(slabs, key=lambda slab: slab[0], reverse=True))
+        self.rules = rules
+
+        def score(profile):
+            return (profile.paid_on_time * paid + profile.total_loans * loans
+                    + profile.current_year_loans * current + (profile.total_volume // volume_unit) * volume)
+
+        def score_array(paid_on_time, total_loans, current_year_loans, total_volume):
+            return paid_on_time * paid + total_loans * loans + current_year_loans * current + (total_volume // volume_unit) * volume
+
+        self.score = score
+        self.score_array = score_array
+
+    def slab(self, score):
+        # (approved, minimum interest rate or None) for a score
+        for above, min_rate in self.slabs:
+            if score > above:
+                return True, min_rate
+        return False, None
+
+    def slab_array(self, scores):
+        # slab() over an array of scores: approved flags and minimum rates, 0 for none
+        approved = scores > self.slabs[-1][0]
+        min_rate = np.select([scores > above for above, _ in self.slabs],
+                             [min_rate or 0 for _, min_rate in self.slabs], default=0)
+        return approved, min_rate
+
+
+def load_rules_file(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+class PolicyStore:
+    # The compiled active policy of this process, re-read from its source when stale
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.policy = None
+        self.stamp = None  # What the source looked like when the policy was loaded
+        self.next_check = 0.0
+
+    def get(self):
+        if self.policy is not None and time.monotonic() < self.next_check:
+            return self.policy
+        with self.lock:
+            if self.policy is None or time.monotonic() >= self.next_check:
+                self._refresh()
+                self.next_check = time.monotonic() + getattr(settings, 'SCORING_POLICY_REFRESH', DEFAULT_REFRESH)
+        return self.policy
+
+    async def aget(self):
+        # A database source is read in a thread; the event loop may not run queries
+        if self.policy is not None and time.monotonic() < self.next_check:
+            return self.policy
+        return await sync_to_async(self.get)()
+
+    def reset(self):
+        with self.lock:
+            self.next_check = 0.0
+
+    def _refresh(self):
+        source = getattr(settings, 'SCORING_POLICY_SOURCE', 'builtin')
+        try:
+            # The stamp identifies the rule set cheaply; the rules are compiled only when it changes
+            if source == 'builtin':
+                stamp, load = 'builtin', lambda: DEFAULT_RULES
+            elif source == 'database':
+                from .models import ScoringPolicy
+                row = ScoringPolicy.objects.filter(active=True).values_list('pk', 'name', 'version', 'rules').first()
+                if row is None:
+                    stamp, load = 'builtin', lambda: DEFAULT_RULES
+                else:
+                    stamp, load = ('database', *row[:3]), lambda: {**row[3], "name": row[1], "version": row[2]}
+            else:
+                stamp, load = (source, os.stat(source).st_mtime_ns), lambda: load_rules_file(source)
+            if stamp != self.stamp or self.policy is None:
+                self.policy, self.stamp = CompiledPolicy(load()), stamp
+                logger.info(f"Scoring policy {self.policy.version} loaded from {source}.")
+        except Exception:
+            # Keep deciding with the policy already in use rather than failing requests
+            logger.exception(f"Could not load the scoring policy from {source}.")
+            if self.policy is None:
+                self.policy, self.stamp = CompiledPolicy(DEFAULT_RULES), 'builtin'
+
+
+policy_store = PolicyStore()
+
+
+def get_policy():
+    return policy_store.get()
+
+
+async def aget_policy():
+    return await policy_store.aget()
+
+
+@receiver(setting_changed)
+def reset_policy(setting, **kwargs):
+    if setting in ('SCORING_POLICY_SOURCE', 'SCORING_POLICY_REFRESH'):
+        policy_store.reset()
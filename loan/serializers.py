@@ -0,0 +1,31 @@
+from rest_framework import serializers
+
+
+class LoanCustomerSerializer(serializers.Serializer):
+    customer_id = serializers.IntegerField()
+    first_name = serializers.CharField()
+    last_name = serializers.CharField()
+    phone_number = serializers.CharField()
+    age = serializers.IntegerField()
+
+
+class LoanDetailSerializer(serializers.Serializer):
+    # A loan with its customer, for view-loan
+    loan_id = serializers.IntegerField()
+    customer = LoanCustomerSerializer()
+    loan_amount = serializers.FloatField()
+    interest_rate = serializers.FloatField()
+    monthly_installment = serializers.FloatField(source='monthly_repayment')
+    tenure = serializers.IntegerField()
+
+
+class CustomerLoanSerializer(serializers.Serializer):
+    # One active loan of a customer, for view-loans; reads .values() rows
+    loan_id = serializers.IntegerField()
+    loan_amount = serializers.FloatField()
+    interest_rate = serializers.FloatField()
+    monthly_installment = serializers.FloatField(source='monthly_repayment')
+    repayments_left = serializers.SerializerMethodField()
+
+    def get_repayments_left(self, loan):
+        return max(loan['tenure'] - loan['emis_paid_on_time'], 0)
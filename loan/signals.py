@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from customer.models import Customer
+from .cache import invalidate_customer, invalidate_loans
+from .models import Loan, ScoringPolicy
+from .scoring import policy_store
+
+
+@receiver([post_save, post_delete], sender=Loan)
+def invalidate_loan_cache(sender, instance, **kwargs):
+    invalidate_loans(instance.customer_id, [instance.loan_id])
+
+
+@receiver([post_save, post_delete], sender=ScoringPolicy)
+def reload_scoring_policy(sender, **kwargs):
+    # Once the change commits: a reload before then would read and cache the old policy, and
+    # a rollback leaves nothing to reload. Other processes notice at their next
+    # SCORING_POLICY_REFRESH check.
+    transaction.on_commit(policy_store.reset)
+
+
+@receiver(post_save, sender=Customer)
+def invalidate_customer_cache(sender, instance, created, **kwargs):
+    if created:
+        invalidate_customer(instance.pk)
+        return
+    # view-loan payloads embed the customer's details
+    invalidate_loans(instance.pk, instance.loans.values_list('loan_id', flat=True))
+
+
+@receiver(post_delete, sender=Customer)
+def invalidate_deleted_customer_cache(sender, instance, **kwargs):
+    # The customer's loans are deleted first and invalidate themselves
+    invalidate_customer(instance.pk)
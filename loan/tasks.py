@@ -0,0 +1,36 @@
+import logging
+from celery import shared_task
+from django.conf import settings
+from .applications import process_application_batch
+from .models import CustomerCreditSummary
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def process_loan_applications(batch_size=None):
+    # Drain the pending loan applications, one micro-batch per transaction. Every queued
+    # application triggers a run, and celery-beat runs it every minute for applications whose
+    # trigger was lost; runs that find the queue already drained return at once.
+    batch_size = batch_size or settings.LOAN_APPLICATION_BATCH_SIZE
+    processed = 0
+    while True:
+        count = process_application_batch(batch_size)
+        processed += count
+        if count < batch_size:
+            return processed
+
+
+@shared_task
+def expire_loan_exposure(reconcile=False):
+    # Scheduled by CELERY_BEAT_SCHEDULE shortly after midnight: take the loans that ended
+    # yesterday out of the customers' active exposure. With `reconcile`, also recompute every
+    # customer's exposure from scratch and repair and report any drift.
+    result = {"expired": CustomerCreditSummary.expire_exposures()}
+    logger.info(f"Rolled the active exposure of {result['expired']} credit summaries forward.")
+    if reconcile:
+        report = result["reconciliation"] = CustomerCreditSummary.reconcile_exposures()
+        if report["drifted"] or report["missing"]:
+            logger.warning(f"Exposure drift: {report['drifted']} summaries off by {report['exposure_drift']:.2f} in total, "
+                           f"{report['missing']} missing; rebuilt. Customers: {report['customers']}")
+    return result
@@ -1,8 +1,32 @@
-from django.test import TestCase
+import json
+import os
+import threading
+import time
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.test import AsyncRequestFactory, Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
 from .models import Customer, Loan
 from rest_framework import status
 from unittest.mock import patch
+from datetime import date, timedelta
+from io import StringIO
+from django.core.management import CommandError, call_command
+import numpy as np
+from . import amortization, async_views
+from core.testing import QueryBudgetMixin, seed_dataset
+from customer.lookup import forget_all
+from .cache import cache_stats, get_cache, invalidate_all, reset_cache_stats
+from .credit import CreditProfile, aggregate_credit_profile, get_credit_profile
+from .models import CustomerCreditSummary, LoanApplication, ScoringPolicy
+from .scoring import DEFAULT_RULES, CompiledPolicy, get_policy, policy_store
+from .tasks import expire_loan_exposure, process_loan_applications
+from .views import MAX_SIMULATION_GRID_SIZE, check_eligibility, check_eligibility_batch, evaluate_eligibility, simulate_loans
 
 class LoanEligibilityTests(TestCase):
     
@@ -16,21 +40,27 @@ class LoanEligibilityTests(TestCase):
             age=30,  # Valid age value
             phone_number='1234567890',  # Add a valid phone number here (10 digits)
         )
+        # A repaid loan history worth a credit score above 50: 6 * 10 + 5 points
+        Loan.objects.create(
+            loan_id=1, customer=cls.customer, loan_amount=300000, tenure=12, interest_rate=10,
+            monthly_repayment=26375, emis_paid_on_time=6, approval_date=date.today() - timedelta(days=730),
+        )
 
-    @patch('loan.views.check_eligibility_view')
-    def test_eligibility_approve(self, mock_calculate_credit_score):
-        # Mock the calculate_credit_score to return a score > 50
-        mock_calculate_credit_score.return_value = 60
-        
-        response = self.client.post(reverse('check-eligibility'), {
-            "customer_id": self.customer.customer_id,
-            "loan_amount": 500000,
-            "interest_rate": 10.0,
-            "tenure": 24
-        })
+    def setUp(self):
+        get_cache().clear()
+
+    def test_eligibility_approve(self):
+        # Runs the real scoring path, reading the customer and their credit summary
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('check-eligibility'), {
+                "customer_id": self.customer.customer_id,
+                "loan_amount": 500000,
+                "interest_rate": 10.0,
+                "tenure": 24
+            })
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertTrue(response.data['loan_approved'])
+        self.assertTrue(response.data['approval'])
         self.assertEqual(response.data['corrected_interest_rate'], 10)
 
     # @patch('./views.py')
@@ -128,3 +158,1081 @@ class LoanEligibilityTests(TestCase):
     #     self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
     #     self.assertEqual(response.data['error'], 'Requested interest rate cannot be greater than 100.')
 
+
+class CreditProfileTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(
+            first_name='Asha',
+            last_name='Rao',
+            monthly_salary=100000,
+            age=35,
+            phone_number='9876543210',
+        )
+        today = date.today()
+        # One active loan approved this year and one closed loan from an earlier year
+        Loan.objects.create(
+            loan_id=1, customer=cls.customer, loan_amount=300000, tenure=24,
+            interest_rate=10, monthly_repayment=13843, emis_paid_on_time=4,
+            approval_date=date(today.year, 1, 1),
+        )
+        Loan.objects.create(
+            loan_id=2, customer=cls.customer, loan_amount=200000, tenure=12,
+            interest_rate=12, monthly_repayment=17770, emis_paid_on_time=12,
+            approval_date=date(today.year - 3, 1, 1),
+        )
+
+    def test_profile_aggregates(self):
+        with self.assertNumQueries(1):
+            profile = get_credit_profile(self.customer)
+
+        self.assertEqual(profile.paid_on_time, 16)
+        self.assertEqual(profile.total_loans, 2)
+        self.assertEqual(profile.current_year_loans, 1)
+        self.assertEqual(profile.total_volume, 500000)
+        self.assertEqual(profile.active_exposure, 300000)
+        self.assertEqual(profile.credit_score, 16 * 10 + 2 * 5 + 1 * 2 + 5)
+
+    def test_profile_without_loans(self):
+        other = Customer.objects.create(
+            first_name='Ravi', last_name='Kumar', monthly_salary=50000, age=40, phone_number='9123456780',
+        )
+        profile = get_credit_profile(other)
+        self.assertEqual(profile.total_loans, 0)
+        self.assertEqual(profile.active_exposure, 0)
+        self.assertEqual(profile.credit_score, 0)
+
+    def test_reads_do_not_write_the_summary(self):
+        # A stale summary is recomputed for the reader only; saving it without the lock could
+        # overwrite a loan that create-loan records in between
+        stale = date.today() - timedelta(days=400)
+        CustomerCreditSummary.objects.filter(customer=self.customer).update(
+            exposure_as_of=stale, exposure_valid_until=stale, active_exposure=1)
+        with self.assertNumQueries(2):  # The summary and the active loans; no UPDATE
+            profile = get_credit_profile(self.customer)
+        self.assertEqual(profile.active_exposure, 300000)
+        summary = CustomerCreditSummary.objects.get(customer=self.customer)
+        self.assertEqual((summary.exposure_as_of, summary.active_exposure), (stale, 1))
+
+        CustomerCreditSummary.objects.filter(customer=self.customer).delete()
+        self.assertEqual(get_credit_profile(self.customer).active_exposure, 300000)
+        self.assertFalse(CustomerCreditSummary.objects.filter(customer=self.customer).exists())
+
+    def test_eligibility_query_count(self):
+        # One query for the customer and one for the credit profile
+        with self.assertNumQueries(2):
+            result, status_code = check_eligibility(self.customer.customer_id, 100000, 10, 12)
+
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertTrue(result['loan_approved'])
+        self.assertEqual(result['corrected_interest_rate'], 10)
+
+
+class CustomerCreditSummaryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(
+            first_name='Meera', last_name='Iyer', monthly_salary=80000, age=29, phone_number='9988776655',
+        )
+
+    def create_loan(self, loan_id, amount, approval_date, tenure=12, emis_paid_on_time=0):
+        return Loan.objects.create(
+            loan_id=loan_id, customer=self.customer, loan_amount=amount, tenure=tenure,
+            interest_rate=12, monthly_repayment=amount / tenure, emis_paid_on_time=emis_paid_on_time,
+            approval_date=approval_date,
+        )
+
+    def test_incremental_updates_match_rebuild(self):
+        today = date.today()
+        self.create_loan(1, 100000, date(today.year, 1, 1), emis_paid_on_time=3)
+        self.create_loan(2, 250000, date(today.year - 2, 6, 1), tenure=60, emis_paid_on_time=20)
+        self.create_loan(3, 50000, date(today.year - 5, 6, 1), emis_paid_on_time=12)
+
+        incremental = get_credit_profile(self.customer)
+        CustomerCreditSummary.rebuild([self.customer.customer_id])
+        self.assertEqual(incremental, get_credit_profile(self.customer))
+        self.assertEqual(incremental, aggregate_credit_profile(self.customer))
+
+    def test_updating_and_deleting_loans_refreshes_summary(self):
+        loan = self.create_loan(1, 100000, date.today(), emis_paid_on_time=1)
+        loan.emis_paid_on_time = 5
+        loan.save()
+        self.assertEqual(get_credit_profile(self.customer).paid_on_time, 5)
+
+        loan.delete()
+        self.assertEqual(get_credit_profile(self.customer).total_loans, 0)
+
+    def test_exposure_refreshed_after_rollover(self):
+        today = date.today()
+        loan = self.create_loan(1, 100000, today - timedelta(days=400))
+        self.assertEqual(get_credit_profile(self.customer).active_exposure, 0)
+
+        loan = self.create_loan(2, 200000, today, tenure=1)
+        self.assertEqual(get_credit_profile(self.customer).active_exposure, 200000)
+
+        # Once the loan's end date has passed it no longer counts as active
+        later = loan.end_date + timedelta(days=1)
+        self.assertEqual(get_credit_profile(self.customer, today=later).active_exposure, 0)
+
+    def test_expired_loans_leave_exposure_in_one_statement(self):
+        today = date.today()
+        ending = self.create_loan(1, 200000, today, tenure=1)
+        self.create_loan(2, 300000, today, tenure=24)
+        later = ending.end_date + timedelta(days=1)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(CustomerCreditSummary.expire_exposures(later), 1)
+        self.assertEqual(CustomerCreditSummary.expire_exposures(later), 0)
+
+        # Eligibility then reads the current summary without refreshing it
+        with self.assertNumQueries(1):
+            profile = get_credit_profile(self.customer, today=later)
+        self.assertEqual(profile.active_exposure, 300000)
+        self.assertEqual(profile, aggregate_credit_profile(self.customer, today=later))
+
+    def test_reconcile_reports_and_repairs_drift(self):
+        self.create_loan(1, 100000, date.today())
+        other = Customer.objects.create(
+            first_name='Ravi', last_name='Menon', monthly_salary=50000, age=41, phone_number='9988776600',
+        )
+        CustomerCreditSummary.objects.filter(customer=self.customer).update(active_exposure=F('active_exposure') + 5000)
+        CustomerCreditSummary.objects.filter(customer=other).delete()
+
+        report = CustomerCreditSummary.reconcile_exposures(fix=False)
+        self.assertEqual((report['drifted'], report['missing'], report['exposure_drift']), (1, 1, -5000))
+        self.assertEqual(report['customers'], [self.customer.customer_id, other.customer_id])
+        self.assertFalse(report['fixed'])
+
+        self.assertTrue(CustomerCreditSummary.reconcile_exposures()['fixed'])
+        report = CustomerCreditSummary.reconcile_exposures()
+        self.assertEqual((report['drifted'], report['missing'], report['fixed']), (0, 0, False))
+        self.assertEqual(CustomerCreditSummary.objects.get(customer=self.customer).active_exposure, 100000)
+
+    def test_expire_task_and_command(self):
+        self.create_loan(1, 100000, date.today())
+        self.assertEqual(expire_loan_exposure(reconcile=True)['reconciliation']['drifted'], 0)
+
+        out = StringIO()
+        call_command('expire_loan_exposure', '--reconcile', '--report-only', stdout=out)
+        self.assertIn('0 drifted', out.getvalue())
+
+    def test_rebuild_command(self):
+        self.create_loan(1, 100000, date.today())
+        CustomerCreditSummary.objects.all().delete()
+
+        call_command('rebuild_credit_summaries', stdout=StringIO())
+        summary = CustomerCreditSummary.objects.get(customer=self.customer)
+        self.assertEqual(summary.total_loans, 1)
+        self.assertEqual(summary.total_volume, 100000)
+
+
+class BatchEligibilityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        today = date.today()
+        cls.customers = []
+        # Customers with increasing loan histories land in different score slabs
+        for index, (salary, loans, emis) in enumerate([(20000, 0, 0), (50000, 1, 1), (80000, 2, 1), (150000, 6, 1), (30000, 8, 0)]):
+            customer = Customer.objects.create(
+                first_name='Test', last_name='Customer', monthly_salary=salary, age=30,
+                phone_number=f'90000000{index:02d}',
+            )
+            for number in range(loans):
+                Loan.objects.create(
+                    loan_id=100 * index + number, customer=customer, loan_amount=100000, tenure=12,
+                    interest_rate=10, monthly_repayment=8792, emis_paid_on_time=emis,
+                    approval_date=date(today.year - number % 2, 1, 1),
+                )
+            cls.customers.append(customer)
+
+    def applications(self):
+        applications = []
+        for customer in self.customers:
+            for amount in (50000, 400000, 5000000):
+                for rate in (8, 14, 20):
+                    applications.append({
+                        'customer_id': customer.customer_id, 'loan_amount': amount,
+                        'interest_rate': rate, 'tenure': 24,
+                    })
+        applications += [
+            {'customer_id': 999999, 'loan_amount': 1000, 'interest_rate': 10, 'tenure': 12},
+            {'customer_id': 'abc', 'loan_amount': 1000, 'interest_rate': 10, 'tenure': 12},
+            {'customer_id': self.customers[0].customer_id, 'loan_amount': -5, 'interest_rate': 10, 'tenure': 12},
+            {'customer_id': self.customers[0].customer_id, 'loan_amount': 1000, 'interest_rate': 10},
+        ]
+        return applications
+
+    def test_batch_matches_single_requests(self):
+        applications = self.applications()
+        batch = check_eligibility_batch(applications)
+        for application, result in zip(applications, batch):
+            if application['customer_id'] == 'abc':
+                self.assertEqual(result[1], status.HTTP_404_NOT_FOUND)
+                continue
+            expected = check_eligibility(
+                application.get('customer_id'), application.get('loan_amount'),
+                application.get('interest_rate'), application.get('tenure'))
+            self.assertEqual(result, expected, application)
+
+    def test_batch_query_count_is_constant(self):
+        applications = self.applications()
+        CustomerCreditSummary.rebuild()  # Reads never store summaries; ingestion and loan writes do
+        # One query for the customers and one for their credit summaries
+        with self.assertNumQueries(2):
+            check_eligibility_batch(applications * 20)
+
+    def test_batch_endpoint(self):
+        applications = self.applications()
+        response = self.client.post(reverse('check-eligibility-batch'), applications, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), len(applications))
+        self.assertEqual(response.data[-4]['status'], status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data[-1]['error'], 'Tenure is required.')
+
+    def test_batch_endpoint_rejects_non_list(self):
+        response = self.client.post(reverse('check-eligibility-batch'), {'customer_id': 1}, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AmortizationTests(SimpleTestCase):
+
+    def reference_emi(self, loan_amount, interest_rate, tenure):
+        rate_of_interest = interest_rate / 100 / 12
+        growth = (1 + rate_of_interest) ** tenure
+        return loan_amount * rate_of_interest * growth / (growth - 1)
+
+    def test_scalar_emi(self):
+        emi = amortization.monthly_installment(500000, 12, 24)
+        self.assertIsInstance(emi, float)
+        self.assertAlmostEqual(emi, self.reference_emi(500000, 12, 24), places=6)
+
+    def test_zero_rate(self):
+        self.assertAlmostEqual(amortization.monthly_installment(120000, 0, 12), 10000)
+
+    def test_vectorized_emi_matches_scalar(self):
+        amounts = np.array([100000, 250000, 75000, 1000000, 50000])
+        rates = np.array([12, 16, 8.5, 10.123, 0])
+        tenures = np.array([12, 360, 24, 400, 6])
+        emis = amortization.monthly_installment(amounts, rates, tenures)
+        for amount, rate, tenure, emi in zip(amounts, rates, tenures, emis):
+            self.assertAlmostEqual(emi, amortization.monthly_installment(amount, rate, tenure), places=6)
+            if rate:
+                self.assertAlmostEqual(emi, self.reference_emi(amount, rate, tenure), places=6)
+
+    def test_schedule_repays_principal(self):
+        schedule = amortization.amortization_schedule(300000, 14, 36)
+        self.assertEqual(len(schedule['month']), 36)
+        self.assertAlmostEqual(schedule['principal'].sum(), 300000, places=4)
+        self.assertAlmostEqual(schedule['balance'][-1], 0, places=4)
+        np.testing.assert_allclose(schedule['principal'] + schedule['interest'], schedule['installment'])
+
+    def test_schedule_for_many_loans(self):
+        schedule = amortization.amortization_schedule([100000, 200000], [0, 12], [6, 12])
+        self.assertEqual(schedule['principal'].shape, (2, 12))
+        np.testing.assert_allclose(schedule['principal'].sum(axis=1), [100000, 200000])
+        # Months past a loan's tenure are padded with zeros
+        self.assertTrue((schedule['installment'][0, 6:] == 0).all())
+
+
+class LoanIdAllocationTests(TransactionTestCase):
+
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            first_name='Kiran', last_name='Das', monthly_salary=90000, age=33, phone_number='9812345678',
+        )
+
+    def create_loan(self, **kwargs):
+        return Loan.objects.create(
+            customer=self.customer, loan_amount=100000, tenure=12, interest_rate=12,
+            monthly_repayment=8885, **kwargs,
+        )
+
+    def test_ids_continue_above_existing_loans(self):
+        self.create_loan(loan_id=12000)
+        Loan.sync_loan_id_sequence()
+        self.assertEqual(self.create_loan().loan_id, 12001)
+
+    def test_sync_only_moves_forward(self):
+        self.create_loan(loan_id=12000)
+        Loan.sync_loan_id_sequence()
+        issued = Loan.allocate_loan_ids(5)[-1]
+        # Nothing stored above the issued IDs: the sequence keeps its place
+        Loan.sync_loan_id_sequence()
+        self.assertEqual(Loan.generate_unique_loan_id(), issued + 1)
+        # A loan ingested above them moves it past that loan
+        self.create_loan(loan_id=issued + 100)
+        Loan.sync_loan_id_sequence()
+        self.assertEqual(Loan.generate_unique_loan_id(), issued + 101)
+
+    def test_block_allocation(self):
+        block = Loan.allocate_loan_ids(50)
+        self.assertEqual(block, list(range(block[0], block[0] + 50)))
+        self.assertGreaterEqual(block[0], 9956)
+        self.assertEqual(Loan.generate_unique_loan_id(), block[-1] + 1)
+
+    def test_allocation_cost_is_constant(self):
+        with self.assertNumQueries(1):
+            Loan.generate_unique_loan_id()
+
+    def test_concurrent_allocation(self):
+        def allocate(_):
+            try:
+                return [Loan.generate_unique_loan_id() for _ in range(20)]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            ids = [loan_id for block in executor.map(allocate, range(8)) for loan_id in block]
+        self.assertEqual(len(ids), len(set(ids)))
+
+
+class ConcurrentLoanCreationTests(TransactionTestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        forget_all()
+        # Approved limit 18 lakh; the repaid loan gives a good credit score and no exposure
+        self.customer = Customer.objects.create(
+            first_name='Rohan', last_name='Iyer', monthly_salary=50000, age=40, phone_number='9823456701',
+        )
+        Loan.objects.create(customer=self.customer, loan_id=800, loan_amount=100000, tenure=12, interest_rate=10,
+                            monthly_repayment=8792, emis_paid_on_time=12, approval_date=date.today() - timedelta(days=800))
+
+    def test_parallel_creates_stay_within_limit(self):
+        data = {'customer_id': self.customer.customer_id, 'loan_amount': 500000, 'interest_rate': 12, 'tenure': 36}
+
+        def apply(_):
+            try:
+                return Client().post(reverse('create-loan'), data, content_type='application/json').status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            codes = list(executor.map(apply, range(8)))
+
+        # Only three 5 lakh loans fit under the limit, whatever the interleaving
+        self.assertEqual(codes.count(status.HTTP_200_OK), 3)
+        self.assertEqual(codes.count(status.HTTP_422_UNPROCESSABLE_ENTITY), 5)
+        active = Loan.objects.filter(customer=self.customer, end_date__gte=date.today())
+        self.assertEqual(sum(active.values_list('loan_amount', flat=True)), 1500000)
+        self.assertEqual(CustomerCreditSummary.objects.get(customer=self.customer).active_exposure, 1500000)
+
+    def test_reconcile_repair_keeps_loans_created_meanwhile(self):
+        CustomerCreditSummary.objects.filter(customer=self.customer).update(active_exposure=F('active_exposure') + 5000)
+        created, commit = threading.Event(), threading.Event()
+
+        def create():
+            # A create-loan that commits after reconcile has found the drift
+            try:
+                with transaction.atomic():
+                    summary = CustomerCreditSummary.lock(self.customer.customer_id)
+                    Loan(customer=self.customer, loan_amount=200000, tenure=12, interest_rate=12,
+                         monthly_repayment=17770, approval_date=date.today()).save(credit_summary=summary)
+                    created.set()
+                    commit.wait(5)
+            finally:
+                connection.close()
+
+        def reconcile():
+            try:
+                return CustomerCreditSummary.reconcile_exposures()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            creating = executor.submit(create)
+            created.wait(5)
+            reconciling = executor.submit(reconcile)
+            time.sleep(0.5)  # Let the repair reach the summary lock
+            commit.set()
+            creating.result()
+            self.assertTrue(reconciling.result()['fixed'])
+
+        summary = CustomerCreditSummary.objects.get(customer=self.customer)
+        self.assertEqual((summary.total_loans, summary.active_exposure), (2, 200000))
+
+    def test_loan_update_keeps_loans_created_meanwhile(self):
+        created, commit = threading.Event(), threading.Event()
+
+        def create():
+            try:
+                with transaction.atomic():
+                    summary = CustomerCreditSummary.lock(self.customer.customer_id)
+                    Loan(customer=self.customer, loan_amount=200000, tenure=12, interest_rate=12,
+                         monthly_repayment=17770, approval_date=date.today()).save(credit_summary=summary)
+                    created.set()
+                    commit.wait(5)
+            finally:
+                connection.close()
+
+        def update():
+            # Rebuilds the summary on save; it must wait for the loan being created
+            try:
+                loan = Loan.objects.get(loan_id=800)
+                loan.emis_paid_on_time = 11
+                loan.save()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            creating = executor.submit(create)
+            created.wait(5)
+            updating = executor.submit(update)
+            time.sleep(0.5)  # Let the update reach the summary lock
+            commit.set()
+            creating.result()
+            updating.result()
+
+        summary = CustomerCreditSummary.objects.get(customer=self.customer)
+        self.assertEqual((summary.total_loans, summary.paid_on_time, summary.active_exposure), (2, 11, 200000))
+
+    def test_first_application_builds_missing_summary(self):
+        CustomerCreditSummary.objects.all().delete()
+        with transaction.atomic():
+            summary = CustomerCreditSummary.lock(self.customer.customer_id)
+        self.assertEqual((summary.total_loans, summary.active_exposure), (1, 0))
+        with transaction.atomic():
+            self.assertIsNone(CustomerCreditSummary.lock(999))
+
+
+class LoanIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Enough customers and loans that the planner prefers an index over a sequential scan
+        customers = Customer.objects.bulk_create([
+            Customer(first_name='Seed', last_name='Customer', age=30, phone_number=f'90000{index:05d}',
+                     monthly_salary=50000, approved_limit=1800000)
+            for index in range(500)
+        ])
+        today = date.today()
+        Loan.objects.bulk_create([
+            Loan(customer=customer, loan_id=index, loan_amount=100000, tenure=12, interest_rate=12,
+                 monthly_repayment=8885, approval_date=today - timedelta(days=30 * month),
+                 end_date=today + timedelta(days=30 * (12 - month)))
+            for index, (customer, month) in enumerate((customer, month) for customer in customers for month in range(20))
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Loan._meta.db_table}')
+        cls.customer = customers[250]
+
+    def assertUsesIndex(self, func, index):
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        table = Loan._meta.db_table
+        sql = next(query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}')
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn(index, plan)
+        self.assertNotIn(f'Seq Scan on {table}', plan)
+
+    def test_active_loans_use_end_date_index(self):
+        summary, = CustomerCreditSummary.rebuild([self.customer.pk])
+        self.assertUsesIndex(lambda: summary.refresh_exposure(date.today()), 'loan_customer_end_date_idx')
+
+    def test_profile_aggregate_uses_customer_index(self):
+        self.assertUsesIndex(lambda: aggregate_credit_profile(self.customer), 'loan_customer_')
+
+    def test_current_year_loans_use_approval_index(self):
+        loans = Loan.objects.filter(customer=self.customer, approval_date__year=date.today().year)
+        self.assertUsesIndex(lambda: loans.count(), 'loan_customer_approval_idx')
+
+    def test_loan_lookup_uses_unique_index(self):
+        self.assertUsesIndex(lambda: list(Loan.objects.filter(loan_id=5000)), 'Index Scan')
+
+
+class LoanListingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(
+            first_name='Meera', last_name='Iyer', monthly_salary=80000, age=35, phone_number='9898989898',
+        )
+        cls.other = Customer.objects.create(
+            first_name='Ravi', last_name='Nair', monthly_salary=60000, age=29, phone_number='9797979797',
+        )
+        today = date.today()
+        Loan.objects.bulk_create([
+            Loan(customer=cls.customer, loan_id=100 + index, loan_amount=100000, tenure=24, interest_rate=12,
+                 monthly_repayment=4707, emis_paid_on_time=index % 5, approval_date=today - timedelta(days=300),
+                 end_date=today + timedelta(days=index // 3))  # Ties on end_date are broken by loan_id
+            for index in range(25)
+        ] + [
+            Loan(customer=cls.customer, loan_id=99, loan_amount=50000, tenure=12, interest_rate=12,
+                 monthly_repayment=4442, approval_date=today - timedelta(days=500), end_date=today - timedelta(days=1)),
+            Loan(customer=cls.other, loan_id=100, loan_amount=70000, tenure=12, interest_rate=14,
+                 monthly_repayment=6285, approval_date=today, end_date=today + timedelta(days=365)),
+        ])
+
+    def setUp(self):
+        get_cache().clear()
+
+    def walk(self, url):
+        # Follow the Link headers, returning every row and the number of pages
+        rows, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            rows += response.json()
+            pages += 1
+            url = response.headers.get('Link', '').partition('<')[2].partition('>')[0]
+        return rows, pages
+
+    def test_view_loans_pages_by_end_date_and_loan_id(self):
+        url = reverse('view-loans', args=[self.customer.customer_id])
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'limit': 10})
+        self.assertEqual(len(response.json()), 10)
+        self.assertIn('rel="next"', response.headers['Link'])
+
+        rows, pages = self.walk(f'{url}?limit=10')
+        self.assertEqual(pages, 3)
+        self.assertEqual([row['loan_id'] for row in rows], list(range(100, 125)))
+        self.assertEqual(rows[3], {'loan_id': 103, 'loan_amount': 100000.0, 'interest_rate': 12.0,
+                                   'monthly_installment': 4707.0, 'repayments_left': 21})
+
+    def test_view_loan_reads_customer_in_same_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('view-loan', args=[100]))
+        self.assertEqual([loan['customer']['customer_id'] for loan in response.json()],
+                         [self.customer.customer_id, self.other.customer_id])
+        self.assertEqual(response.json()[0]['customer'], {
+            'customer_id': self.customer.customer_id, 'first_name': 'Meera', 'last_name': 'Iyer',
+            'phone_number': '9898989898', 'age': 35,
+        })
+        self.assertEqual(self.client.get(reverse('view-loan', args=[5])).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unchanged_page_returns_not_modified(self):
+        url = reverse('view-loans', args=[self.customer.customer_id])
+        etag = self.client.get(url).headers['ETag']
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        # Any change to the page produces a new ETag
+        loan = Loan.objects.get(loan_id=100, customer=self.customer)
+        loan.emis_paid_on_time = 3
+        loan.save()
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_invalid_requests(self):
+        url = reverse('view-loans', args=[self.customer.customer_id])
+        for params in ({'cursor': 'not-a-cursor'}, {'limit': 0}, {'limit': 'ten'}):
+            self.assertEqual(self.client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse('view-loans', args=[9999])).status_code, status.HTTP_404_NOT_FOUND)
+
+        Loan.objects.filter(customer=self.other).delete()
+        response = self.client.get(reverse('view-loans', args=[self.other.customer_id]))
+        self.assertEqual(response.json(), {'message': 'No active loans found for this customer.'})
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'loan-cache-tests'}})
+class LoanCacheTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        reset_cache_stats()
+        forget_all()
+        self.customer = Customer.objects.create(
+            first_name='Asha', last_name='Menon', monthly_salary=100000, age=40, phone_number='9090909090',
+        )
+        self.loan = Loan.objects.create(
+            customer=self.customer, loan_id=500, loan_amount=200000, tenure=24, interest_rate=11,
+            monthly_repayment=9321, emis_paid_on_time=20, approval_date=date.today() - timedelta(days=400),
+        )
+
+    def check(self):
+        return check_eligibility(self.customer.customer_id, 100000, 10, 12)
+
+    def test_repeat_eligibility_check_skips_database(self):
+        first = self.check()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.check(), first)
+        self.assertEqual(cache_stats(), {'eligibility.miss': 1, 'eligibility.hit': 1})
+
+    def test_loan_writes_invalidate_profile(self):
+        self.check()
+        Loan.objects.create(customer=self.customer, loan_amount=6000000, tenure=12, interest_rate=11, monthly_repayment=530000)
+        result, status_code = self.check()
+        self.assertEqual(status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(cache_stats()['eligibility.miss'], 2)
+
+        Loan.objects.filter(loan_amount=6000000).get().delete()
+        self.assertEqual(self.check()[1], status.HTTP_200_OK)
+
+    def test_customer_writes_invalidate_loan_payloads(self):
+        url = reverse('view-loan', args=[500])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        self.customer.first_name = 'Anita'
+        self.customer.save()
+        self.assertEqual(self.client.get(url).json()[0]['customer']['first_name'], 'Anita')
+
+    def test_view_loans_cached_until_midnight(self):
+        url = reverse('view-loans', args=[self.customer.customer_id])
+        with patch('loan.cache.seconds_until_tomorrow', return_value=90), \
+                patch.object(type(get_cache()), 'set', autospec=True, side_effect=type(get_cache()).set) as cache_set:
+            self.client.get(url)
+        self.assertEqual(cache_set.call_args.args[3], 90)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json()[0]['loan_id'], 500)
+
+    @override_settings(ALLOWED_HOSTS=['api.example.com', 'internal.example.com'])
+    def test_cached_page_links_to_the_requesting_host(self):
+        Loan.objects.create(customer=self.customer, loan_id=501, loan_amount=100000, tenure=12, interest_rate=11,
+                            monthly_repayment=8838, approval_date=date.today())
+        url = reverse('view-loans', args=[self.customer.customer_id])
+        first = self.client.get(url, {'limit': 1}, headers={'Host': 'internal.example.com'})
+        self.assertTrue(first.headers['Link'].startswith(f'<http://internal.example.com{url}?'))
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {'limit': 1}, headers={'Host': 'api.example.com'}, secure=True)
+        self.assertTrue(second.headers['Link'].startswith(f'<https://api.example.com{url}?'))
+        self.assertEqual(second.headers['ETag'], first.headers['ETag'])
+
+    def test_bulk_writes_invalidate_everything(self):
+        self.check()
+        Loan.objects.filter(pk=self.loan.pk).update(emis_paid_on_time=0)  # Bypasses the signals
+        with self.assertNumQueries(0):
+            self.check()
+        invalidate_all()
+        with self.assertNumQueries(2):  # The customer row and the credit summary
+            self.check()
+
+
+class AsyncLoanViewTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        forget_all()
+        self.factory = AsyncRequestFactory()
+        self.customer = Customer.objects.create(
+            first_name='Tara', last_name='Singh', monthly_salary=120000, age=38, phone_number='9345678901',
+        )
+        Loan.objects.create(customer=self.customer, loan_id=700, loan_amount=300000, tenure=36, interest_rate=10,
+                            monthly_repayment=9680, emis_paid_on_time=30, approval_date=date.today() - timedelta(days=700))
+
+    async def test_check_eligibility_matches_sync_view(self):
+        data = {'customer_id': self.customer.customer_id, 'loan_amount': 200000, 'interest_rate': 9, 'tenure': 24}
+        response = await async_views.check_eligibility_view(self.factory.post('/', data, content_type='application/json'))
+        sync_response = await sync_to_async(self.client.post)(reverse('check-eligibility'), data, content_type='application/json')
+        self.assertEqual(response.status_code, sync_response.status_code)
+        self.assertEqual(json.loads(response.content), sync_response.json())
+
+        response = await async_views.check_eligibility_view(self.factory.post('/', {**data, 'customer_id': 999}, content_type='application/json'))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_create_then_view_loans(self):
+        data = {'customer_id': self.customer.customer_id, 'loan_amount': 100000, 'interest_rate': 12, 'tenure': 12}
+        response = await async_views.create_loan_view(self.factory.post('/', data, content_type='application/json'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        loan_id = json.loads(response.content)['loan_id']
+
+        response = await async_views.view_loans_view(self.factory.get('/'), self.customer.customer_id)
+        self.assertEqual([loan['loan_id'] for loan in json.loads(response.content)], [loan_id, 700])
+
+        response = await async_views.view_loan_view(self.factory.get('/'), 700)
+        self.assertEqual(json.loads(response.content)[0]['customer']['first_name'], 'Tara')
+        etag = response.headers['ETag']
+        response = await async_views.view_loan_view(self.factory.get('/', headers={'If-None-Match': etag}), 700)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_errors(self):
+        response = await async_views.view_loans_view(self.factory.get('/', {'limit': 0}), self.customer.customer_id)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = await async_views.view_loans_view(self.factory.get('/'), 999)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = await async_views.create_loan_view(self.factory.post('/', 'not json', content_type='application/json'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LoanQueryBudgetTests(QueryBudgetMixin, TestCase):
+    # Upper bounds on the queries and rows each loan endpoint needs on a cold cache,
+    # measured on a seeded dataset; an extra query per loan or customer fails these
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customers = seed_dataset(customers=50, max_loans=8)
+        # The customer with the longest loan history who still qualifies for a small loan
+        cls.customer = next(
+            customer for customer in sorted(cls.customers, key=lambda customer: -customer.loans.count())
+            if check_eligibility(customer.customer_id, 50000, 12, 12)[0].get('loan_approved')
+        )
+
+    def setUp(self):
+        get_cache().clear()
+        forget_all()
+
+    def application(self, customer, loan_amount=50000):
+        return {'customer_id': customer.customer_id, 'loan_amount': loan_amount, 'interest_rate': 12, 'tenure': 12}
+
+    def test_check_eligibility(self):
+        # The customer and their credit summary
+        with self.assertQueryBudget(2, rows=2):
+            response = self.client.post(reverse('check-eligibility'), self.application(self.customer),
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_check_eligibility_batch(self):
+        # The same two queries for the whole batch, one row per customer from each
+        with self.assertQueryBudget(2, rows=2 * len(self.customers)):
+            response = self.client.post(reverse('check-eligibility-batch'),
+                                        [self.application(customer) for customer in self.customers],
+                                        content_type='application/json')
+        self.assertEqual(len(response.json()), len(self.customers))
+
+    def test_create_loan(self):
+        # Eligibility check, then in one transaction: summary lock, loan ID, insert and summary update
+        with self.assertQueryBudget(10, rows=5):
+            response = self.client.post(reverse('create-loan'), self.application(self.customer),
+                                        content_type='application/json')
+        self.assertTrue(response.json()['loan_approved'])
+
+    def test_view_loan(self):
+        loan = self.customer.loans.first()
+        with self.assertQueryBudget(1, rows=1):
+            response = self.client.get(reverse('view-loan', args=[loan.loan_id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_view_loans(self):
+        # One page of the customer's active loans, plus the row that tells whether another page follows
+        with self.assertQueryBudget(1, rows=3):
+            response = self.client.get(reverse('view-loans', args=[self.customer.customer_id]), {'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+@override_settings(LOAN_APPLICATION_QUEUE=True)
+class LoanApplicationQueueTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Room for three loans of 1,000,000 under the approved limit of 3,600,000
+        cls.customer = Customer.objects.create(
+            first_name='Tara', last_name='Sen', monthly_salary=100000, age=40, phone_number='9833344455',
+        )
+        cls.other = Customer.objects.create(
+            first_name='Dev', last_name='Roy', monthly_salary=80000, age=31, phone_number='9833344466',
+        )
+        # A repaid loan each, for a credit score above 50
+        for loan_id, customer in enumerate([cls.customer, cls.other], start=1):
+            Loan.objects.create(
+                loan_id=loan_id, customer=customer, loan_amount=100000, tenure=12, interest_rate=12,
+                monthly_repayment=8885, emis_paid_on_time=12, approval_date=date.today() - timedelta(days=800),
+            )
+
+    def setUp(self):
+        get_cache().clear()
+
+    def apply(self, customer_id, loan_amount=1000000):
+        data = {'customer_id': customer_id, 'loan_amount': loan_amount, 'interest_rate': 14, 'tenure': 60}
+        with patch('loan.tasks.process_loan_applications.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('create-loan'), data, content_type='application/json')
+        return response, delay
+
+    def test_create_loan_is_queued(self):
+        with self.assertQueryBudget(1):
+            response, delay = self.apply(self.customer.customer_id)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.json()['status'], 'pending')
+        self.assertEqual(response.headers['Location'], response.json()['status_url'])
+        delay.assert_called_once_with()
+        self.assertEqual(Loan.objects.count(), 2)  # Only the loan history
+
+        status_response = self.client.get(response.json()['status_url'])
+        self.assertEqual(status_response.json()['status'], 'pending')
+        self.assertIsNone(status_response.json()['result'])
+
+    def test_invalid_application_is_not_queued(self):
+        response, delay = self.apply(self.customer.customer_id, loan_amount=-5)
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(response.json()['message'], 'Loan amount must be greater than 0.')
+        delay.assert_not_called()
+        self.assertFalse(LoanApplication.objects.exists())
+
+    def test_worker_decides_applications_per_customer(self):
+        urls = [self.apply(customer_id)[0].json()['status_url']
+                for customer_id in [self.customer.customer_id] * 4 + [self.other.customer_id, 999999]]
+
+        # Two batches: the four applications of one customer, then the other two. Each customer's
+        # summary is locked and read once, however many applications they have.
+        with self.assertQueryBudget(36) as budget:
+            self.assertEqual(process_loan_applications(batch_size=4), 6)
+        self.assertEqual(sum('FOR UPDATE' in sql and 'loan_customercreditsummary' in sql for sql in budget.queries), 2)
+
+        outcomes = [self.client.get(url).json() for url in urls]
+        self.assertEqual([outcome['status'] for outcome in outcomes],
+                         ['approved', 'approved', 'approved', 'rejected', 'approved', 'rejected'])
+        self.assertEqual(outcomes[3]['result']['message'], 'Customer has exceeded their approved credit limit.')
+        self.assertEqual(outcomes[5]['status_code'], status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(outcomes[5]['result']['message'], 'Customer not found.')
+        self.assertEqual(Loan.objects.filter(customer=self.customer).count(), 4)
+        self.assertTrue(Loan.objects.filter(loan_id=outcomes[0]['result']['loan_id'], customer=self.customer).exists())
+        self.assertEqual(CustomerCreditSummary.objects.get(customer=self.customer).active_exposure, 3000000)
+
+    def test_sweep_decides_applications_whose_trigger_was_lost(self):
+        data = {'customer_id': self.customer.customer_id, 'loan_amount': 100000, 'interest_rate': 14, 'tenure': 12}
+        with patch('loan.tasks.process_loan_applications.delay', side_effect=OSError('broker down')), \
+                self.assertLogs('loan.applications', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+            url = self.client.post(reverse('create-loan'), data, content_type='application/json').json()['status_url']
+        self.assertEqual(self.client.get(url).json()['status'], 'pending')
+
+        sweep = settings.CELERY_BEAT_SCHEDULE['process-loan-applications']
+        self.assertEqual(sweep['task'], process_loan_applications.name)
+        process_loan_applications()
+        self.assertEqual(self.client.get(url).json()['status'], 'approved')
+
+    def test_unknown_application(self):
+        response = self.client.get(reverse('loan-application', args=['00000000-0000-0000-0000-000000000000']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_async_view_queues(self):
+        factory = AsyncRequestFactory()
+        data = {'customer_id': self.customer.customer_id, 'loan_amount': 100000, 'interest_rate': 14, 'tenure': 12}
+        with patch('loan.tasks.process_loan_applications.delay'):
+            response = await async_views.create_loan_view(factory.post('/', data, content_type='application/json'))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(json.loads(response.content)['status'], 'pending')
+
+
+class ScoringPolicyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(
+            first_name='Ira', last_name='Das', monthly_salary=100000, age=35, phone_number='9844455566',
+        )
+        # Score 6 * 10 + 5 = 65 under the default policy
+        Loan.objects.create(
+            loan_id=1, customer=cls.customer, loan_amount=100000, tenure=12, interest_rate=12,
+            monthly_repayment=8885, emis_paid_on_time=6, approval_date=date.today() - timedelta(days=800),
+        )
+
+    def setUp(self):
+        get_cache().clear()
+        self.addCleanup(policy_store.reset)
+
+    def eligibility(self, interest_rate=8):
+        return self.client.post(reverse('check-eligibility'), {
+            'customer_id': self.customer.customer_id, 'loan_amount': 100000, 'interest_rate': interest_rate, 'tenure': 12,
+        }, content_type='application/json')
+
+    def write_rules(self, path, **rules):
+        with open(path, 'w') as file:
+            json.dump({**DEFAULT_RULES, **rules}, file)
+
+    def test_default_policy_keeps_the_slabs(self):
+        policy = CompiledPolicy(DEFAULT_RULES)
+        self.assertEqual(policy.version, 'default@1')
+        self.assertEqual(policy.score(CreditProfile(3, 2, 1, 250000, 0)), 30 + 10 + 2 + 2)
+        for score, expected in [(51, (True, None)), (50, (True, 12)), (31, (True, 12)), (30, (True, 16)),
+                                (11, (True, 16)), (10, (False, None)), (0, (False, None))]:
+            self.assertEqual(policy.slab(score), expected, score)
+
+    def test_array_evaluation_matches_single(self):
+        policy = CompiledPolicy(DEFAULT_RULES)
+        rng = np.random.default_rng(0)
+        features = [rng.integers(0, 10, 200).astype(float) for _ in range(3)] + [rng.integers(0, 2000000, 200).astype(float)]
+        scores = policy.score_array(*features)
+        approved, min_rate = policy.slab_array(scores)
+        for position in range(200):
+            profile = CreditProfile(*(feature[position] for feature in features), 0)
+            self.assertEqual(scores[position], policy.score(profile))
+            expected_approved, expected_rate = policy.slab(scores[position])
+            self.assertEqual((bool(approved[position]), min_rate[position]), (expected_approved, expected_rate or 0))
+
+    def test_invalid_rules_are_rejected(self):
+        for rules in [{}, {**DEFAULT_RULES, 'slabs': []}, {**DEFAULT_RULES, 'weights': {'age': 1}},
+                      {**DEFAULT_RULES, 'max_installment_share': 2}, {**DEFAULT_RULES, 'volume_unit': '1'},
+                      {**DEFAULT_RULES, 'slabs': [{'min_rate': 12}]}, {**DEFAULT_RULES, 'slabs': [[50, None]]},
+                      {**DEFAULT_RULES, 'slabs': [{'above': '50'}]}]:
+            with self.assertRaises(ValueError):
+                CompiledPolicy(rules)
+
+    def test_slabs_sharing_a_threshold(self):
+        # Sorting must not compare a None rate with a number; the first listed slab wins
+        policy = CompiledPolicy({**DEFAULT_RULES, 'slabs': [{'above': 30, 'min_rate': 12}, {'above': 30, 'min_rate': None}]})
+        self.assertEqual(policy.slab(40), (True, 12))
+        self.assertEqual(policy.slab(20), (False, None))
+
+    def test_decisions_record_the_policy_version(self):
+        response = self.eligibility()
+        self.assertEqual(response.data['policy_version'], 'default@1')
+        response = self.client.post(reverse('create-loan'), {
+            'customer_id': self.customer.customer_id, 'loan_amount': 100000, 'interest_rate': 14, 'tenure': 12,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['policy_version'], 'default@1')
+        self.assertEqual(Loan.objects.get(loan_id=response.data['loan_id']).policy_version, 'default@1')
+        self.assertIsNone(Loan.objects.get(loan_id=1).policy_version)
+
+    def test_file_policy_is_reloaded_when_changed(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'policy.json')
+        self.write_rules(path, name='strict', version=1)
+        with override_settings(SCORING_POLICY_SOURCE=path, SCORING_POLICY_REFRESH=0):
+            response = self.eligibility()
+            self.assertEqual(response.data['policy_version'], 'strict@1')
+            self.assertEqual(response.data['corrected_interest_rate'], 8)
+
+            # Score 65 now falls in a slab with a minimum rate of 18
+            self.write_rules(path, name='strict', version=2, slabs=[{'above': 80, 'min_rate': None}, {'above': 40, 'min_rate': 18}])
+            os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1000000))
+            response = self.eligibility()
+            self.assertEqual(response.data['policy_version'], 'strict@2')
+            self.assertEqual(response.data['corrected_interest_rate'], 18)
+
+            # A broken file keeps the policy in use
+            with open(path, 'w') as file:
+                file.write('{"name": ')
+            os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 2000000))
+            with self.assertLogs('loan.scoring', 'ERROR'):
+                self.assertEqual(get_policy().version, 'strict@2')
+
+    def test_database_policy(self):
+        ScoringPolicy.objects.create(name='default', version=1, rules=DEFAULT_RULES, active=True)
+        tighter = ScoringPolicy.objects.create(
+            name='default', version=2, rules={**DEFAULT_RULES, 'max_installment_share': 0.05},
+        )
+        with override_settings(SCORING_POLICY_SOURCE='database'):
+            self.assertEqual(self.eligibility().data['policy_version'], 'default@1')
+
+            # Activating a version reloads the policy in this process once it commits
+            with self.captureOnCommitCallbacks(execute=True):
+                tighter.activate()
+                self.assertEqual(get_policy().version, 'default@1')
+            response = self.eligibility()
+            self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+            self.assertEqual(response.data['policy_version'], 'default@2')
+
+            # The policy is read once per refresh interval, not per decision; with the
+            # customer's inputs cached a repeated check runs no queries at all
+            with self.assertNumQueries(0):
+                self.eligibility()
+
+    def test_load_scoring_policy_command(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'policy.json')
+        self.write_rules(path, name='retail', version=3)
+        call_command('load_scoring_policy', path, '--activate', stdout=StringIO())
+        policy = ScoringPolicy.objects.get(active=True)
+        self.assertEqual((policy.name, policy.version), ('retail', 3))
+        self.assertNotIn('name', policy.rules)
+
+        self.write_rules(path, name='retail', version=4, slabs=[])
+        with self.assertRaises(CommandError):
+            call_command('load_scoring_policy', path, stdout=StringIO())
+
+
+class LoanSimulationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Score 65 with 400,000 of an approved limit of 3,600,000 still active
+        cls.customer = Customer.objects.create(
+            first_name='Kabir', last_name='Shah', monthly_salary=100000, age=38, phone_number='9855566677',
+        )
+        Loan.objects.create(
+            loan_id=1, customer=cls.customer, loan_amount=100000, tenure=12, interest_rate=12,
+            monthly_repayment=8885, emis_paid_on_time=6, approval_date=date.today() - timedelta(days=800),
+        )
+        Loan.objects.create(
+            loan_id=2, customer=cls.customer, loan_amount=400000, tenure=120, interest_rate=11,
+            monthly_repayment=5510, emis_paid_on_time=0, approval_date=date.today() - timedelta(days=30),
+        )
+        # A customer without history scores 0 and is never approved
+        cls.newcomer = Customer.objects.create(
+            first_name='Mira', last_name='Nair', monthly_salary=60000, age=25, phone_number='9855566688',
+        )
+
+    def setUp(self):
+        get_cache().clear()
+        forget_all()
+
+    def simulate(self, **data):
+        return self.client.post(reverse('simulate'), {'customer_id': self.customer.customer_id, **data}, content_type='application/json')
+
+    def test_frontier_is_the_largest_approvable_amount(self):
+        tenures, rates = [6, 12, 36, 60, 120, 240, 360], [7.5, 10, 13.25, 18, 24]
+        response = self.simulate(tenures=tenures, interest_rates=rates)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['frontier']), len(tenures) * len(rates))
+        self.assertEqual({item['limited_by'] for item in response.data['frontier']}, {'credit_limit', 'monthly_installment'})
+
+        customer, profile = Customer.objects.get(pk=self.customer.pk), get_credit_profile(self.customer)
+        for item in response.data['frontier']:
+            amount = item['max_loan_amount']
+            result, status_code = evaluate_eligibility(customer, profile, amount, item['interest_rate'], item['tenure'])
+            self.assertEqual(status_code, status.HTTP_200_OK, item)
+            self.assertTrue(result['loan_approved'])
+            self.assertEqual(result['monthly_installment'], item['monthly_installment'])
+            self.assertEqual(result['corrected_interest_rate'], item['corrected_interest_rate'])
+            _, status_code = evaluate_eligibility(customer, profile, amount + 1, item['interest_rate'], item['tenure'])
+            self.assertEqual(status_code, status.HTTP_422_UNPROCESSABLE_ENTITY, item)
+
+    def test_grid_matches_single_checks(self):
+        amounts, tenures, rates = [50000, 1500000, 3200000, 4000000], [12, 60], [8, 14]
+        response = self.simulate(loan_amounts=amounts, tenures=tenures, interest_rates=rates)
+        grid = response.data['grid']
+        self.assertEqual(len(grid), len(amounts) * len(tenures) * len(rates))
+        for item in grid:
+            result, _ = check_eligibility(self.customer.customer_id, item['loan_amount'], item['interest_rate'], item['tenure'])
+            self.assertEqual(item['loan_approved'], result.get('loan_approved', False), item)
+            self.assertEqual(item.get('error'), result.get('error'), item)
+            if item['loan_approved']:
+                self.assertEqual(item['monthly_installment'], result['monthly_installment'])
+                self.assertEqual(item['corrected_interest_rate'], result['corrected_interest_rate'])
+
+    def test_profile_is_read_once(self):
+        # The customer and their credit summary, however large the sweep
+        with self.assertNumQueries(2):
+            response = self.simulate(loan_amounts=list(range(10000, 1010000, 10000)), tenures=list(range(6, 366, 6)), interest_rates=[10])
+        self.assertEqual(len(response.data['grid']), 100 * 60)
+
+    def test_unapproved_customer_has_no_frontier(self):
+        response = self.simulate(customer_id=self.newcomer.customer_id, tenures=[12], interest_rates=[10])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['loan_approved'])
+        self.assertIsNone(response.data['frontier'][0]['max_loan_amount'])
+
+    def test_invalid_requests(self):
+        for data, message in [
+            ({'interest_rates': [10]}, 'Tenures are required.'),
+            ({'tenures': 12, 'interest_rates': [10]}, 'Tenures must be a non-empty list of numbers.'),
+            ({'tenures': [12], 'interest_rates': ['abc']}, 'Interest rates must be a non-empty list of numbers.'),
+            ({'tenures': [12], 'interest_rates': [10], 'loan_amounts': [-1]}, 'Loan amounts must be greater than 0.'),
+            ({'tenures': [12], 'interest_rates': [120]}, 'Interest rates cannot be greater than 100.'),
+            ({'tenures': list(range(1, 101)), 'interest_rates': [10], 'loan_amounts': list(range(1, MAX_SIMULATION_GRID_SIZE // 100 + 2))},
+             f'A simulation may contain at most {MAX_SIMULATION_GRID_SIZE} combinations.'),
+        ]:
+            response = self.simulate(**data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, data)
+            self.assertEqual(response.data['error'], message)
+        response = self.simulate(customer_id=999999, tenures=[12], interest_rates=[10])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_huge_amounts_terminate(self):
+        # Above 2**53 a rupee step does not change a float; the sweep must still finish
+        customer = Customer(customer_id=1, monthly_salary=2.5e17, approved_limit=9e18)
+        profile = CreditProfile(6, 1, 0, 100000, 0)
+        result = simulate_loans(customer, profile, [], [7], [12])
+        amount = result['frontier'][0]['max_loan_amount']
+        if amount is not None:
+            self.assertLessEqual(result['frontier'][0]['monthly_installment'], result['max_monthly_installment'])
+
+        Customer.objects.filter(pk=self.customer.pk).update(monthly_salary=2.5e17, approved_limit=9e18)
+        response = self.simulate(tenures=[7], interest_rates=[12])
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        response = self.simulate(tenures=[7], interest_rates=[12], loan_amounts=[1e15])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -3,7 +3,10 @@ from . import views
 
 urlpatterns = [
     path('check-eligibility/', views.check_eligibility_view, name='check-eligibility'),
+    path('check-eligibility/batch/', views.check_eligibility_batch_view, name='check-eligibility-batch'),
+    path('simulate/', views.simulate_loans_view, name='simulate'),
     path('create-loan/', views.create_loan_view, name='create-loan'),
+    path('loan-application/<uuid:application_id>/', views.loan_application_view, name='loan-application'),
     path('view-loan/<int:loan_id>/', views.view_loan_view, name='view-loan'),
     path('view-loans/<int:customer_id>/', views.view_loans_view, name='view-loans'),
 ]
@@ -1,134 +1,222 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Loan
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from .models import CustomerCreditSummary, Loan, LoanApplication
 from customer.models import Customer
+from customer.lookup import get_customer
 from datetime import date
-from django.db.models import Sum
-
-def calculate_credit_score(customer, loan_amount):
-    # Get the customer's past loans
-    loans = Loan.objects.filter(customer=customer)
-    
-    # Loans paid on time (assuming 'emis_paid_on_time' is an integer count of EMIs paid on time)
-    paid_on_time = loans.aggregate(total_paid_on_time=Sum('emis_paid_on_time'))['total_paid_on_time'] or 0
-    
-    # Total number of loans
-    total_loans = loans.count()
-    
-    # Loan activity for the current year
-    loan_activity_current_year = loans.filter(approval_date__year=date.today().year).count()
-    
-    # Total approved loan volume (sum of loan amounts)
-    approved_loan_volume = loans.aggregate(total=Sum('loan_amount'))['total'] or 0
-    
-    credit_score = 0
-    
-    # Factors for calculating credit score
-    credit_score += paid_on_time * 10  # 10 points per loan paid on time
-    credit_score += total_loans * 5    # 5 points for each loan taken
-    credit_score += loan_activity_current_year * 2  # 2 points for each loan activity in the current year
-    credit_score += approved_loan_volume // 100000  # 1 point for every 1 Lakh loan approved
+import numpy as np
+from . import amortization
+from .credit import get_credit_profile, get_credit_profiles, profile_from_summary
+from .cache import customer_scope, get_eligibility_inputs, get_or_compute, loan_scope, ttl_for_today
+from .scoring import get_policy
+from .pagination import (
+    CURSOR_PARAM, LIMIT_PARAM, InvalidPage, content_etag, etag_matches, next_page_url, paginate_keyset,
+)
+from .serializers import CustomerLoanSerializer, LoanDetailSerializer
+
+MAX_ELIGIBILITY_BATCH_SIZE = 10000
+MAX_SIMULATION_GRID_SIZE = 10000  # Amount x tenure x rate combinations per simulation
+MAX_SIMULATION_AMOUNT = 1e12  # Rupees; amounts, salaries and limits stay exact in whole rupees well below 2**53
+FRONTIER_STEPS = 4  # Rupee steps a frontier candidate may move down before the cell is given up
+
+def calculate_credit_score(customer, loan_amount, profile=None, policy=None):
+    # Aggregate the customer's past loans unless the caller already has them
+    if profile is None:
+        profile = get_credit_profile(customer)
 
     # Check if the sum of current loans exceeds approved limit
-    active_loans = Loan.objects.filter(customer=customer, end_date__gte=date.today())  # Loans that are still active
-    total_current_loans = active_loans.aggregate(total=Sum('loan_amount'))['total'] or 0
-
-    if loan_amount + total_current_loans > customer.approved_limit:
+    if loan_amount + profile.active_exposure > customer.approved_limit:
         return 0  # Set credit score to 0 if loans exceed approved limit
 
-    return credit_score
+    return (policy or get_policy()).score(profile)
 
 
 def calculate_monthly_installment(loan_amount, interest_rate, tenure):
-    # Formula for calculating EMI based on loan amount, interest rate, and tenure
-    rate_of_interest = interest_rate / 100 / 12  # Monthly rate
-    emi = loan_amount * rate_of_interest * ((1 + rate_of_interest) ** tenure) / (((1 + rate_of_interest) ** tenure) - 1)
-    return round(emi, 2)
+    # EMI based on loan amount, interest rate, and tenure, from the shared amortization engine
+    return round(amortization.monthly_installment(loan_amount, interest_rate, tenure), 2)
 
-def check_eligibility(customer_id, loan_amount, requested_interest_rate, tenure):
+def validate_eligibility_request(customer_id, loan_amount, requested_interest_rate, tenure):
     # Check if all fields are provided
     if customer_id is None:
-        return {"error": "Customer ID is required."}, status.HTTP_400_BAD_REQUEST
+        return None, ({"error": "Customer ID is required."}, status.HTTP_400_BAD_REQUEST)
     if loan_amount is None:
-        return {"error": "Loan amount is required."}, status.HTTP_400_BAD_REQUEST
+        return None, ({"error": "Loan amount is required."}, status.HTTP_400_BAD_REQUEST)
     if requested_interest_rate is None:
-        return {"error": "Interest rate is required."}, status.HTTP_400_BAD_REQUEST
+        return None, ({"error": "Interest rate is required."}, status.HTTP_400_BAD_REQUEST)
     if tenure is None:
-        return {"error": "Tenure is required."}, status.HTTP_400_BAD_REQUEST
+        return None, ({"error": "Tenure is required."}, status.HTTP_400_BAD_REQUEST)
 
     # Validate loan_amount and requested_interest_rate
     try:
         loan_amount = float(loan_amount)
-    except ValueError:
-        return {"error": "Loan amount must be a valid number."}, status.HTTP_400_BAD_REQUEST
+    except (ValueError, TypeError):
+        return None, ({"error": "Loan amount must be a valid number."}, status.HTTP_400_BAD_REQUEST)
 
     try:
         requested_interest_rate = float(requested_interest_rate)
-    except ValueError:
-        return {"error": "Interest rate must be a valid number."}, status.HTTP_400_BAD_REQUEST
+    except (ValueError, TypeError):
+        return None, ({"error": "Interest rate must be a valid number."}, status.HTTP_400_BAD_REQUEST)
 
     try:
         tenure = int(tenure)
-    except ValueError:
-        return {"error": "Tenure must be a valid integer."}, status.HTTP_400_BAD_REQUEST
+    except (ValueError, TypeError):
+        return None, ({"error": "Tenure must be a valid integer."}, status.HTTP_400_BAD_REQUEST)
 
     # Validate loan_amount and requested_interest_rate are greater than 0
     if loan_amount <= 0:
-        return {"error": "Loan amount must be greater than 0."}, status.HTTP_400_BAD_REQUEST
+        return None, ({"error": "Loan amount must be greater than 0."}, status.HTTP_400_BAD_REQUEST)
 
     if requested_interest_rate <= 0:
-        return {"error": "Interest rate must be greater than 0."}, status.HTTP_400_BAD_REQUEST
+        return None, ({"error": "Interest rate must be greater than 0."}, status.HTTP_400_BAD_REQUEST)
+
+    if tenure <= 0:
+        return None, ({"error": "Tenure must be greater than 0."}, status.HTTP_400_BAD_REQUEST)
 
     # Validate requested interest rate
     if requested_interest_rate > 100:
-        return {"error": "Requested interest rate cannot be greater than 100."}, status.HTTP_400_BAD_REQUEST
-    
-    # Get the customer object
-    try:
-        customer = Customer.objects.get(customer_id=customer_id)
-    except Customer.DoesNotExist:
+        return None, ({"error": "Requested interest rate cannot be greater than 100."}, status.HTTP_400_BAD_REQUEST)
+
+    return (loan_amount, requested_interest_rate, tenure), None
+
+
+def check_eligibility(customer_id, loan_amount, requested_interest_rate, tenure):
+    values, error = validate_eligibility_request(customer_id, loan_amount, requested_interest_rate, tenure)
+    if error:
+        return error
+    loan_amount, requested_interest_rate, tenure = values
+
+    # Get the customer and their aggregated loan history, from the cache when possible
+    customer, profile = get_eligibility_inputs(customer_id)
+    if customer is None:
         return {"error": "Customer not found."}, status.HTTP_404_NOT_FOUND
+    return evaluate_eligibility(customer, profile, loan_amount, requested_interest_rate, tenure)
+
+
+def evaluate_eligibility(customer, profile, loan_amount, requested_interest_rate, tenure, policy=None):
+    # The eligibility decision for validated inputs; shared by the sync and async views.
+    # Every outcome names the scoring policy version that produced it.
+    policy = policy or get_policy()
 
     # Check if the sum of current loans + requested loan amount exceeds the approved limit
-    total_current_loans = Loan.objects.filter(customer=customer, end_date__gte=date.today()).aggregate(total=Sum('loan_amount'))['total'] or 0
-    if total_current_loans + loan_amount > customer.approved_limit:
-        return {"error": "Customer has exceeded their approved credit limit."}, status.HTTP_422_UNPROCESSABLE_ENTITY
+    if profile.active_exposure + loan_amount > customer.approved_limit:
+        return {"error": "Customer has exceeded their approved credit limit.", "policy_version": policy.version}, status.HTTP_422_UNPROCESSABLE_ENTITY
     
     # Calculate the credit score
-    credit_score = calculate_credit_score(customer, loan_amount)
+    credit_score = calculate_credit_score(customer, loan_amount, profile, policy)
 
-    # Determine loan approval based on the credit score
-    loan_approved = False
+    # Determine loan approval and the minimum interest rate from the policy's score slabs
+    loan_approved, min_rate = policy.slab(credit_score)
     corrected_interest_rate = requested_interest_rate
-    if credit_score > 50:
-        loan_approved = True
-    elif 30 < credit_score <= 50:
-        if requested_interest_rate <= 12:
-            corrected_interest_rate = 12
-        loan_approved = True
-    elif 10 < credit_score <= 30:
-        if requested_interest_rate <= 16:
-            corrected_interest_rate = 16
-        loan_approved = True
-    else:
-        loan_approved = False
+    if loan_approved and min_rate is not None and requested_interest_rate <= min_rate:
+        corrected_interest_rate = min_rate
 
-    # Check if monthly installments exceed 50% of monthly salary
+    # Check if monthly installments exceed the policy's share (50%) of monthly salary
+    monthly_installment = None
     if loan_approved:
         monthly_installment = calculate_monthly_installment(loan_amount, corrected_interest_rate, tenure)
-        if monthly_installment > (customer.monthly_salary * 0.5):
-            return {"error": "Loan cannot be approved as the monthly installment exceeds 50% of monthly salary."}, status.HTTP_422_UNPROCESSABLE_ENTITY
+        if monthly_installment > (customer.monthly_salary * policy.max_installment_share):
+            return {"error": f"Loan cannot be approved as the monthly installment exceeds {policy.max_installment_share:.0%} of monthly salary.",
+                    "policy_version": policy.version}, status.HTTP_422_UNPROCESSABLE_ENTITY
     
     return {
         "customer_id": customer.customer_id,
         "requested_interest_rate": requested_interest_rate,
         "corrected_interest_rate": corrected_interest_rate,
         "loan_approved": loan_approved,
-        "monthly_installment": monthly_installment
+        "monthly_installment": monthly_installment,
+        "policy_version": policy.version
     }, status.HTTP_200_OK
 
 
+def check_eligibility_batch(applications):
+    # Evaluate many eligibility requests at once; every entry gets the same
+    # (result, status_code) pair check_eligibility would have returned for it
+    results = [None] * len(applications)
+    pending = []
+    for index, application in enumerate(applications):
+        customer_id = application.get('customer_id')
+        values, error = validate_eligibility_request(
+            customer_id, application.get('loan_amount'), application.get('interest_rate'), application.get('tenure'))
+        if error:
+            results[index] = error
+            continue
+        try:
+            customer_id = int(customer_id)
+        except (ValueError, TypeError):
+            results[index] = {"error": "Customer not found."}, status.HTTP_404_NOT_FOUND
+            continue
+        pending.append((index, customer_id, *values))
+
+    # Load the customers and their credit profiles with a couple of set-based queries
+    customers = Customer.objects.in_bulk({customer_id for _, customer_id, *_ in pending})
+    profiles = get_credit_profiles(list(customers))
+
+    found = []
+    for entry in pending:
+        if entry[1] in customers:
+            found.append(entry)
+        else:
+            results[entry[0]] = {"error": "Customer not found."}, status.HTTP_404_NOT_FOUND
+    if not found:
+        return results
+
+    indexes, customer_ids, loan_amount, requested_interest_rate, tenure = (list(column) for column in zip(*found))
+    loan_amount = np.array(loan_amount, dtype=float)
+    requested_interest_rate = np.array(requested_interest_rate, dtype=float)
+    tenure = np.array(tenure, dtype=float)
+    approved_limit = np.array([customers[customer_id].approved_limit for customer_id in customer_ids], dtype=float)
+    monthly_salary = np.array([customers[customer_id].monthly_salary for customer_id in customer_ids], dtype=float)
+    batch_profiles = [profiles[customer_id] for customer_id in customer_ids]
+    active_exposure, paid_on_time, total_loans, current_year_loans, total_volume = (
+        np.array([getattr(profile, field) for profile in batch_profiles], dtype=float)
+        for field in ('active_exposure', 'paid_on_time', 'total_loans', 'current_year_loans', 'total_volume')
+    )
+
+    # Same rules as check_eligibility, applied to the whole batch at once with the same policy
+    policy = get_policy()
+    credit_score = policy.score_array(paid_on_time, total_loans, current_year_loans, total_volume)
+    limit_exceeded = active_exposure + loan_amount > approved_limit
+    loan_approved, slab_rate = policy.slab_array(credit_score)
+    corrected = loan_approved & (requested_interest_rate <= slab_rate)
+    corrected_interest_rate = np.where(corrected, slab_rate, requested_interest_rate)
+
+    emi = [round(value, 2) for value in amortization.monthly_installment(loan_amount, corrected_interest_rate, tenure).tolist()]
+    installment_too_high = loan_approved & (np.array(emi) > monthly_salary * policy.max_installment_share)
+
+    for position, index in enumerate(indexes):
+        if limit_exceeded[position]:
+            results[index] = {"error": "Customer has exceeded their approved credit limit.", "policy_version": policy.version}, status.HTTP_422_UNPROCESSABLE_ENTITY
+        elif installment_too_high[position]:
+            results[index] = {"error": f"Loan cannot be approved as the monthly installment exceeds {policy.max_installment_share:.0%} of monthly salary.",
+                              "policy_version": policy.version}, status.HTTP_422_UNPROCESSABLE_ENTITY
+        else:
+            results[index] = {
+                "customer_id": customer_ids[position],
+                "requested_interest_rate": requested_interest_rate[position].item(),
+                "corrected_interest_rate": slab_rate[position].item() if corrected[position] else requested_interest_rate[position].item(),
+                "loan_approved": bool(loan_approved[position]),
+                "monthly_installment": emi[position] if loan_approved[position] else None,
+                "policy_version": policy.version
+            }, status.HTTP_200_OK
+    return results
+
+
+def format_eligibility_response(customer_id, requested_interest_rate, tenure, result):
+    return {
+        "customer_id": customer_id,
+        "approval": result.get("loan_approved", False),
+        "interest_rate": requested_interest_rate if requested_interest_rate else None,
+        "corrected_interest_rate": result.get("corrected_interest_rate"),
+        "tenure": tenure if tenure else None,
+        "monthly_installment": result.get("monthly_installment"),
+        "policy_version": result.get("policy_version")
+    }
+
+
 @api_view(['POST'])
 def check_eligibility_view(request):
     if request.method == 'POST':
@@ -142,19 +230,258 @@ def check_eligibility_view(request):
         result, status_code = check_eligibility(customer_id, loan_amount, requested_interest_rate, tenure)
 
         # Define a default response structure
-        response_data = {
-            "customer_id": customer_id,
-            "approval": result.get("loan_approved", False),
-            "interest_rate": requested_interest_rate if requested_interest_rate else None,
-            "corrected_interest_rate": result.get("corrected_interest_rate"),
-            "tenure": tenure if tenure else None,
-            "monthly_installment": result.get("monthly_installment")
-        }
+        response_data = format_eligibility_response(customer_id, requested_interest_rate, tenure, result)
 
         # Return the response with the appropriate status code
         return Response(response_data, status=status_code)
 
 
+@api_view(['POST'])
+def check_eligibility_batch_view(request):
+    if request.method == 'POST':
+        applications = request.data
+        if not isinstance(applications, list) or not all(isinstance(item, dict) for item in applications):
+            return Response({"error": "Request body must be a list of eligibility requests."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(applications) > MAX_ELIGIBILITY_BATCH_SIZE:
+            return Response({"error": f"A batch may contain at most {MAX_ELIGIBILITY_BATCH_SIZE} requests."}, status=status.HTTP_400_BAD_REQUEST)
+
+        response_data = []
+        for application, (result, status_code) in zip(applications, check_eligibility_batch(applications)):
+            item = format_eligibility_response(
+                application.get('customer_id'), application.get('interest_rate'), application.get('tenure'), result)
+            item["status"] = status_code
+            if "error" in result:
+                item["error"] = result["error"]
+            response_data.append(item)
+
+        return Response(response_data, status=status.HTTP_200_OK)
+
+
+def validate_simulation_request(data):
+    # Returns ((customer_id, loan_amounts, tenures, interest_rates), None) or (None, error)
+    customer_id = data.get('customer_id')
+    if customer_id is None:
+        return None, ({"error": "Customer ID is required."}, status.HTTP_400_BAD_REQUEST)
+
+    values = []
+    for field, label, cast, required in (('loan_amounts', 'Loan amounts', float, False),
+                                         ('tenures', 'Tenures', int, True),
+                                         ('interest_rates', 'Interest rates', float, True)):
+        items = data.get(field)
+        if items is None and not required:
+            values.append([])
+            continue
+        if items is None:
+            return None, ({"error": f"{label} are required."}, status.HTTP_400_BAD_REQUEST)
+        try:
+            if not isinstance(items, list) or not items:
+                raise TypeError
+            items = [cast(item) for item in items]
+        except (ValueError, TypeError):
+            return None, ({"error": f"{label} must be a non-empty list of numbers."}, status.HTTP_400_BAD_REQUEST)
+        if any(item <= 0 for item in items):
+            return None, ({"error": f"{label} must be greater than 0."}, status.HTTP_400_BAD_REQUEST)
+        values.append(items)
+
+    loan_amounts, tenures, interest_rates = values
+    if any(amount > MAX_SIMULATION_AMOUNT for amount in loan_amounts):
+        return None, ({"error": f"Loan amounts cannot be greater than {MAX_SIMULATION_AMOUNT:.0f}."}, status.HTTP_400_BAD_REQUEST)
+    if any(rate > 100 for rate in interest_rates):
+        return None, ({"error": "Interest rates cannot be greater than 100."}, status.HTTP_400_BAD_REQUEST)
+    if max(len(loan_amounts), 1) * len(tenures) * len(interest_rates) > MAX_SIMULATION_GRID_SIZE:
+        return None, ({"error": f"A simulation may contain at most {MAX_SIMULATION_GRID_SIZE} combinations."}, status.HTTP_400_BAD_REQUEST)
+    return (customer_id, loan_amounts, tenures, interest_rates), None
+
+
+def simulate_loans(customer, profile, loan_amounts, tenures, interest_rates, policy=None):
+    # What-if sweep over validated inputs with the rules of evaluate_eligibility. The score and
+    # its slab do not depend on the amount, so they are taken once; installments for the whole
+    # amount x tenure x rate grid are one broadcast over the cached annuity factors.
+    policy = policy or get_policy()
+    available_limit = customer.approved_limit - profile.active_exposure
+    max_installment = customer.monthly_salary * policy.max_installment_share
+    credit_score = calculate_credit_score(customer, 0, profile, policy)
+    loan_approved, min_rate = policy.slab(credit_score)
+
+    rates = np.array(interest_rates, dtype=float)
+    if loan_approved and min_rate is not None:
+        rates = np.where(rates <= min_rate, min_rate, rates)
+    tenure_column = np.array(tenures, dtype=float)[:, None]
+    factors = amortization.annuity_factors(rates[None, :], tenure_column)  # tenure x rate
+
+    # Frontier: the installment is linear in the amount, so the largest amount under the
+    # installment cap is cap / factor (plus the half-paisa the rounded installment allows),
+    # bounded by the remaining credit limit. Candidates are then checked with the exact
+    # rounded installment and moved down a rupee at a time, at most FRONTIER_STEPS times;
+    # a cell still over the cap after that reports no approvable amount.
+    headroom = np.floor(available_limit) if loan_approved and available_limit >= 1 else 0
+    by_installment = np.floor((max_installment + 0.005) / factors)
+    amounts = np.minimum(by_installment, headroom)
+    for _ in range(FRONTIER_STEPS + 1):
+        installments = np.array([round(value, 2) for value in (amounts * factors).ravel().tolist()]).reshape(amounts.shape)
+        too_high = (amounts >= 1) & ((installments > max_installment) | (profile.active_exposure + amounts > customer.approved_limit))
+        if not too_high.any():
+            break
+        amounts = np.where(too_high, amounts - np.maximum(1, np.spacing(amounts)), amounts)
+    else:
+        amounts = np.where(too_high, 0, amounts)
+
+    frontier = []
+    for (row, column), amount in np.ndenumerate(amounts):
+        approvable = amount >= 1
+        frontier.append({
+            "tenure": tenures[row],
+            "interest_rate": interest_rates[column],
+            "corrected_interest_rate": rates[column].item(),
+            "max_loan_amount": int(amount) if approvable else None,
+            "monthly_installment": installments[row, column].item() if approvable else None,
+            "limited_by": None if not approvable else "credit_limit" if by_installment[row, column] > headroom else "monthly_installment",
+        })
+
+    # Grid: every requested amount against every tenure and rate
+    grid = []
+    if loan_amounts:
+        installments = [round(value, 2) for value in (np.array(loan_amounts, dtype=float)[:, None, None] * factors).ravel().tolist()]
+        cells = ((amount, tenure, column) for amount in loan_amounts for tenure in tenures for column in range(len(interest_rates)))
+        for (amount, tenure, column), installment in zip(cells, installments):
+            item = {
+                "loan_amount": amount,
+                "tenure": tenure,
+                "interest_rate": interest_rates[column],
+                "corrected_interest_rate": rates[column].item(),
+                "loan_approved": loan_approved,
+                "monthly_installment": installment if loan_approved else None,
+            }
+            if profile.active_exposure + amount > customer.approved_limit:
+                item.update(loan_approved=False, error="Customer has exceeded their approved credit limit.")
+            elif loan_approved and installment > max_installment:
+                item.update(loan_approved=False, error=f"Loan cannot be approved as the monthly installment exceeds {policy.max_installment_share:.0%} of monthly salary.")
+            grid.append(item)
+
+    return {
+        "customer_id": customer.customer_id,
+        "credit_score": credit_score,
+        "loan_approved": loan_approved,
+        "available_limit": available_limit,
+        "max_monthly_installment": max_installment,
+        "policy_version": policy.version,
+        "frontier": frontier,
+        "grid": grid,
+    }
+
+
+@api_view(['POST'])
+def simulate_loans_view(request):
+    if request.method == 'POST':
+        values, error = validate_simulation_request(request.data)
+        if error:
+            return Response(*error)
+        customer_id, loan_amounts, tenures, interest_rates = values
+
+        # The customer and their credit profile are read once for the whole sweep
+        customer, profile = get_eligibility_inputs(customer_id)
+        if customer is None:
+            return Response({"error": "Customer not found."}, status=status.HTTP_404_NOT_FOUND)
+        if not 0 < customer.monthly_salary <= MAX_SIMULATION_AMOUNT or not 0 <= customer.approved_limit <= MAX_SIMULATION_AMOUNT:
+            return Response({"error": "Customer's salary or approved limit is outside the range the simulation supports."},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        return Response(simulate_loans(customer, profile, loan_amounts, tenures, interest_rates), status=status.HTTP_200_OK)
+
+
+def create_approved_loan(customer, loan_amount, requested_interest_rate, tenure, today=None):
+    # Decide and insert in one transaction, holding the lock on the customer's credit summary.
+    # The decision is taken again on the locked summary, since the cached profile an earlier
+    # eligibility check used cannot see loans a concurrent application has just created.
+    # Returns (loan, eligibility result, status code); the loan is None when not approved.
+    today = today or date.today()
+    with transaction.atomic():
+        summary = CustomerCreditSummary.lock(customer.pk, today)
+        if summary is None:
+            return None, {"error": "Customer not found."}, status.HTTP_404_NOT_FOUND
+        return create_loan_on_summary(customer, summary, loan_amount, requested_interest_rate, tenure, today)
+
+
+def create_loan_on_summary(customer, summary, loan_amount, requested_interest_rate, tenure, today, loan_id=None):
+    # Decide on the customer's locked summary and insert the loan when approved. Saving the
+    # loan folds it into `summary`, so later applications of the customer can reuse it.
+    result, status_code = evaluate_eligibility(
+        customer, profile_from_summary(summary, today), loan_amount, requested_interest_rate, tenure)
+    if status_code != status.HTTP_200_OK or not result.get("loan_approved"):
+        return None, result, status_code
+
+    loan = Loan(
+        loan_id=loan_id,
+        customer=customer,
+        loan_amount=loan_amount,
+        interest_rate=result["corrected_interest_rate"],
+        tenure=tenure,
+        monthly_repayment=result["monthly_installment"],
+        policy_version=result["policy_version"]
+    )
+    loan.save(credit_summary=summary)
+    return loan, result, status_code
+
+
+def approved_loan_response(customer_id, loan, eligibility_response):
+    return {
+        "loan_id": loan.loan_id,
+        "customer_id": customer_id,
+        "loan_approved": True,
+        "message": "Loan was approved successfully",
+        "monthly_installment": eligibility_response.get("monthly_installment"),
+        "policy_version": eligibility_response.get("policy_version")
+    }
+
+
+def rejected_loan_response(customer_id, eligibility_response):
+    return {
+        "loan_id": None,
+        "customer_id": customer_id,
+        "loan_approved": False,
+        "message": eligibility_response.get("error", "Loan was not approved"),
+        "monthly_installment": None
+    }
+
+
+def queued_application_response(application):
+    return {
+        "application_id": str(application.application_id),
+        "customer_id": application.customer_id,
+        "status": application.status,
+        "status_url": reverse('loan-application', args=[application.application_id]),
+    }
+
+
+def application_status_response(application):
+    return {
+        "application_id": str(application.application_id),
+        "customer_id": application.customer_id,
+        "status": application.status,
+        "created_at": application.created_at,
+        "processed_at": application.processed_at,
+        "status_code": application.status_code,
+        "result": application.result,
+    }
+
+
+def queue_loan_application(customer_id, loan_amount, requested_interest_rate, tenure):
+    # create-loan with LOAN_APPLICATION_QUEUE on: validate, store the application for the
+    # workers (see loan.applications) and return (response data, status code) right away
+    from .applications import enqueue_application
+
+    values, error = validate_eligibility_request(customer_id, loan_amount, requested_interest_rate, tenure)
+    if error is None:
+        try:
+            customer_id = int(customer_id)
+        except (ValueError, TypeError):
+            error = {"error": "Customer not found."}, status.HTTP_404_NOT_FOUND
+    if error:
+        return rejected_loan_response(customer_id, error[0]), status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    application = enqueue_application(customer_id, *values)
+    return queued_application_response(application), status.HTTP_202_ACCEPTED
+
+
 @api_view(['POST'])
 def create_loan_view(request):
     if request.method == 'POST':
@@ -163,55 +490,86 @@ def create_loan_view(request):
         requested_interest_rate = request.data.get('interest_rate')
         tenure = request.data.get('tenure')
 
+        # Queued mode answers before any scoring; poll the status_url for the outcome
+        if settings.LOAN_APPLICATION_QUEUE:
+            response_data, status_code = queue_loan_application(customer_id, loan_amount, requested_interest_rate, tenure)
+            headers = {"Location": response_data["status_url"]} if status_code == status.HTTP_202_ACCEPTED else None
+            return Response(response_data, status=status_code, headers=headers)
+
+        # Turn away ineligible applications from the cached profile, before taking any lock
         eligibility_response, status_code = check_eligibility(customer_id, loan_amount, requested_interest_rate, tenure)
 
         # If eligibility check fails or loan is not approved, return response data
         if status_code != status.HTTP_200_OK or not eligibility_response.get("loan_approved"):
-            return Response({
-                "loan_id": None,
-                "customer_id": customer_id,
-                "loan_approved": False,
-                "message": eligibility_response.get("error", "Loan was not approved"),
-                "monthly_installment": None
-            }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
-
-        # Ensure the customer exists
-        try:
-            customer = Customer.objects.get(customer_id=customer_id)
-        except Customer.DoesNotExist:
+            return Response(rejected_loan_response(customer_id, eligibility_response), status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        # Ensure the customer exists; check_eligibility has already loaded it for this request
+        customer = get_customer(customer_id)
+        if customer is None:
             return Response({
                 "error": "Customer not found."
             }, status=status.HTTP_404_NOT_FOUND)
 
-        corrected_interest_rate = eligibility_response.get("corrected_interest_rate")
-        monthly_installment = eligibility_response.get("monthly_installment")
-
-        # Create loan record
+        # Create loan record; the inputs passed validation in check_eligibility
+        values, _ = validate_eligibility_request(customer_id, loan_amount, requested_interest_rate, tenure)
         try:
-            loan = Loan.objects.create(
-                customer=customer,
-                loan_amount=loan_amount,
-                interest_rate=corrected_interest_rate,
-                tenure=tenure,
-                monthly_repayment=monthly_installment
-            )
+            loan, eligibility_response, status_code = create_approved_loan(customer, *values)
         except Exception as e:
             return Response({
                 "error": f"Failed to create loan: {str(e)}"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        # Successful loan creation
-        response_data = {
-            "loan_id": loan.loan_id,
-            "customer_id": customer_id,
-            "loan_approved": True,
-            "message": "Loan was approved successfully",
-            "monthly_installment": monthly_installment
-        }
+        # Another application may have used up the limit since the first check
+        if loan is None:
+            return Response(rejected_loan_response(customer_id, eligibility_response), status=status.HTTP_422_UNPROCESSABLE_ENTITY)
 
-        return Response(response_data, status=status.HTTP_200_OK)
+        # Successful loan creation
+        return Response(approved_loan_response(customer_id, loan, eligibility_response), status=status.HTTP_200_OK)
     
 
+@api_view(['GET'])
+def loan_application_view(request, application_id):
+    application = LoanApplication.objects.filter(application_id=application_id).first()
+    if application is None:
+        return Response({"error": "Loan application not found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(application_status_response(application), status=status.HTTP_200_OK)
+
+
+def loan_detail_queryset(loan_id):
+    # The loans with the given loan_id together with their customers, in one query
+    return Loan.objects.filter(loan_id=loan_id).select_related('customer').only(
+        'loan_id', 'loan_amount', 'interest_rate', 'monthly_repayment', 'tenure', 'end_date', 'customer_id',
+        'customer__first_name', 'customer__last_name', 'customer__phone_number', 'customer__age',
+    )
+
+
+def active_loans_queryset(customer_id):
+    # The customer's current (active) loans, reading only the fields shown
+    return Loan.objects.filter(customer_id=customer_id, end_date__gte=date.today()).values(
+        'loan_id', 'loan_amount', 'interest_rate', 'monthly_repayment', 'tenure', 'emis_paid_on_time', 'end_date',
+    )
+
+
+def page_params(request):
+    params = getattr(request, 'query_params', request.GET)
+    return params.get(CURSOR_PARAM), params.get(LIMIT_PARAM)
+
+
+def page_headers(request, data, next_cursor):
+    # The next page's Link and an ETag over the page contents
+    headers = {"Link": f'<{next_page_url(request, next_cursor)}>; rel="next"'} if next_cursor else {}
+    headers["ETag"] = content_etag([data, next_cursor])
+    return headers
+
+
+def _page_response(request, data, next_cursor):
+    # Send the page, or 304 when the client already has it
+    headers = page_headers(request, data, next_cursor)
+    if etag_matches(request, headers["ETag"]):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(data, status=status.HTTP_200_OK, headers=headers)
+
+
 @api_view(['GET'])
 def view_loan_view(request, loan_id):
     # Check if loan_id is provided and valid
@@ -219,34 +577,22 @@ def view_loan_view(request, loan_id):
         return Response({"error": "Loan ID is required."}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        # Fetch all loans with the given loan_id
-        loans = Loan.objects.filter(loan_id=loan_id)
-        
+        loans = loan_detail_queryset(loan_id)
+        # A loan ID can be shared by loans of different customers, so page through them
+        def load_page():
+            page, next_cursor = paginate_keyset(loans, request, ('end_date', 'customer_id'))
+            return LoanDetailSerializer(page, many=True).data, next_cursor
+
+        data, next_cursor = get_or_compute('view-loan', loan_scope(loan_id), page_params(request), load_page)
+
         # If no loans found, return an error
-        if not loans:
+        if not data and not request.query_params.get(CURSOR_PARAM):
             return Response({"error": "No loans found with the provided Loan ID."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Prepare the response data
-        response_data = []
-        for loan in loans:
-            loan_data = {
-                "loan_id": loan.loan_id,
-                "customer": {
-                    "customer_id": loan.customer.customer_id,
-                    "first_name": loan.customer.first_name,
-                    "last_name": loan.customer.last_name,
-                    "phone_number": loan.customer.phone_number,
-                    "age": loan.customer.age
-                },
-                "loan_amount": loan.loan_amount,
-                "interest_rate": loan.interest_rate,
-                "monthly_installment": loan.monthly_repayment,
-                "tenure": loan.tenure
-            }
-            response_data.append(loan_data)
-        
-        return Response(response_data, status=status.HTTP_200_OK)
-    
+        return _page_response(request, data, next_cursor)
+
+    except InvalidPage as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({"error": f"An unexpected error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -258,33 +604,25 @@ def view_loans_view(request, customer_id):
         return Response({"error": "Customer ID is required."}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        # Fetch the customer based on customer_id
-        customer = Customer.objects.get(customer_id=customer_id)
+        current_loans = active_loans_queryset(customer_id)
 
-        # Fetch all current (active) loans for the customer
-        current_loans = Loan.objects.filter(customer=customer, end_date__gte=date.today())
+        def load_page():
+            page, next_cursor = paginate_keyset(current_loans, request, ('end_date', 'loan_id'))
+            return CustomerLoanSerializer(page, many=True).data, next_cursor
 
-        # If no active loans exist for the customer, return a message
-        if not current_loans.exists():
-            return Response({"message": "No active loans found for this customer."}, status=status.HTTP_200_OK)
+        # Which loans are active changes at midnight, so the page is cached until then
+        data, next_cursor = get_or_compute('view-loans', customer_scope(customer_id),
+                                        (date.today().isoformat(), *page_params(request)), load_page, ttl_for_today())
 
-        # Prepare the response data for each loan
-        response_data = []
-        for loan in current_loans:
-            repayments_left = max(loan.tenure - loan.emis_paid_on_time, 0)  # Calculate EMIs left
+        # The customer only needs looking up when there is nothing to show
+        if not data and not request.query_params.get(CURSOR_PARAM):
+            if not Customer.objects.filter(customer_id=customer_id).exists():
+                return Response({"error": "Customer not found."}, status=status.HTTP_404_NOT_FOUND)
+            return Response({"message": "No active loans found for this customer."}, status=status.HTTP_200_OK)
 
-            response_data.append({
-                "loan_id": loan.loan_id,
-                "loan_amount": loan.loan_amount,
-                "interest_rate": loan.interest_rate,
-                "monthly_installment": loan.monthly_repayment,
-                "repayments_left": repayments_left
-            })
+        return _page_response(request, data, next_cursor)
 
-        return Response(response_data, status=status.HTTP_200_OK)
-    
-    except Customer.DoesNotExist:
-        return Response({"error": "Customer not found."}, status=status.HTTP_404_NOT_FOUND)
+    except InvalidPage as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({"error": f"An unexpected error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-